@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# -------------------------------
+# Chart resolution: rollups and downsampling
+# -------------------------------
+# Years of daily logging is thousands of points per metric; charts get at most
+# MAX_POINTS per trace, either as calendar rollups or as an LTTB-downsampled raw view.
+MAX_POINTS = 500
+RAW = "Every entry"
+RESOLUTIONS = {RAW: None, "Per session": "D", "Weekly": "W", "Monthly": "MS"}
+AGGREGATIONS = ["mean", "max"]
+
+
+def lttb(x, y, threshold):
+    """Indices of the points largest-triangle-three-buckets keeps (always the first and last).
+
+    x must be increasing. Returns every index when there are no more than threshold points.
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # threshold - 2 buckets over the points between the first and last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    cx = np.concatenate([[0.0], np.cumsum(x)])
+    cy = np.concatenate([[0.0], np.cumsum(y)])
+    # Each bucket is scored against the mean of the next one (the last point for the final bucket)
+    next_x = np.append(((cx[edges[1:]] - cx[edges[:-1]]) / counts)[1:], x[-1])
+    next_y = np.append(((cy[edges[1:]] - cy[edges[:-1]]) / counts)[1:], y[-1])
+
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a])
+        )
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def rollup(df, metric, freq, how="mean", x="timestamp"):
+    """A metric aggregated per calendar bucket (D, W, MS, ...); empty buckets are dropped."""
+    return df.groupby(pd.Grouper(key=x, freq=freq))[metric].agg(how).dropna()
+
+
+def metric_series(df, metric, resolution=RAW, how="mean", max_points=MAX_POINTS, x="timestamp"):
+    """The points to plot for one metric: a Series indexed by time, at most max_points long."""
+    freq = RESOLUTIONS[resolution]
+    if freq is None:
+        series = df[[x, metric]].dropna().set_index(x)[metric]
+    else:
+        series = rollup(df, metric, freq, how, x)
+    if len(series) > max_points:
+        keep = lttb(series.index.asi8, series.to_numpy(dtype="float64"), max_points)
+        series = series.iloc[keep]
+    return series
@@ -1,10 +1,9 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from io import BytesIO
-import base64
+from instrumentation import begin_rerun, end_rerun
+from tracker_forms import ACTIVITIES, entry_section, show_saved_message
 
 st.set_page_config(page_title="Basketball Tracker", layout="wide")
+begin_rerun()
 
 # -------------------------------
 # Sidebar: Image Uploads
@@ -13,9 +12,46 @@ st.sidebar.subheader("Upload Images (optional)")
 kobe_file = st.sidebar.file_uploader("Kobe Bryant Image", type=["png","jpg"])
 logo_file = st.sidebar.file_uploader("Basketball Logo", type=["png","jpg"])
 court_file = st.sidebar.file_uploader("Court Background", type=["png","jpg"])
-court_bg_base64 = None
-if court_file:
-    court_bg_base64 = base64.b64encode(court_file.read()).decode()
+
+# -------------------------------
+# Sidebar: Storage
+# -------------------------------
+st.sidebar.subheader("Storage")
+storage_mode = st.sidebar.radio("Keep data", ["This session only", "Local Parquet store"])
+
+@st.cache_resource
+def get_local_backend():
+    from shared_cache import default_cache
+    from storage import LocalFileBackend
+    backend = LocalFileBackend()
+    # With TRACKER_CACHE_URL set, every replica reads snapshots and figures through one cache
+    backend.shared_cache = default_cache()
+    return backend
+
+def get_backend():
+    # Built on first use (a save, or the graphs below the forms), so pandas and
+    # pyarrow are not imported before the forms are on screen
+    if storage_mode == "Local Parquet store":
+        return get_local_backend()
+    if "session_backend" not in st.session_state:
+        from storage import MemoryBackend
+        st.session_state.session_backend = MemoryBackend()
+    return st.session_state.session_backend
+
+if storage_mode == "Local Parquet store":
+    player = st.sidebar.text_input("Player", value="Player1") or "Player1"
+else:
+    player = "me"
+
+# -------------------------------
+# Team dashboard
+# -------------------------------
+view = st.sidebar.radio("View", ["My stats", "Team dashboard"])
+if view == "Team dashboard":
+    from team_view import show_team_dashboard
+    show_team_dashboard(get_backend())
+    end_rerun("plotly")
+    st.stop()
 
 # -------------------------------
 # Header
@@ -31,163 +67,60 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # -------------------------------
-# Initialize session state
+# Activity selection
 # -------------------------------
-if "games" not in st.session_state: st.session_state.games = []
-if "shooting" not in st.session_state: st.session_state.shooting = []
-if "conditioning" not in st.session_state: st.session_state.conditioning = []
+activity = st.radio("Select Activity to Log:", ACTIVITIES)
 
 # -------------------------------
-# Activity selection
+# Data Entry Forms
 # -------------------------------
-activity = st.radio("Select Activity to Log:", ["Games Stats", "Shooting Practice", "Conditioning"])
+show_saved_message()
+entry_section(activity, lambda row: get_backend().append(player, activity, row))
+
+# Everything below needs pandas and plotly; imported once the forms are drawn
+from charts import show_graphs
+from court_image import court_background
+from derived_metrics import with_derived
+from exporters import EXPORT_FORMATS, LazyExport, build_export
+
+backend = get_backend()
+if backend.shared_cache is not None:
+    st.sidebar.caption(backend.shared_cache.summary())
+# Downscaled once per distinct image and shared by every chart
+court_layout, court_key = court_background(court_file)
 
 # -------------------------------
-# Data Entry Forms
+# Export
 # -------------------------------
+def export_data(export_format, frames):
+    sheets = {act: df.drop(columns=["user_id", "activity"]).dropna(axis=1, how="all") for act, df in frames.items()}
+    return build_export(sheets, export_format)
+
+if "export_cache" not in st.session_state: st.session_state.export_cache = LazyExport()
 
-# ----------- Games Stats -----------
-if activity == "Games Stats":
-    st.subheader("📊 Games Stats Entry")
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        points = st.number_input("Points", min_value=0)
-        assists = st.number_input("Assists", min_value=0)
-    with col2:
-        turnovers = st.number_input("Turnovers", min_value=0)
-        steals = st.number_input("Steals", min_value=0)
-    with col3:
-        threes_made = st.number_input("3P Made", min_value=0)
-        threes_attempt = st.number_input("3P Attempt", min_value=0)
-    with col4:
-        twos_made = st.number_input("2P Made", min_value=0)
-        twos_attempt = st.number_input("2P Attempt", min_value=0)
-
-    if st.button("Save Game Stats"):
-        st.session_state.games.append({
-            "Points": points,
-            "Assists": assists,
-            "Turnovers": turnovers,
-            "Steals": steals,
-            "3P Made": threes_made,
-            "3P Attempt": threes_attempt,
-            "2P Made": twos_made,
-            "2P Attempt": twos_attempt,
-            "3P %": round(threes_made / threes_attempt * 100, 2) if threes_attempt else 0,
-            "2P %": round(twos_made / twos_attempt * 100, 2) if twos_attempt else 0
-        })
-        st.success("✅ Game stats saved!")
-
-# ----------- Shooting Practice -----------
-elif activity == "Shooting Practice":
-    st.subheader("🏀 Shooting Practice Entry")
-    col1, col2 = st.columns(2)
-    with col1:
-        s21_m = st.number_input("21-points drill - Minutes", min_value=0)
-        s21_s = st.number_input("21-points drill - Seconds", min_value=0)
-        layups_m = st.number_input("10 Layups - Minutes", min_value=0)
-        layups_s = st.number_input("10 Layups - Seconds", min_value=0)
-        around_key = st.number_input("Around the Key Shots in 4 mins", min_value=0)
-        threes_4min = st.number_input("3P in 4 mins", min_value=0)
-    with col2:
-        threes_made = st.number_input("3P Made", min_value=0)
-        threes_attempt = st.number_input("3P Attempt", min_value=0)
-        twos_made = st.number_input("2P Made", min_value=0)
-        twos_attempt = st.number_input("2P Attempt", min_value=0)
-
-    if st.button("Save Shooting Practice"):
-        st.session_state.shooting.append({
-            "21 Drill Time (s)": s21_m*60 + s21_s,
-            "10 Layups Time (s)": layups_m*60 + layups_s,
-            "Around Key": around_key,
-            "3P in 4min": threes_4min,
-            "3P Made": threes_made,
-            "3P Attempt": threes_attempt,
-            "2P Made": twos_made,
-            "2P Attempt": twos_attempt,
-            "3P %": round(threes_made / threes_attempt * 100, 2) if threes_attempt else 0,
-            "2P %": round(twos_made / twos_attempt * 100, 2) if twos_attempt else 0
-        })
-        st.success("✅ Shooting practice saved!")
-
-# ----------- Conditioning -----------
-elif activity == "Conditioning":
-    st.subheader("💪 Conditioning Entry")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        drill17_m = st.number_input("17s Drill - Minutes", min_value=0)
-        drill17_s = st.number_input("17s Drill - Seconds", min_value=0)
-        suicide1_m = st.number_input("1 Suicide - Minutes", min_value=0)
-        suicide1_s = st.number_input("1 Suicide - Seconds", min_value=0)
-    with col2:
-        suicide5_m = st.number_input("5 Suicides - Minutes", min_value=0)
-        suicide5_s = st.number_input("5 Suicides - Seconds", min_value=0)
-    with col3:
-        slides = st.number_input("Defensive Slides in 30s", min_value=0)
-
-    if st.button("Save Conditioning"):
-        st.session_state.conditioning.append({
-            "17s Drill Time (s)": drill17_m*60 + drill17_s,
-            "1 Suicide Time (s)": suicide1_m*60 + suicide1_s,
-            "5 Suicides Time (s)": suicide5_m*60 + suicide5_s,
-            "Defensive Slides": slides
-        })
-        st.success("✅ Conditioning data saved!")
-
-# -------------------------------
-# Excel Export
-# -------------------------------
-def export_to_excel():
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        if st.session_state.games:
-            pd.DataFrame(st.session_state.games).to_excel(writer, index=False, sheet_name="Games")
-        if st.session_state.shooting:
-            pd.DataFrame(st.session_state.shooting).to_excel(writer, index=False, sheet_name="Shooting Practice")
-        if st.session_state.conditioning:
-            pd.DataFrame(st.session_state.conditioning).to_excel(writer, index=False, sheet_name="Conditioning")
-    processed_data = output.getvalue()
-    return processed_data
+export_format = st.radio("Export format", list(EXPORT_FORMATS), horizontal=True)
+# Percentages and ratios are computed here, once per data version
+user_data = with_derived(backend.snapshot(player), backend.cache_key(player))
+by_activity = {act: user_data[user_data["activity"] == act] for act in ACTIVITIES}
+export_version = (export_format, storage_mode, player, backend.version(player))
+export_cache = st.session_state.export_cache
+extension, mime = EXPORT_FORMATS[export_format]
 
+# The callable runs only when the button is clicked
 st.download_button(
-    label="📥 Export Data to Excel",
-    data=export_to_excel(),
-    file_name="basketball_data.xlsx"
+    label=f"📥 Export Data to {export_format}",
+    data=lambda: export_cache.get(export_version, lambda: export_data(export_format, by_activity)),
+    file_name=f"basketball_data.{extension}",
+    mime=mime
 )
 
 # -------------------------------
 # Graph Section
 # -------------------------------
-def show_graphs(data, activity_name):
-    if not data:
-        st.info(f"No data for {activity_name} yet.")
-        return
-    df = pd.DataFrame(data)
-    for col in df.columns:
-        if df[col].dtype in ['int64', 'float64']:
-            fig = px.line(df, y=col, title=f"{activity_name} - {col}", markers=True)
-            if court_bg_base64:
-                fig.update_layout(
-                    images=[dict(
-                        source=f"data:image/png;base64,{court_bg_base64}",
-                        xref="paper", yref="paper",
-                        x=0, y=1,
-                        sizex=1, sizey=1,
-                        xanchor="left",
-                        yanchor="top",
-                        layer="below",
-                        opacity=0.2
-                    )],
-                    plot_bgcolor="rgba(0,0,0,0)",
-                    paper_bgcolor="rgba(0,0,0,0)"
-                )
-            st.plotly_chart(fig, use_container_width=True)
-
-st.write("### Games Metrics")
-show_graphs(st.session_state.games, "Games")
-
-st.write("### Shooting Practice Metrics")
-show_graphs(st.session_state.shooting, "Shooting Practice")
-
-st.write("### Conditioning Metrics")
-show_graphs(st.session_state.conditioning, "Conditioning")
\ No newline at end of file
+for act in ACTIVITIES:
+    show_graphs(
+        by_activity[act], act, backend.cache_key(player),
+        background=court_layout, background_key=court_key, shared_cache=backend.shared_cache
+    )
+
+end_rerun("plotly")
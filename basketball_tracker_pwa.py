@@ -1,177 +1,97 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from datetime import datetime
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from gspread_dataframe import set_with_dataframe, get_as_dataframe
+from instrumentation import begin_rerun, end_rerun
+from tracker_forms import ACTIVITIES, STAT_COLUMNS, entry_section, history_loading, show_saved_message
 
 # -------------------------------
 # Google Sheets Setup
 # -------------------------------
 scope = ["https://spreadsheets.google.com/feeds","https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_name("service_account.json", scope)
-client = gspread.authorize(creds)
-sheet = client.open("Basketball Tracker")  # Your sheet name
+
+def connect_sheets():
+    # Runs once per process, on the sync thread's first use, so the app starts even offline
+    # and gspread is not imported before the first render
+    import gspread
+    from storage import SheetsBackend
+    client = gspread.service_account(filename="service_account.json", scopes=scope)
+    sheet = client.open("Basketball Tracker")  # Your sheet name
+    # One worksheet per player, looked up in a title index fetched once; reads cached for 60s
+    return SheetsBackend(sheet, ttl=60)
+
+@st.cache_resource
+def get_backend():
+    # Saves land in a local journal first (instant, and kept while offline); a background
+    # sync pushes them to the sheet and pulls rows saved on other devices
+    from storage import SyncedBackend
+    from shared_cache import default_cache
+    backend = SyncedBackend(connect_sheets, journal_path="pwa_journal.db", column_order=STAT_COLUMNS)
+    # With TRACKER_CACHE_URL set, every replica reads snapshots and figures through one cache
+    backend.shared_cache = default_cache()
+    return backend
 
 # -------------------------------
 # Streamlit Setup
 # -------------------------------
 st.set_page_config(page_title="Basketball Tracker", layout="wide")
+begin_rerun()
 st.title("🏀 Basketball Performance Tracker")
 
+# -------------------------------
+# Team dashboard
+# -------------------------------
+view = st.sidebar.radio("View", ["My stats", "Team dashboard"])
+if view == "Team dashboard":
+    from team_view import show_team_dashboard
+    show_team_dashboard(get_backend())
+    end_rerun("pwa")
+    st.stop()
+
 # -------------------------------
 # User Login / Identification
 # -------------------------------
 user_name = st.text_input("Enter Player Name:", value="Player1")
 if not user_name:
     st.warning("Please enter your name to continue.")
+    end_rerun("pwa")
     st.stop()
 
-# -------------------------------
-# Worksheet per user
-# -------------------------------
-try:
-    ws = sheet.worksheet(user_name)
-except gspread.exceptions.WorksheetNotFound:
-    ws = sheet.add_worksheet(title=user_name, rows="1000", cols="20")
-
-# -------------------------------
-# Initialize session state
-# -------------------------------
-activities = ["Games", "Shooting Practice", "Conditioning", "Dribbling"]
-for act in activities:
-    if act not in st.session_state:
-        st.session_state[act] = []
-
-# Load existing data from Google Sheet
-for act in activities:
-    df_existing = get_as_dataframe(ws, evaluate_formulas=True, header=0)
-    if df_existing is not None and not df_existing.empty:
-        st.session_state[act] = df_existing[df_existing['Activity']==act].copy()
-
 # -------------------------------
 # Activity selection
 # -------------------------------
-activity = st.radio("Select Activity to Log:", activities)
+activity = st.radio("Select Activity to Log:", ACTIVITIES)
 
 # -------------------------------
 # Data Entry Forms
 # -------------------------------
-if activity == "Games":
-    st.subheader("📊 Games Stats Entry")
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        points = st.number_input("Points", min_value=0)
-        assists = st.number_input("Assists", min_value=0)
-    with col2:
-        turnovers = st.number_input("Turnovers", min_value=0)
-        steals = st.number_input("Steals", min_value=0)
-    with col3:
-        threes_made = st.number_input("3P Made", min_value=0)
-    with col4:
-        twos_made = st.number_input("2P Made", min_value=0)
-
-    if st.button("Save Game Stats"):
-        row = {
-            "Activity": "Games",
-            "DateTime": datetime.now(),
-            "Points": points,
-            "Assists": assists,
-            "Turnovers": turnovers,
-            "Steals": steals,
-            "3P Made": threes_made,
-            "2P Made": twos_made
-        }
-        st.session_state["Games"].append(row)
-        st.success("✅ Game stats saved!")
-
-elif activity == "Shooting Practice":
-    st.subheader("🏀 Shooting Practice Entry")
-    col1, col2 = st.columns(2)
-    with col1:
-        s21_m = st.number_input("21 Drill Minutes", min_value=0)
-        s21_s = st.number_input("21 Drill Seconds", min_value=0)
-        layups_m = st.number_input("10 Layups Minutes", min_value=0)
-        layups_s = st.number_input("10 Layups Seconds", min_value=0)
-    with col2:
-        threes_made = st.number_input("3P Made", min_value=0)
-        twos_made = st.number_input("2P Made", min_value=0)
-
-    if st.button("Save Shooting Practice"):
-        row = {
-            "Activity": "Shooting Practice",
-            "DateTime": datetime.now(),
-            "21 Drill Time (s)": s21_m*60 + s21_s,
-            "10 Layups Time (s)": layups_m*60 + layups_s,
-            "3P Made": threes_made,
-            "2P Made": twos_made
-        }
-        st.session_state["Shooting Practice"].append(row)
-        st.success("✅ Shooting practice saved!")
-
-elif activity == "Conditioning":
-    st.subheader("💪 Conditioning Entry")
-    drill17_m = st.number_input("17s Drill Minutes", min_value=0)
-    drill17_s = st.number_input("17s Drill Seconds", min_value=0)
-    suicide1_m = st.number_input("1 Suicide Minutes", min_value=0)
-    suicide1_s = st.number_input("1 Suicide Seconds", min_value=0)
-    slides = st.number_input("Defensive Slides in 30s", min_value=0)
-
-    if st.button("Save Conditioning"):
-        row = {
-            "Activity": "Conditioning",
-            "DateTime": datetime.now(),
-            "17s Drill Time (s)": drill17_m*60 + drill17_s,
-            "1 Suicide Time (s)": suicide1_m*60 + suicide1_s,
-            "Defensive Slides": slides
-        }
-        st.session_state["Conditioning"].append(row)
-        st.success("✅ Conditioning data saved!")
+show_saved_message()
+entry_section(activity, lambda row: get_backend().append(user_name, activity, row))
 
-elif activity == "Dribbling":
-    st.subheader("🤾 Dribbling Entry")
-    two_ball = st.number_input("2-Ball Dribbles (minutes)", min_value=0)
-    one_ball = st.number_input("1-Ball Dribbles (minutes)", min_value=0)
-    if st.button("Save Dribbling"):
-        row = {
-            "Activity": "Dribbling",
-            "DateTime": datetime.now(),
-            "2-Ball Minutes": two_ball,
-            "1-Ball Minutes": one_ball
-        }
-        st.session_state["Dribbling"].append(row)
-        st.success("✅ Dribbling saved!")
-
-# -------------------------------
-# Function to Save to Google Sheet
-# -------------------------------
-def save_to_sheet():
-    all_data = []
-    for act in activities:
-        for row in st.session_state[act]:
-            all_data.append(row)
-    df = pd.DataFrame(all_data)
-    if not df.empty:
-        set_with_dataframe(ws, df)
+# Everything below needs pandas and plotly; imported once the forms are drawn
+import pandas as pd
+from charts import show_graphs
+from derived_metrics import with_derived
 
-# Save after each interaction
-save_to_sheet()
+backend = get_backend()
+st.caption(
+    f"⏳ Waiting to sync: {backend.pending()}"
+    + (f" · offline, will retry ({backend.sync.last_error})" if backend.sync.last_error else "")
+)
+if backend.shared_cache is not None:
+    st.sidebar.caption(backend.shared_cache.summary())
 
 # -------------------------------
 # Graphs
 # -------------------------------
 st.write("## Performance Graphs")
-def show_graphs(data, activity_name):
-    if not data: 
-        st.info(f"No data for {activity_name} yet.") 
-        return
-    df = pd.DataFrame(data)
-    for col in df.columns:
-        if df[col].dtype in ['int64', 'float64'] and col not in ["Points", "Assists", "3P Made", "2P Made", "DateTime"]:
-            fig = px.line(df, x="DateTime", y=col, title=f"{activity_name} - {col}", markers=True)
-            st.plotly_chart(fig, use_container_width=True)
-
-for act in activities:
-    st.write(f"### {act} Metrics")
-    show_graphs(st.session_state[act], act)
+# One sheet read (cached) for every activity's graphs
+user_data = with_derived(backend.snapshot(user_name), backend.cache_key(user_name))
+if backend.awaiting_pull(user_name):
+    history_loading(backend, user_name)
+by_activity = dict(tuple(user_data.groupby("activity")))
+for act in ACTIVITIES:
+    show_graphs(
+        by_activity.get(act, pd.DataFrame()), act, backend.cache_key(user_name),
+        exclude=["Points", "Assists", "3P Made", "2P Made", "3P Attempt", "2P Attempt"],
+        shared_cache=backend.shared_cache
+    )
+
+end_rerun("pwa")
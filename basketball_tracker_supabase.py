@@ -1,150 +1,81 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from datetime import datetime
-from supabase import create_client, Client
+from instrumentation import begin_rerun, end_rerun
+from tracker_forms import ACTIVITIES, STAT_COLUMNS, entry_section, history_loading, show_saved_message
 
 # -------------------------------
 # Supabase credentials
 # -------------------------------
 SUPABASE_URL = "https://yegkoltoaqzfjyzbhdrc.supabase.co"
 SUPABASE_KEY = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9..."  # use your anon/public key
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+def connect_supabase():
+    # Runs once per process, on the sync thread's first use, so neither the supabase
+    # package nor its client holds up the first render (and the app starts offline)
+    from supabase import create_client
+    from storage import SupabaseBackend
+    client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return SupabaseBackend(client, "user_stats", columns=STAT_COLUMNS)
+
+@st.cache_resource
+def get_backend():
+    # One backend per process, shared by every session. Saves land in a local journal
+    # first (instant, and kept while offline); a background sync bulk-inserts them into
+    # user_stats and pulls rows saved on other devices
+    from storage import SyncedBackend
+    from shared_cache import default_cache
+    backend = SyncedBackend(connect_supabase, journal_path="supabase_journal.db", column_order=STAT_COLUMNS)
+    # With TRACKER_CACHE_URL set, every replica reads snapshots and figures through one cache
+    backend.shared_cache = default_cache()
+    return backend
 
 # -------------------------------
 # Streamlit page config
 # -------------------------------
 st.set_page_config(page_title="Basketball Tracker", layout="wide")
+begin_rerun()
 st.title("🏀 Basketball Performance Tracker")
 
 # -------------------------------
-# Initialize session state
+# Team dashboard
 # -------------------------------
-if "user_id" not in st.session_state:
-    st.session_state.user_id = st.text_input("Enter your User ID", "")
+view = st.sidebar.radio("View", ["My stats", "Team dashboard"])
+if view == "Team dashboard":
+    from team_view import show_team_dashboard
+    show_team_dashboard(get_backend())
+    end_rerun("supabase")
+    st.stop()
 
-if "games" not in st.session_state: st.session_state.games = []
-if "shooting" not in st.session_state: st.session_state.shooting = []
-if "conditioning" not in st.session_state: st.session_state.conditioning = []
-if "dribbling" not in st.session_state: st.session_state.dribbling = []
+# -------------------------------
+# User identification
+# -------------------------------
+user_id = st.text_input("Enter your User ID", key="user_id")
 
 # -------------------------------
 # Activity selection
 # -------------------------------
-activity = st.radio("Select Activity to Log:", ["Games Stats", "Shooting Practice", "Conditioning", "Dribbling"])
+activity = st.radio("Select Activity to Log:", ACTIVITIES)
 
 # -------------------------------
 # Data Entry Forms
 # -------------------------------
-def save_to_supabase(activity_name, row_dict):
-    row_dict["user_id"] = st.session_state.user_id
-    row_dict["activity"] = activity_name
-    row_dict["timestamp"] = datetime.now().isoformat()
-    supabase.table("user_stats").insert(row_dict).execute()
-
-# ----------- Games Stats -----------
-if activity == "Games Stats":
-    st.subheader("📊 Games Stats Entry")
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        points = st.number_input("Points", min_value=0)
-        assists = st.number_input("Assists", min_value=0)
-    with col2:
-        turnovers = st.number_input("Turnovers", min_value=0)
-        steals = st.number_input("Steals", min_value=0)
-    with col3:
-        threes_made = st.number_input("3P Made", min_value=0)
-        threes_attempt = st.number_input("3P Attempt", min_value=0)
-    with col4:
-        twos_made = st.number_input("2P Made", min_value=0)
-        twos_attempt = st.number_input("2P Attempt", min_value=0)
-
-    if st.button("Save Game Stats"):
-        row = {
-            "Points": points,
-            "Assists": assists,
-            "Turnovers": turnovers,
-            "Steals": steals,
-            "3P Made": threes_made,
-            "3P Attempt": threes_attempt,
-            "2P Made": twos_made,
-            "2P Attempt": twos_attempt,
-            "3P %": round(threes_made / threes_attempt * 100, 2) if threes_attempt else 0,
-            "2P %": round(twos_made / twos_attempt * 100, 2) if twos_attempt else 0
-        }
-        save_to_supabase("Games", row)
-        st.success("✅ Game stats saved!")
-
-# ----------- Shooting Practice -----------
-elif activity == "Shooting Practice":
-    st.subheader("🏀 Shooting Practice Entry")
-    col1, col2 = st.columns(2)
-    with col1:
-        s21_m = st.number_input("21-points drill - Minutes", min_value=0)
-        s21_s = st.number_input("21-points drill - Seconds", min_value=0)
-        layups_m = st.number_input("10 Layups - Minutes", min_value=0)
-        layups_s = st.number_input("10 Layups - Seconds", min_value=0)
-        around_key = st.number_input("Around the Key Shots in 4 mins", min_value=0)
-        threes_4min = st.number_input("3P in 4 mins", min_value=0)
-    with col2:
-        threes_made = st.number_input("3P Made", min_value=0)
-        twos_made = st.number_input("2P Made", min_value=0)
-
-    if st.button("Save Shooting Practice"):
-        row = {
-            "21 Drill Time (s)": s21_m*60 + s21_s,
-            "10 Layups Time (s)": layups_m*60 + layups_s,
-            "Around Key": around_key,
-            "3P in 4min": threes_4min,
-            "3P Made": threes_made,
-            "2P Made": twos_made,
-            "3P %": round(threes_made / (threes_made if threes_made else 1) * 100,2),
-            "2P %": round(twos_made / (twos_made if twos_made else 1) * 100,2)
-        }
-        save_to_supabase("Shooting", row)
-        st.success("✅ Shooting practice saved!")
-
-# ----------- Conditioning -----------
-elif activity == "Conditioning":
-    st.subheader("💪 Conditioning Entry")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        drill17_m = st.number_input("17s Drill - Minutes", min_value=0)
-        drill17_s = st.number_input("17s Drill - Seconds", min_value=0)
-        suicide1_m = st.number_input("1 Suicide - Minutes", min_value=0)
-        suicide1_s = st.number_input("1 Suicide - Seconds", min_value=0)
-    with col2:
-        suicide5_m = st.number_input("5 Suicides - Minutes", min_value=0)
-        suicide5_s = st.number_input("5 Suicides - Seconds", min_value=0)
-    with col3:
-        slides = st.number_input("Defensive Slides in 30s", min_value=0)
-
-    if st.button("Save Conditioning"):
-        row = {
-            "17s Drill Time (s)": drill17_m*60 + drill17_s,
-            "1 Suicide Time (s)": suicide1_m*60 + suicide1_s,
-            "5 Suicides Time (s)": suicide5_m*60 + suicide5_s,
-            "Defensive Slides": slides
-        }
-        save_to_supabase("Conditioning", row)
-        st.success("✅ Conditioning data saved!")
-
-# ----------- Dribbling -----------
-elif activity == "Dribbling":
-    st.subheader("🤾 Dribbling Entry")
-    col1, col2 = st.columns(2)
-    with col1:
-        one_ball = st.number_input("1-Ball Dribble Minutes", min_value=0)
-    with col2:
-        two_ball = st.number_input("2-Ball Dribble Minutes", min_value=0)
-
-    if st.button("Save Dribbling"):
-        row = {
-            "1-Ball Minutes": one_ball,
-            "2-Ball Minutes": two_ball
-        }
-        save_to_supabase("Dribbling", row)
-        st.success("✅ Dribbling data saved!")
+show_saved_message()
+entry_section(activity, lambda row: get_backend().append(user_id, activity, row))
+
+# Everything below needs pandas and plotly; imported once the forms are drawn
+import pandas as pd
+from charts import show_graphs
+from derived_metrics import with_derived
+from exporters import EXPORT_FORMATS, LazyExport, build_export
+from supabase_import import import_backup
+from supabase_query import TIME_WINDOWS, window_start
+
+backend = get_backend()
+st.caption(
+    f"⏳ Waiting to sync: {backend.pending()}"
+    + (f" · offline, will retry ({backend.sync.last_error})" if backend.sync.last_error else "")
+)
+if backend.shared_cache is not None:
+    st.sidebar.caption(backend.shared_cache.summary())
 
 # -------------------------------
 # Backup / Import
@@ -152,57 +83,61 @@ elif activity == "Dribbling":
 st.subheader("💾 Backup / Restore")
 col1, col2 = st.columns(2)
 
-def export_user_data():
-    if not st.session_state.user_id:
-        return None
-    res = supabase.table("user_stats").select("*").eq("user_id", st.session_state.user_id).execute()
-    if not res.data:
-        return None
-    df = pd.DataFrame(res.data)
-    output = BytesIO()
-    df.to_excel(output, index=False, engine="openpyxl")
-    return output.getvalue()
+def export_user_data(export_format, df):
+    return build_export({"user_stats": df}, export_format)
+
+if "export_cache" not in st.session_state: st.session_state.export_cache = LazyExport()
 
 with col1:
-    excel_data = export_user_data()
-    if excel_data:
+    if user_id:
+        export_format = st.radio("Backup format", list(EXPORT_FORMATS), horizontal=True)
+        export_version = (export_format, user_id, backend.version(user_id))
+        export_cache = st.session_state.export_cache
+        extension, mime = EXPORT_FORMATS[export_format]
+        # Built on click from the full history, and only rebuilt once the user's data has changed
         st.download_button(
             label="📥 Download My Data Backup",
-            data=excel_data,
-            file_name=f"{st.session_state.user_id}_basketball_backup.xlsx"
+            data=lambda: export_cache.get(export_version, lambda: export_user_data(export_format, backend.snapshot(user_id))),
+            file_name=f"{user_id}_basketball_backup.{extension}",
+            mime=mime
         )
 
 with col2:
-    import_file = st.file_uploader("📂 Import My Data Backup", type=["xlsx"])
-    if import_file is not None:
+    import_file = st.file_uploader("📂 Import My Data Backup", type=["xlsx", "csv"])
+    # Import each uploaded file once, not again on every rerun while it stays in the uploader
+    if import_file is not None and st.session_state.get("imported_file") != import_file.file_id:
         try:
-            df_import = pd.read_excel(import_file, engine="openpyxl")
-            for _, row in df_import.iterrows():
-                row_dict = row.to_dict()
-                row_dict["user_id"] = st.session_state.user_id
-                if "timestamp" not in row_dict or pd.isna(row_dict["timestamp"]):
-                    row_dict["timestamp"] = datetime.now().isoformat()
-                supabase.table("user_stats").insert(row_dict).execute()
-            st.success("✅ Data imported successfully!")
+            if import_file.name.endswith(".csv"):
+                df_import = pd.read_csv(import_file)
+            else:
+                df_import = pd.read_excel(import_file, engine="openpyxl")
+            bar = st.progress(0.0, text="Importing...")
+            inserted, skipped = import_backup(
+                backend.sync.remote().client, df_import, user_id,
+                progress=lambda done, total: bar.progress(done / total, text=f"Importing {done}/{total} rows...")
+            )
+            bar.empty()
+            st.session_state.imported_file = import_file.file_id
+            # Backfilled rows can be older than anything cached, so drop the user's copy entirely
+            backend.invalidate(user_id)
+            st.success(f"✅ Data imported successfully! {inserted} new rows, {skipped} already present.")
         except Exception as e:
-            st.error(f"Failed to import data. Error: {e}")
+            st.error(f"Failed to import data; rows already imported are skipped when you retry. Error: {e}")
 
 # -------------------------------
 # Graph Section
 # -------------------------------
 st.subheader("📈 Graphs")
-activities = ["Games", "Shooting", "Conditioning", "Dribbling"]
-
-def show_graphs(activity_filter):
-    res = supabase.table("user_stats").select("*").eq("user_id", st.session_state.user_id).eq("activity", activity_filter).execute()
-    if not res.data:
-        st.info(f"No data for {activity_filter} yet.")
-        return
-    df = pd.DataFrame(res.data)
-    for col in df.columns:
-        if df[col].dtype in ['int64', 'float64'] and col not in ["3P Attempt", "2P Attempt"]:
-            fig = px.line(df, y=col, x="timestamp", title=f"{activity_filter} - {col}", markers=True)
-            st.plotly_chart(fig, use_container_width=True)
-
-for act in activities:
-    show_graphs(act)
\ No newline at end of file
+
+window = st.selectbox("Time window", TIME_WINDOWS, index=1)
+user_data = with_derived(backend.snapshot(user_id, since=window_start(window)), (*backend.cache_key(user_id), window))
+if backend.awaiting_pull(user_id):
+    history_loading(backend, user_id)
+by_activity = dict(tuple(user_data.groupby("activity")))
+for act in ACTIVITIES:
+    show_graphs(
+        by_activity.get(act, pd.DataFrame()), act, (*backend.cache_key(user_id), window),
+        exclude=["3P Attempt", "2P Attempt"], shared_cache=backend.shared_cache
+    )
+
+end_rerun("supabase")
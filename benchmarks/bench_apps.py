@@ -0,0 +1,261 @@
+"""Scripted sessions through the three Streamlit apps, driven by AppTest.
+
+    python -m benchmarks.bench_apps [--apps plotly supabase pwa] [--saves 10] [--latency-ms 20]
+                                    [--update-baseline]
+
+Every app runs against the in-process stand-ins (FakeSupabase for the
+Supabase app, FakeSpreadsheet for the PWA app; the Plotly app keeps data in
+the session) through the same script: first load, N saves, the Games chart
+at every resolution and with the trend line, the export download, and a
+second session opening the app. For each rerun it records wall time,
+backend round trips, bytes written to the backend and peak Python memory
+(tracemalloc, so times include its overhead). Background sync after a save
+is recorded as its own step and left out of the rerun times.
+
+Per-app totals are compared with benchmarks/baseline_apps.json; anything
+worse than its baseline by more than the tolerance below is flagged and the
+run exits 1. --update-baseline rewrites the file from this run instead.
+"""
+import argparse
+import importlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.fakes import FakeSpreadsheet, FakeSupabase
+from journal import Journal
+from sheets_gateway import shared_gateway
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).with_name("baseline_apps.json")
+USER = "Player1"
+
+APPS = {
+    "plotly": "basketball_app_final_plotly.py",
+    "supabase": "basketball_tracker_supabase.py",
+    "pwa": "basketball_tracker_pwa.py",
+}
+# Apps that save into a journal and sync it in the background
+JOURNALS = {"supabase": "supabase_journal.db", "pwa": "pwa_journal.db"}
+
+# Imported before any timing, so the first app measured does not pay for everyone's imports
+WARM_IMPORTS = ["pandas", "plotly.graph_objects", "streamlit", "charts", "derived_metrics", "exporters",
+                "storage.local_backend", "storage.memory_backend", "storage.sheets_backend",
+                "storage.supabase_backend", "storage.synced_backend", "supabase_import", "team_view",
+                "tracker_forms"]
+
+# metric -> (relative, absolute) slack; a regression has to exceed both. Times are noisy
+# on shared machines, so they only catch gross slowdowns; the counts are deterministic
+TOLERANCES = {
+    "rerun_p50_ms": (1.0, 100),
+    "rerun_max_ms": (1.5, 500),
+    "sync_p50_ms": (1.0, 50),
+    "round_trips": (0.1, 2),
+    "bytes_written": (0.1, 1024),
+    "peak_mb": (0.25, 2),
+}
+
+
+@contextmanager
+def stand_ins(latency):
+    """Route the apps' clients to fakes and capture download callables. Yields {app: fake or None}."""
+    import gspread
+    import supabase
+    from streamlit.runtime.media_file_manager import MediaFileManager
+
+    supabase_fake = FakeSupabase(latency=latency)
+    sheets_fake = FakeSpreadsheet(latency=latency)
+    # The fake has no quota, so neither does the gateway every SheetsBackend on it shares
+    shared_gateway(sheets_fake, reads_per_minute=None, writes_per_minute=None)
+    client = mock.Mock()
+    client.open.return_value = sheets_fake
+
+    downloads = {}
+    add_deferred = MediaFileManager.add_deferred
+
+    def record_deferred(self, data_callable, *args, **kwargs):
+        file_id = add_deferred(self, data_callable, *args, **kwargs)
+        downloads[file_id] = data_callable
+        return file_id
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(supabase, "create_client", return_value=supabase_fake))
+        stack.enter_context(mock.patch.object(gspread, "service_account", return_value=client))
+        stack.enter_context(mock.patch.object(MediaFileManager, "add_deferred", record_deferred))
+        yield {"plotly": None, "supabase": supabase_fake, "pwa": sheets_fake}, downloads
+
+
+class Session:
+    """One scripted session's steps, each with its time, round trips, bytes written and peak memory."""
+
+    def __init__(self, fake):
+        self.fake = fake
+        self.steps = []
+
+    def _counters(self):
+        return (self.fake.round_trips, self.fake.bytes_written) if self.fake is not None else (0, 0)
+
+    def measure(self, step, action, kind="rerun"):
+        trips, written = self._counters()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = action()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - base
+        trips_after, written_after = self._counters()
+        self.steps.append({
+            "step": step, "kind": kind, "ms": elapsed * 1000,
+            "round_trips": trips_after - trips, "bytes_written": written_after - written,
+            "peak_mb": peak / 2**20,
+        })
+        if kind == "rerun" and result.exception:
+            raise RuntimeError(f"{step}: {result.exception[0].message}")
+        return result
+
+    def summary(self):
+        reruns = [s["ms"] for s in self.steps if s["kind"] == "rerun"]
+        syncs = [s["ms"] for s in self.steps if s["kind"] == "sync"]
+        return {
+            "reruns": len(reruns),
+            "rerun_p50_ms": statistics.median(reruns),
+            "rerun_max_ms": max(reruns),
+            "sync_p50_ms": statistics.median(syncs) if syncs else 0.0,
+            "round_trips": sum(s["round_trips"] for s in self.steps),
+            "bytes_written": sum(s["bytes_written"] for s in self.steps),
+            "peak_mb": max(s["peak_mb"] for s in self.steps),
+        }
+
+
+def wait_for_sync(path, timeout=30.0):
+    """Block until the journal at `path` has nothing left to push."""
+    journal = Journal(path)
+    try:
+        deadline = time.monotonic() + timeout
+        while journal.pending_count():
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{path} still has {journal.pending_count()} rows to sync")
+            time.sleep(0.01)
+    finally:
+        journal.close()
+
+
+def run_session(app, fake, downloads, saves):
+    from streamlit.testing.v1 import AppTest
+
+    from aggregation import RESOLUTIONS
+
+    session = Session(fake)
+    at = AppTest.from_file(str(ROOT / APPS[app]), default_timeout=60)
+    session.measure("first load", at.run)
+    if app == "supabase":
+        session.measure("enter user", at.text_input(key="user_id").input(USER).run)
+
+    journal = JOURNALS.get(app)
+    for i in range(saves):
+        if journal:
+            # The journal keys entries by whole seconds: keep each save in a second of its own
+            time.sleep(1 - time.time() % 1)
+        at.number_input[0].set_value(i + 1)
+        session.measure("save", at.button[0].click().run)
+        if journal:
+            session.measure("background sync", lambda: wait_for_sync(journal), kind="sync")
+
+    for resolution in RESOLUTIONS:
+        session.measure(f"chart: {resolution}", at.selectbox(key="resolution_Games").set_value(resolution).run)
+    session.measure("chart: trend line", at.checkbox(key="trend_Games").check().run)
+
+    for button in at.get("download_button"):
+        data = downloads[button.proto.deferred_file_id]
+        session.measure(f"download: {button.proto.label}", data, kind="export")
+
+    second = AppTest.from_file(str(ROOT / APPS[app]), default_timeout=60)
+    session.measure("second session", second.run)
+    return session
+
+
+def regressions(current, baseline):
+    flagged = []
+    for app, metrics in current.items():
+        for metric, (relative, absolute) in TOLERANCES.items():
+            before = baseline.get(app, {}).get(metric)
+            if before is None:
+                continue
+            now = metrics[metric]
+            if now > before * (1 + relative) and now - before > absolute:
+                flagged.append(f"{app} {metric}: {now:.1f} vs baseline {before:.1f}")
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--apps", nargs="+", choices=list(APPS), default=list(APPS))
+    parser.add_argument("--saves", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    import streamlit as st
+
+    sys.path.insert(0, str(ROOT))
+    for module in WARM_IMPORTS:
+        importlib.import_module(module)
+
+    config = {"saves": args.saves, "latency_ms": args.latency_ms}
+    results = {}
+    tracemalloc.start()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, stand_ins(args.latency_ms / 1000) as (fakes, downloads):
+        for app in args.apps:
+            # Each app starts cold, with its journal and data files in a fresh directory
+            st.cache_data.clear()
+            st.cache_resource.clear()
+            workdir = Path(tmp, app)
+            workdir.mkdir()
+            os.chdir(workdir)
+            try:
+                session = run_session(app, fakes[app], downloads, args.saves)
+            finally:
+                os.chdir(cwd)
+
+            print(f"== {app} ({args.saves} saves, remote latency {args.latency_ms:g} ms)")
+            print(f"  {'step':<28}{'ms':>9}{'trips':>7}{'bytes':>9}{'peak MB':>9}")
+            for s in session.steps:
+                print(f"  {s['step'][:27]:<28}{s['ms']:9.1f}{s['round_trips']:7d}{s['bytes_written']:9d}{s['peak_mb']:9.1f}")
+            results[app] = session.summary()
+            print("  " + "   ".join(f"{k} {v:.1f}" if isinstance(v, float) else f"{k} {v}"
+                                    for k, v in results[app].items()))
+    tracemalloc.stop()
+
+    if args.update_baseline:
+        stored = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        apps = stored.get("apps", {}) if stored.get("config") == config else {}
+        apps.update({app: {k: round(v, 1) for k, v in m.items()} for app, m in results.items()})
+        BASELINE.write_text(json.dumps({"config": config, "apps": apps}, indent=2) + "\n")
+        print(f"baseline written to {BASELINE.name}")
+        return
+
+    if not BASELINE.exists():
+        print("no baseline yet: run with --update-baseline")
+        return
+    stored = json.loads(BASELINE.read_text())
+    if stored.get("config") != config:
+        print(f"baseline was recorded with {stored.get('config')}, not {config}: not compared")
+        return
+    flagged = regressions(results, stored["apps"])
+    for line in flagged:
+        print(f"REGRESSION {line}")
+    if not flagged:
+        print("no regressions against the baseline")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Replicas of an app reading the same players, with and without the shared cache.
+
+    python -m benchmarks.bench_cache [--replicas 4] [--players 8] [--rows 500] [--reruns 40]
+                                     [--save-every 10] [--latency-ms 50] [--max-mb 64]
+                                     [--backends sheets synced]
+
+Each replica is a thread with its own backend on one FakeSpreadsheet, and its
+own figure memo standing in for st.cache_data. The backend is a SheetsBackend
+(reads kept for --backend-ttl seconds), or with "synced" a SyncedBackend on
+one, as the PWA app runs: saves go to the replica's own journal and are pushed
+in the background. A rerun picks a player, reads the snapshot and draws a
+figure per activity; every --save-every-th rerun saves a row first. Modes:
+
+  none    each replica reads and draws for itself, as before
+  sqlite  through a SharedCache on one SQLiteCache file
+  redis   through a SharedCache on FakeRedisServer, over the Redis protocol
+
+Reports rerun latency, sheet requests, figures drawn, hit rates, the
+store's size and evictions, and stale reruns: ones missing a row the replica
+saved itself, or one another replica stored on the sheet (at its save, or
+synced at its push) more than --version-ttl earlier (plus --backend-ttl
+without a cache).
+Exits 1 if a cache mode serves a stale rerun or ends with snapshots that
+differ from the sheet. The run lasts seconds, so with the default
+--backend-ttl "none" never re-reads a sheet; a lower one shows the reads an
+hour of reruns would make.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from aggregation import RAW, metric_series
+from benchmarks.bench_storage import synthetic_rows
+from benchmarks.fakes import FakeRedisServer, FakeSpreadsheet
+from charts import activity_figure, metric_columns
+from shared_cache import RedisCache, SharedCache, SQLiteCache
+from sheets_gateway import shared_gateway
+from storage import SheetsBackend, SyncedBackend
+
+MODES = ["none", "sqlite", "redis"]
+BACKENDS = ["sheets", "synced"]
+START = datetime(2024, 9, 1)
+
+
+def draw(df):
+    """A figure per activity, as show_graphs draws them at the RAW resolution."""
+    figures = {}
+    for activity, act_df in df.groupby("activity", sort=False):
+        metrics = metric_columns(act_df)
+        if metrics:
+            figures[activity] = activity_figure(act_df, activity, metrics,
+                                                series={m: metric_series(act_df, m, RAW) for m in metrics})
+    return figures
+
+
+def sheets_backend(fake, ttl):
+    backend = SheetsBackend(fake, ttl=ttl)
+    backend.rollups_on_write = False
+    return backend
+
+
+def make_backend(kind, fake, args, journal_path):
+    if kind == "sheets":
+        return sheets_backend(fake, args.backend_ttl)
+    return SyncedBackend(lambda: sheets_backend(fake, args.backend_ttl), journal_path,
+                         interval=args.sync_interval, pull_interval=3600)
+
+
+def replica(index, kind, fake, store, players, args, saves, results, tmpdir):
+    rng = random.Random(index)
+    backend = make_backend(kind, fake, args, os.path.join(tmpdir, f"replica{index}.db"))
+    if kind == "synced":
+        backend.flush()  # connected, as a replica that has been up a while is
+        on_push = backend.sync.on_push
+
+        def record_push(rows):
+            on_push(rows)
+            with saves["lock"]:
+                for row in rows:
+                    # The push can beat the save's own bookkeeping below
+                    saves[row["user_id"]].setdefault(row["timestamp"], [index, None])[1] = time.monotonic()
+
+        backend.sync.on_push = record_push
+    if store is not None:
+        backend.shared_cache = SharedCache(store, version_ttl=args.version_ttl)
+    memo = {}  # cache_key -> figures: this process's st.cache_data
+    times, stale, drawn = [], 0, 0
+    for i in range(args.reruns):
+        player = rng.choice(players)
+        began = time.perf_counter()
+        if i % args.save_every == args.save_every - 1:
+            ts = START + timedelta(days=400, seconds=rng.randrange(10**7))
+            backend.append(player, "Games", {"Points": index, "Assists": i, "timestamp": ts})
+            with saves["lock"]:
+                # [saved by, when the sheet had it]
+                entry = saves[player].setdefault(ts, [index, None])
+                if kind == "sheets":
+                    entry[1] = time.monotonic()
+        read_at = time.monotonic()
+        df = backend.snapshot(player)
+        key = (backend.cache_key(player), len(df))
+        if backend.shared_cache is not None:
+            def build():
+                nonlocal drawn
+                drawn += 1
+                return draw(df)
+
+            backend.shared_cache.figure(key, build)
+        elif key not in memo:
+            memo[key] = draw(df)
+            drawn += 1
+        times.append(time.perf_counter() - began)
+
+        # This replica's own saves must be there, and every row another replica stored on the sheet
+        # before the last version check could have run
+        slack = args.version_ttl + (args.backend_ttl if store is None else 0) + 0.05
+        with saves["lock"]:
+            expected = {ts for ts, (by, stored_at) in saves[player].items()
+                        if by == index or (stored_at is not None and stored_at < read_at - slack)}
+        if not expected <= set(df["timestamp"]):
+            stale += 1
+    if kind == "synced":
+        backend.flush()
+        backend.sync.close()
+    results[index] = {"times": times, "stale": stale, "drawn": drawn,
+                      "stats": backend.shared_cache.stats() if backend.shared_cache else None}
+
+
+def run(mode, kind, args, tmpdir):
+    tmpdir = os.path.join(tmpdir, f"{kind}-{mode}")
+    os.mkdir(tmpdir)
+    fake = FakeSpreadsheet(latency=args.latency_ms / 1000)
+    # The fake has no quota, so neither does the gateway every SheetsBackend on it shares
+    shared_gateway(fake, reads_per_minute=None, writes_per_minute=None)
+    players = [f"Player{i}" for i in range(args.players)]
+    loader = sheets_backend(fake, 60)
+    rng = np.random.default_rng(0)
+    loader.bulk_append([r for p in players for r in synthetic_rows(p, args.rows, START, rng)])
+
+    max_bytes = int(args.max_mb * 2**20)
+    server = None
+    store = None
+    if mode == "sqlite":
+        store = SQLiteCache(os.path.join(tmpdir, f"{mode}.db"), max_bytes=max_bytes)
+    elif mode == "redis":
+        server = FakeRedisServer(latency=args.store_latency_ms / 1000)
+        store = RedisCache(port=server.port, max_bytes=max_bytes)
+
+    saves = {"lock": threading.Lock(), **{p: {} for p in players}}
+    results = {}
+    reads_before = fake.round_trips
+    threads = [threading.Thread(target=replica, args=(i, kind, fake, store, players, args, saves, results, tmpdir))
+               for i in range(args.replicas)]
+    began = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - began
+    round_trips = fake.round_trips - reads_before
+
+    # Once every version check has expired, each replica has to agree with the sheet
+    mismatched = 0
+    if store is not None:
+        time.sleep(args.version_ttl)
+        truth = SheetsBackend(fake, ttl=0)
+        for p in players:
+            expected = truth.snapshot(p)
+            seen = make_backend(kind, fake, args, os.path.join(tmpdir, "check.db"))
+            seen.shared_cache = SharedCache(store)
+            if kind == "synced":
+                seen.flush()
+            got = seen.snapshot(p)
+            if kind == "synced":
+                seen.sync.close()
+            cols = list(expected.columns)
+            if len(got) != len(expected) or not got[cols].equals(expected[cols]):
+                mismatched += 1
+        store_stats = store.stats()
+        store.close()
+    else:
+        store_stats = None
+    if server is not None:
+        server.close()
+
+    kinds = {"snapshot": [0, 0], "figure": [0, 0]}  # [found, lookups]
+    for r in results.values():
+        for kind, c in (r["stats"] or {}).get("kinds", {}).items():
+            lookups = c["local"] + c["hits"] + c["waits"] + c["misses"]
+            kinds[kind][0] += lookups - c["misses"]
+            kinds[kind][1] += lookups
+    return {
+        "elapsed": elapsed, "times": [t for r in results.values() for t in r["times"]],
+        "stale": sum(r["stale"] for r in results.values()), "drawn": sum(r["drawn"] for r in results.values()),
+        "round_trips": round_trips, "kinds": kinds, "store": store_stats, "mismatched": mismatched,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--replicas", type=int, default=4)
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=500, help="history per player")
+    parser.add_argument("--reruns", type=int, default=40, help="per replica")
+    parser.add_argument("--save-every", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="per sheet request")
+    parser.add_argument("--store-latency-ms", type=float, default=0.5, help="per command to the fake Redis")
+    parser.add_argument("--backend-ttl", type=float, default=60.0)
+    parser.add_argument("--version-ttl", type=float, default=1.0)
+    parser.add_argument("--sync-interval", type=float, default=0.5, help="seconds between a synced replica's pushes")
+    parser.add_argument("--max-mb", type=float, default=64.0, help="store size bound")
+    args = parser.parse_args()
+
+    print(f"{args.replicas} replicas x {args.reruns} reruns over {args.players} players of {args.rows} rows, "
+          f"a save every {args.save_every} reruns, sheet latency {args.latency_ms:g} ms")
+    print(f"{'backend':<8}{'mode':<8}{'p50 ms':>8}{'p95 ms':>8}{'sheet reqs':>11}{'drawn':>7}{'snap hit':>9}{'fig hit':>8}"
+          f"{'stale':>7}{'entries':>8}{'MB':>6}{'evicted':>8}{'total s':>8}")
+    failed = False
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for kind in args.backends:
+            for mode in args.modes:
+                r = run(mode, kind, args, tmpdir)
+                times = sorted(r["times"])
+                rates = [f"{found / lookups:.0%}" if lookups else "-" for found, lookups in r["kinds"].values()]
+                store = r["store"] or {}
+                print(f"{kind:<8}{mode:<8}{statistics.median(times) * 1000:8.1f}"
+                      f"{times[int(0.95 * (len(times) - 1))] * 1000:8.1f}"
+                      f"{r['round_trips']:11d}{r['drawn']:7d}{rates[0]:>9}{rates[1]:>8}{r['stale']:7d}"
+                      f"{store.get('entries', '-'):>8}"
+                      + (f"{store['bytes'] / 2**20:6.1f}" if store else f"{'-':>6}")
+                      + f"{store.get('evictions', '-'):>8}{r['elapsed']:8.1f}")
+                if mode != "none" and (r["stale"] or r["mismatched"]):
+                    failed = True
+                    print(f"  FAILED: {r['stale']} stale reruns, {r['mismatched']} players differ from the sheet")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Points, payload and build time per chart resolution for a long logging history.
+
+    python -m benchmarks.bench_downsample [--years 5] [--per-day 3]
+"""
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from aggregation import MAX_POINTS, RESOLUTIONS, lttb, metric_series
+from charts import activity_figure, metric_columns
+from tracker_forms import ACTIVITY_COLUMNS
+
+
+def synthetic_history(years, per_day, rng, activity="Games"):
+    rows = int(years * 365 * per_day)
+    start = np.datetime64(datetime(2020, 9, 1), "s")
+    offsets = np.sort(rng.integers(0, int(years * 365 * 86400), size=rows)).astype("timedelta64[s]")
+    trend = np.linspace(0, 10, rows)
+    df = pd.DataFrame({
+        c: np.round(trend + rng.normal(10, 4, size=rows), 1) for c in ACTIVITY_COLUMNS[activity]
+    })
+    df.insert(0, "timestamp", pd.to_datetime(start + offsets))
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--per-day", type=float, default=3, help="entries per day")
+    args = parser.parse_args()
+
+    df = synthetic_history(args.years, args.per_day, np.random.default_rng(0))
+    metrics = metric_columns(df)
+    print(f"{len(df)} rows x {len(metrics)} metrics\n")
+
+    print(f"{'resolution':<22}{'points/metric':>14}{'series':>10}{'figure':>10}{'to_json':>10}{'payload':>12}")
+    start = time.perf_counter()
+    fig = activity_figure(df, "Games", metrics)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    payload = len(fig.to_json())
+    print(f"{'all rows (before)':<22}{len(df):>14}{'-':>10}{built * 1000:>8.0f}ms"
+          f"{(time.perf_counter() - start) * 1000:>8.0f}ms{payload / 1024:>9.0f} KB")
+    for resolution in RESOLUTIONS:
+        start = time.perf_counter()
+        series = {m: metric_series(df, m, resolution, "mean") for m in metrics}
+        sampled = time.perf_counter() - start
+        start = time.perf_counter()
+        fig = activity_figure(df, "Games", metrics, series=series)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        payload = len(fig.to_json())
+        serialized = time.perf_counter() - start
+        points = max(len(s) for s in series.values())
+        print(f"{resolution:<22}{points:>14}{sampled * 1000:>8.0f}ms{built * 1000:>8.0f}ms"
+              f"{serialized * 1000:>8.0f}ms{payload / 1024:>9.0f} KB")
+
+    print()
+    y = df[metrics[0]].to_numpy()
+    for n in (len(df), len(df) * 10, len(df) * 100):
+        xs, ys = np.arange(n, dtype="float64"), np.resize(y, n)
+        start = time.perf_counter()
+        keep = lttb(xs, ys, MAX_POINTS)
+        print(f"lttb {n} -> {len(keep)} points: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
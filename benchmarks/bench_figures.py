@@ -0,0 +1,161 @@
+"""Chart payload and build time: one px.line per metric vs. one subplot figure per activity,
+and the court background inlined per figure vs. downscaled and referenced by URL.
+
+    python -m benchmarks.bench_figures [--rows 500] [--image court.jpg] [--update-baseline]
+
+Payload is the size of the figure JSON Streamlit ships to the browser.
+Every row is compared with benchmarks/baseline_figures.json and anything
+worse than its baseline by more than the tolerance below is flagged and the
+run exits 1. --update-baseline rewrites the file from this run instead.
+"""
+import argparse
+import base64
+import io
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from PIL import Image
+
+from charts import activity_figure, metric_columns
+from court_image import background_layout, data_uri, downscale, publish
+from tracker_forms import ACTIVITIES, ACTIVITY_COLUMNS
+
+BASELINE = Path(__file__).with_name("baseline_figures.json")
+
+# metric -> (relative, absolute) slack; a regression has to exceed both. Payload and
+# figure counts are deterministic for a given config, times only catch gross slowdowns
+TOLERANCES = {
+    "figures": (0, 0),
+    "build_ms": (0.5, 100),
+    "to_json_ms": (0.5, 100),
+    "payload_kb": (0.02, 4),
+}
+
+
+def synthetic_activity(activity, rows, rng):
+    df = pd.DataFrame({c: rng.integers(0, 40, size=rows).astype("int64") for c in ACTIVITY_COLUMNS[activity]})
+    df["timestamp"] = [datetime(2023, 9, 1) + timedelta(days=i) for i in range(rows)]
+    return df
+
+
+def legacy_figures(df, activity):
+    # What show_graphs did before: one px.line figure per numeric column
+    return [px.line(df, x="timestamp", y=col, title=f"{activity} - {col}", markers=True)
+            for col in metric_columns(df)]
+
+
+def synthetic_photo(width=2400, height=1600):
+    # Noisy gradient: compresses about as badly as a real photo (~3 MB as JPEG)
+    rng = np.random.default_rng(1)
+    gradient = np.linspace(0, 200, width, dtype=np.float32)[None, :, None]
+    pixels = np.clip(gradient + rng.normal(0, 40, (height, width, 3)), 0, 255).astype(np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, "JPEG", quality=95)
+    return out.getvalue()
+
+
+def measure(build):
+    start = time.perf_counter()
+    figures = build()
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    payload = sum(len(fig.to_json()) for fig in figures)
+    serialized = time.perf_counter() - start
+    return len(figures), built, serialized, payload
+
+
+def report(results, name, count, built, serialized, payload):
+    results[name] = {"figures": count, "build_ms": built * 1000, "to_json_ms": serialized * 1000,
+                     "payload_kb": payload / 1024}
+    print(f"{name:<24}{count:>8}{built * 1000:>8.0f}ms{serialized * 1000:>8.0f}ms{payload / 1024:>9.0f} KB")
+
+
+def regressions(current, baseline):
+    flagged = []
+    for name, metrics in current.items():
+        for metric, (relative, absolute) in TOLERANCES.items():
+            before = baseline.get(name, {}).get(metric)
+            if before is None:
+                continue
+            now = metrics[metric]
+            if now > before * (1 + relative) and now - before > absolute:
+                flagged.append(f"{name} {metric}: {now:.1f} vs baseline {before:.1f}")
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500, help="rows per activity")
+    parser.add_argument("--image", help="court photo to use (default: synthetic ~3 MB JPEG)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = {act: synthetic_activity(act, args.rows, rng) for act in ACTIVITIES}
+    modes = {
+        "per-metric px.line": lambda: [f for act, df in data.items() for f in legacy_figures(df, act)],
+        "subplots per activity": lambda: [activity_figure(df, act, metric_columns(df)) for act, df in data.items()],
+    }
+    results = {}
+    print(f"{'mode':<24}{'figures':>8}{'build':>10}{'to_json':>10}{'payload':>12}")
+    for name, build in modes.items():
+        report(results, name, *measure(build))
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            photo = f.read()
+    else:
+        photo = synthetic_photo()
+    print(f"\ncourt background: {len(photo) / 1024:.0f} KB upload, "
+          f"{len(downscale(photo)) / 1024:.0f} KB after downscaling")
+    with tempfile.TemporaryDirectory() as static_dir:
+        start = time.perf_counter()
+        name = publish(photo, static_dir)
+        prepared = time.perf_counter() - start
+        sources = {
+            "inline upload (before)": f"data:image/png;base64,{base64.b64encode(photo).decode()}",
+            "inline downscaled": data_uri(photo),
+            "static URL": f"app/static/court/{name}",
+        }
+        print(f"downscale + publish once: {prepared * 1000:.0f} ms ({name})")
+        print(f"{'background':<24}{'figures':>8}{'build':>10}{'to_json':>10}{'payload':>12}")
+        for name, source in sources.items():
+            report(results, name, *measure(lambda: [
+                activity_figure(df, act, metric_columns(df), background=background_layout(source))
+                for act, df in data.items()
+            ]))
+
+    # A given photo has its own payloads; only the synthetic one is comparable across machines
+    config = {"rows": args.rows, "image": Path(args.image).name if args.image else None}
+    if args.update_baseline:
+        stored = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        rows = stored.get("rows", {}) if stored.get("config") == config else {}
+        rows.update({name: {k: round(v, 1) for k, v in m.items()} for name, m in results.items()})
+        BASELINE.write_text(json.dumps({"config": config, "rows": rows}, indent=2) + "\n")
+        print(f"baseline written to {BASELINE.name}")
+        return
+
+    if not BASELINE.exists():
+        print("no baseline yet: run with --update-baseline")
+        return
+    stored = json.loads(BASELINE.read_text())
+    if stored.get("config") != config:
+        print(f"baseline was recorded with {stored.get('config')}, not {config}: not compared")
+        return
+    flagged = regressions(results, stored["rows"])
+    for line in flagged:
+        print(f"REGRESSION {line}")
+    if not flagged:
+        print("no regressions against the baseline")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Backup import: legacy per-row loop vs. the chunked bulk pipeline.
+
+    python -m benchmarks.bench_import [--rows 50000] [--latency-ms 0] [--rtt-ms 50]
+
+Builds a synthetic workbook, imports it both ways into a FakeSupabase and
+reports wall time and round trips. --latency-ms sleeps inside every fake
+call; --rtt-ms only feeds the projected time for a real network.
+"""
+import argparse
+import time
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fakes import FakeSupabase
+from supabase_import import import_backup
+
+ACTIVITY_COLUMNS = {
+    "Games": ["Points", "Assists", "Turnovers", "Steals", "3P Made", "3P Attempt", "2P Made", "2P Attempt"],
+    "Shooting": ["21 Drill Time (s)", "10 Layups Time (s)", "Around Key", "3P in 4min", "3P Made", "2P Made"],
+    "Conditioning": ["17s Drill Time (s)", "1 Suicide Time (s)", "5 Suicides Time (s)", "Defensive Slides"],
+    "Dribbling": ["1-Ball Minutes", "2-Ball Minutes"],
+}
+
+
+def synthetic_workbook(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    activity = rng.choice(list(ACTIVITY_COLUMNS), size=rows)
+    df = pd.DataFrame({
+        "user_id": "bench",
+        "activity": activity,
+        "timestamp": pd.Timestamp("2020-01-01") + pd.to_timedelta(np.arange(rows) * 3600, unit="s"),
+    })
+    for act, columns in ACTIVITY_COLUMNS.items():
+        mask = activity == act
+        for col in columns:
+            if col not in df.columns:
+                df[col] = np.nan
+            df.loc[mask, col] = rng.integers(0, 40, size=mask.sum())
+    output = BytesIO()
+    df.to_excel(output, index=False, engine="xlsxwriter")
+    return output.getvalue()
+
+
+def legacy_import(client, df_import, user_id):
+    # The loop the app used before supabase_import, kept verbatim for comparison
+    for _, row in df_import.iterrows():
+        row_dict = row.to_dict()
+        row_dict["user_id"] = user_id
+        if "timestamp" not in row_dict or pd.isna(row_dict["timestamp"]):
+            row_dict["timestamp"] = datetime.now().isoformat()
+        client.table("user_stats").insert(row_dict).execute()
+
+
+def run(label, fn, client, rtt_ms):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    projected = elapsed + client.round_trips * rtt_ms / 1000
+    print(f"{label:<22} {elapsed:8.2f} s  {client.round_trips:7d} round trips  "
+          f"~{projected:8.1f} s at {rtt_ms:g} ms RTT")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--rtt-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    workbook = synthetic_workbook(args.rows)
+    df_import = pd.read_excel(BytesIO(workbook), engine="openpyxl")
+    print(f"{args.rows} rows, {len(workbook) / 1e6:.1f} MB workbook, read in {time.perf_counter() - start:.1f} s")
+
+    legacy = FakeSupabase(latency=args.latency_ms / 1000)
+    run("legacy iterrows loop", lambda: legacy_import(legacy, df_import, "bench"), legacy, args.rtt_ms)
+
+    bulk = FakeSupabase(latency=args.latency_ms / 1000)
+    run("bulk import", lambda: import_backup(bulk, df_import, "bench", chunk_size=args.chunk_size),
+        bulk, args.rtt_ms)
+
+    before = bulk.round_trips
+    inserted, skipped = import_backup(bulk, df_import, "bench", chunk_size=args.chunk_size)
+    print(f"re-import (resume)     {inserted} inserted, {skipped} skipped, {bulk.round_trips - before} round trips")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Season-report throughput against the number of worker processes.
+
+    python -m benchmarks.bench_reports [--players 24] [--rows 2000] [--workers 0 1 2 4]
+                                       [--formats html xlsx]
+
+Builds every synthetic player's report with season_report.generate() into a
+temporary directory, once per --workers value. 0 builds in this process and
+is the serial baseline the others are compared with. Reports wall time,
+players/s, rows/s, speedup, efficiency (speedup per worker) and the largest
+worker's peak RSS. Speedup can only exceed 1 up to the number of CPUs; the
+default worker counts stop there.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.bench_storage import synthetic_rows
+from season_report import FORMATS, generate
+from storage import MemoryBackend
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default_workers = [0] + [n for n in (1, 2, 4, 8, 16) if n <= cpus]
+    if cpus not in default_workers:
+        default_workers.append(cpus)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=24)
+    parser.add_argument("--rows", type=int, default=2000, help="entries per player")
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["html", "xlsx"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    backend = MemoryBackend()
+    players = [f"Player{i:02d}" for i in range(args.players)]
+    for player in players:
+        backend.bulk_append(synthetic_rows(player, args.rows, datetime(2024, 9, 1), rng))
+
+    print(f"{args.players} players x {args.rows} entries, formats {' '.join(args.formats)}, {cpus} CPUs")
+    if cpus == 1:
+        print("(one CPU: extra workers can only add overhead here)")
+    print(f"{'workers':>7}{'seconds':>9}{'players/s':>11}{'rows/s':>10}{'speedup':>9}{'efficiency':>11}"
+          f"{'worker MB':>10}")
+    serial = None
+    failed = False
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as out_dir:
+            start = time.perf_counter()
+            results, failures = generate(backend, players, out_dir, args.formats, workers=workers, log=lambda _: None)
+            seconds = time.perf_counter() - start
+        if failures or len(results) != len(players):
+            failed = True
+            print(f"  FAILED with {workers} workers: {len(results)} reports, {failures}")
+            continue
+        serial = serial or (seconds if workers == 0 else None)
+        speedup = serial / seconds if serial else float("nan")
+        peak = max(r["peak_rss_mb"] or 0 for r in results)
+        print(f"{workers:>7}{seconds:9.2f}{len(results) / seconds:11.2f}"
+              f"{sum(r['rows'] for r in results) / seconds:10,.0f}{speedup:9.2f}{speedup / max(workers, 1):11.2f}"
+              f"{peak:10.0f}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
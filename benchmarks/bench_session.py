@@ -0,0 +1,93 @@
+"""Session storage: rows as a list of dicts vs. MemoryBackend's column buffers.
+
+    python -m benchmarks.bench_session [--rows 500 5000 20000] [--reruns 50] [--save-every 5]
+
+"list of dicts" is how session data used to be kept: one dict per row,
+turned into a fresh DataFrame (and normalized) on every read. For each
+history size: memory held by the stored rows (tracemalloc), and the time
+for a run of reruns that each read the snapshot once, with a save every
+--save-every reruns.
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from storage import MemoryBackend
+from storage.base import StorageBackend
+from tracker_forms import ACTIVITIES, ACTIVITY_COLUMNS
+
+USER = "me"
+
+
+class ListBackend(StorageBackend):
+    """The previous MemoryBackend: a list of row dicts per user."""
+
+    def __init__(self):
+        super().__init__()
+        self._rows = {}
+
+    def users(self):
+        return list(self._rows)
+
+    def _write(self, rows):
+        for row in rows:
+            self._rows.setdefault(row["user_id"], []).append(dict(row))
+
+    def _read(self, user_id, activity=None, since=None, until=None, columns=None):
+        return pd.DataFrame(self._rows.get(user_id, []))
+
+
+def history(count, rng):
+    start = datetime(2023, 9, 1)
+    rows = []
+    for i in range(count):
+        activity = ACTIVITIES[i % len(ACTIVITIES)]
+        row = {c: int(v) for c, v in zip(ACTIVITY_COLUMNS[activity], rng.integers(0, 40, len(ACTIVITY_COLUMNS[activity])))}
+        rows.append({"user_id": USER, "activity": activity, "timestamp": start + timedelta(hours=6 * i), **row})
+    return rows
+
+
+def stored_bytes(make, rows):
+    backend = make()
+    # Team rollups are the same whichever way rows are kept; leave them out
+    backend.rollups_on_write = False
+    tracemalloc.start()
+    backend.bulk_append(rows)
+    backend.snapshot(USER)  # include whatever the backend keeps for reads
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return backend, size
+
+
+def reruns(backend, count, save_every):
+    start = time.perf_counter()
+    for i in range(count):
+        if save_every and i % save_every == 0:
+            backend.append(USER, "Games", {"Points": i, "Assists": 1})
+        backend.snapshot(USER)
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[500, 5000, 20000])
+    parser.add_argument("--reruns", type=int, default=50)
+    parser.add_argument("--save-every", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>7}  {'storage':<15}{'held MB':>9}{'ms/rerun':>10}")
+    for count in args.rows:
+        rows = history(count, rng)
+        for name, make in [("list of dicts", ListBackend), ("column buffers", MemoryBackend)]:
+            backend, size = stored_bytes(make, rows)
+            per_rerun = reruns(backend, args.reruns, args.save_every)
+            print(f"{count:>7}  {name:<15}{size / 2**20:9.2f}{per_rerun * 1000:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Concurrent sessions on one spreadsheet, with and without the shared SheetsGateway.
+
+    python -m benchmarks.bench_sheets [--sessions 1 5 10 20] [--rounds 3] [--quota 60]
+                                      [--window-s 10] [--latency-ms 50]
+
+A team logging after practice: every session saves a row straight to the
+spreadsheet, re-reads its player's sheet and opens the team rollups,
+--rounds times. Each session builds its own SheetsBackend (the worst case;
+the PWA app shares one per process), all on one FakeSpreadsheet that allows
+--quota reads and --quota writes per --window-s seconds (Sheets allows 60 a
+minute per user; a shorter window keeps the run short) and answers 429
+beyond that.
+
+"direct" is a gateway with no quota, coalescing or retries, which is how
+the backend called the API before; "gateway" is one sized to the quota.
+For each: per-operation latency, errors reaching sessions, requests sent,
+429s from the fake, reads joined and appends merged. Exits 1 if the gateway
+lets an error through or loses a row.
+"""
+import argparse
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.fakes import FakeSpreadsheet
+from sheets_gateway import SheetsGateway
+from storage import SheetsBackend
+
+MODES = {
+    "direct": lambda fake, quota, window: SheetsGateway(
+        fake, reads_per_minute=None, writes_per_minute=None, max_retries=0, coalesce=False
+    ),
+    "gateway": lambda fake, quota, window: SheetsGateway(
+        fake, reads_per_minute=quota, writes_per_minute=quota, window=window, backoff=window / 20
+    ),
+}
+
+
+def session(index, gateway, fake, rounds, start, times, errors):
+    player = f"Player{index}"
+    backend = SheetsBackend(fake, ttl=0, gateway=gateway)
+    backend.rollup_ttl = 0
+    for i in range(rounds):
+        for op, action in [
+            ("save", lambda: backend.append(player, "Games", {
+                "Points": i, "Assists": index, "timestamp": start + timedelta(minutes=i),
+            })),
+            ("read", lambda: backend.query(player)),
+            ("team", lambda: backend.team_rollups()),
+        ]:
+            began = time.perf_counter()
+            try:
+                action()
+            except Exception as e:
+                errors.append(f"{op}: {type(e).__name__}: {str(e)[:60]}")
+                continue
+            times[op].append(time.perf_counter() - began)
+
+
+def run(mode, sessions, args):
+    fake = FakeSpreadsheet(latency=args.latency_ms / 1000, read_quota=args.quota, write_quota=args.quota,
+                           quota_window=args.window_s)
+    gateway = MODES[mode](fake, args.quota, args.window_s)
+    times = {"save": [], "read": [], "team": []}
+    errors = []
+    start = datetime(2024, 1, 6, 18, 0)
+    threads = [
+        threading.Thread(target=session, args=(i, gateway, fake, args.rounds, start, times, errors))
+        for i in range(sessions)
+    ]
+    began = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - began
+    stored = sum(len(ws.rows) - 1 for title, ws in fake.worksheets_by_title.items() if not title.startswith("_"))
+    return {
+        "elapsed": elapsed, "times": times, "errors": errors, "stored": stored,
+        "requests": fake.round_trips, "rejected": fake.rejected, "stats": gateway.stats(),
+    }
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--quota", type=int, default=60, help="reads and writes allowed per window")
+    parser.add_argument("--window-s", type=float, default=10.0)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    print(f"quota {args.quota} reads + {args.quota} writes per {args.window_s:g}s, "
+          f"latency {args.latency_ms:g} ms, {args.rounds} rounds of save / read / team per session")
+    print(f"{'sessions':>8}  {'mode':<8}{'save p50':>9}{'p95':>7}{'read p50':>9}{'p95':>7}{'team p50':>9}{'p95':>7}"
+          f"{'errors':>7}{'requests':>9}{'429s':>6}{'joined':>7}{'merged':>7}{'total s':>8}")
+    failed = False
+    for sessions in args.sessions:
+        for mode in MODES:
+            r = run(mode, sessions, args)
+            t = r["times"]
+            print(f"{sessions:>8}  {mode:<8}"
+                  + "".join(f"{percentile(t[op], 0.5):9.0f}{percentile(t[op], 0.95):7.0f}" for op in t)
+                  + f"{len(r['errors']):7d}{r['requests']:9d}{r['rejected']:6d}"
+                  + f"{r['stats']['coalesced_reads']:7d}{r['stats']['merged_appends']:7d}{r['elapsed']:8.1f}")
+            if mode == "gateway":
+                expected = sessions * args.rounds
+                if r["errors"] or r["stored"] != expected:
+                    failed = True
+                    print(f"  FAILED: {len(r['errors'])} errors {r['errors'][:3]}, {r['stored']} of {expected} rows stored")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Cold start of the three Streamlit apps, from `python -X importtime`.
+
+    python -m benchmarks.bench_startup [--apps plotly supabase pwa] [--repeat 3] [--top 8]
+                                       [--update-baseline]
+
+Each app's first run happens in a fresh interpreter started with
+-X importtime, after importing only what the Streamlit server itself has
+loaded (streamlit, plus the instrumentation and form modules). The run is
+split at the moment the entry forms have been drawn:
+
+  forms  script start until entry_section() returns: what a new session
+         waits for before it can log anything
+  rest   the remainder of the first run (backend, graphs, export)
+
+For each part it reports wall time, time spent importing (the sum of
+importtime's self times, background threads included) and the number of
+modules imported, with the heaviest top-level imports. Medians of --repeat
+runs are compared with benchmarks/baseline_startup.json; --update-baseline
+rewrites the file from this run instead. The apps run in a temporary
+directory, so their journals start empty; remote connections fail offline,
+which the apps already tolerate.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).with_name("baseline_startup.json")
+APPS = {
+    "plotly": "basketball_app_final_plotly.py",
+    "supabase": "basketball_tracker_supabase.py",
+    "pwa": "basketball_tracker_pwa.py",
+}
+MARKER = "bench_startup:"
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+# metric -> (relative, absolute) slack; a regression has to exceed both. Module counts
+# are deterministic, times only catch gross slowdowns
+TOLERANCES = {
+    "forms_ms": (0.5, 150),
+    "forms_import_ms": (0.5, 150),
+    "forms_modules": (0.05, 5),
+    "total_ms": (0.5, 300),
+    "total_modules": (0.05, 20),
+}
+
+
+# -------------------------------
+# Child: one cold first run
+# -------------------------------
+def child(app):
+    def mark(phase):
+        sys.stderr.write(f"{MARKER} {phase} {time.perf_counter():.6f}\n")
+        sys.stderr.flush()
+
+    # What a running server already has loaded before any script runs
+    import streamlit  # noqa: F401
+    from streamlit.testing.v1 import AppTest
+
+    import instrumentation  # noqa: F401
+    import tracker_forms
+
+    entry_section = tracker_forms.entry_section
+
+    def entry_section_then_mark(*args, **kwargs):
+        result = entry_section(*args, **kwargs)
+        mark("forms")
+        return result
+
+    tracker_forms.entry_section = entry_section_then_mark
+    at = AppTest.from_file(str(ROOT / APPS[app]), default_timeout=120)
+    mark("start")
+    at.run()
+    mark("end")
+    if at.exception:
+        sys.stderr.write(f"{MARKER} error {at.exception[0].message}\n")
+
+
+# -------------------------------
+# Parent: run and parse
+# -------------------------------
+def parse(stderr):
+    """Split importtime lines at the markers. Returns ({phase: {ms, import_ms, modules, top}}, error)."""
+    phases = {"forms": [], "rest": []}
+    times, error, phase = {}, None, None
+    for line in stderr.splitlines():
+        if line.startswith(MARKER):
+            _, name, value = line.split(" ", 2)
+            if name == "error":
+                error = value
+                continue
+            times[name] = float(value)
+            phase = {"start": "forms", "forms": "rest", "end": None}[name]
+            continue
+        match = IMPORT_LINE.match(line)
+        if match and phase is not None:
+            self_us, cumulative_us, indent, module = match.groups()
+            phases[phase].append((module, int(self_us), int(cumulative_us), len(indent) == 0))
+    if "forms" not in times:
+        return None, error or "the entry forms were never drawn"
+    ends = {"forms": times["forms"] - times["start"], "rest": times["end"] - times["forms"]}
+    result = {}
+    for name, imports in phases.items():
+        top = sorted(((m, c) for m, _, c, top_level in imports if top_level), key=lambda item: -item[1])
+        result[name] = {
+            "ms": ends[name] * 1000,
+            "import_ms": sum(s for _, s, _, _ in imports) / 1000,
+            "modules": len(imports),
+            "top": [(m, c / 1000) for m, c in top],
+        }
+    return result, error
+
+
+def cold_run(app, workdir):
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(ROOT), os.environ.get("PYTHONPATH", "")])}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "benchmarks.bench_startup", "--child", app],
+        cwd=workdir, env=env, capture_output=True, text=True, timeout=300,
+    )
+    result, error = parse(proc.stderr)
+    if result is None:
+        raise SystemExit(f"{app}: {error}\n{proc.stderr[-2000:]}")
+    return result, error
+
+
+def summary(runs):
+    def median(phase, key):
+        return statistics.median(r[phase][key] for r in runs)
+
+    return {
+        "forms_ms": median("forms", "ms"),
+        "forms_import_ms": median("forms", "import_ms"),
+        "forms_modules": median("forms", "modules"),
+        "total_ms": median("forms", "ms") + median("rest", "ms"),
+        "total_modules": median("forms", "modules") + median("rest", "modules"),
+    }
+
+
+def regressions(current, baseline):
+    flagged = []
+    for app, metrics in current.items():
+        for metric, (relative, absolute) in TOLERANCES.items():
+            before = baseline.get(app, {}).get(metric)
+            if before is None:
+                continue
+            now = metrics[metric]
+            if now > before * (1 + relative) and now - before > absolute:
+                flagged.append(f"{app} {metric}: {now:.1f} vs baseline {before:.1f}")
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--apps", nargs="+", choices=list(APPS), default=list(APPS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8, help="heaviest top-level imports to list per part")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--child", choices=list(APPS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    results = {}
+    for app in args.apps:
+        runs = []
+        for i in range(args.repeat):
+            with tempfile.TemporaryDirectory() as workdir:
+                run, error = cold_run(app, workdir)
+            runs.append(run)
+        results[app] = summary(runs)
+        last = runs[-1]
+        print(f"== {app} (median of {args.repeat} cold starts)")
+        print(f"  {'part':<8}{'ms':>9}{'import ms':>11}{'modules':>9}")
+        for phase in ("forms", "rest"):
+            print(f"  {phase:<8}{statistics.median(r[phase]['ms'] for r in runs):9.1f}"
+                  f"{statistics.median(r[phase]['import_ms'] for r in runs):11.1f}"
+                  f"{statistics.median(r[phase]['modules'] for r in runs):9.0f}")
+        for phase in ("forms", "rest"):
+            top = ", ".join(f"{m} {ms:.0f}" for m, ms in last[phase]["top"][:args.top]) or "-"
+            print(f"  heaviest before {'the forms' if phase == 'forms' else 'the end'} (ms): {top}")
+        if error:
+            print(f"  the run raised: {error}")
+
+    config = {"repeat": args.repeat}
+    if args.update_baseline:
+        stored = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        apps = stored.get("apps", {}) if stored.get("config") == config else {}
+        apps.update({app: {k: round(v, 1) for k, v in m.items()} for app, m in results.items()})
+        BASELINE.write_text(json.dumps({"config": config, "apps": apps}, indent=2) + "\n")
+        print(f"baseline written to {BASELINE.name}")
+        return
+
+    if not BASELINE.exists():
+        print("no baseline yet: run with --update-baseline")
+        return
+    stored = json.loads(BASELINE.read_text())
+    if stored.get("config") != config:
+        print(f"baseline was recorded with {stored.get('config')}, not {config}: not compared")
+        return
+    flagged = regressions(results, stored["apps"])
+    for line in flagged:
+        print(f"REGRESSION {line}")
+    if not flagged:
+        print("no regressions against the baseline")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Identical workloads against every storage backend.
+
+    python -m benchmarks.bench_storage [--users 5] [--history 2000] [--saves 20] [--latency-ms 0]
+
+For each backend: bulk-load a history per user, make single saves, then
+run snapshot, per-activity and time-window queries. Reports wall time per
+phase and round trips (for the remote stand-ins), and checks that every
+backend returned the same rows as the in-memory reference; a mismatch
+exits non-zero, so the run doubles as a conformance check.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from benchmarks.fakes import FakeSpreadsheet, FakeSupabase
+from sheets_gateway import shared_gateway
+from storage import LocalFileBackend, MemoryBackend, SheetsBackend, SupabaseBackend
+from tracker_forms import ACTIVITIES, ACTIVITY_COLUMNS, STAT_COLUMNS
+
+START = datetime(2023, 9, 1)
+
+
+def synthetic_rows(user_id, count, start, rng):
+    rows = []
+    for i in range(count):
+        activity = ACTIVITIES[rng.integers(len(ACTIVITIES))]
+        row = {c: int(rng.integers(0, 40)) for c in ACTIVITY_COLUMNS[activity]}
+        # Whole seconds: Sheets keeps no finer resolution
+        row.update(user_id=user_id, activity=activity, timestamp=start + timedelta(hours=6 * i))
+        rows.append(row)
+    return rows
+
+
+def make_backends(latency, tmpdir):
+    supabase = FakeSupabase(latency=latency)
+    sheets = FakeSpreadsheet(latency=latency)
+    # The fake has no quota, so neither does the gateway every SheetsBackend on it shares
+    shared_gateway(sheets, reads_per_minute=None, writes_per_minute=None)
+    return {
+        "memory": (MemoryBackend(), None),
+        "local-parquet": (LocalFileBackend(f"{tmpdir}/parquet"), None),
+        "supabase": (SupabaseBackend(supabase, columns=STAT_COLUMNS), supabase),
+        "sheets": (SheetsBackend(sheets), sheets),
+    }
+
+
+def fingerprint(df):
+    """Row count plus per-column sums: enough to spot a backend that drops or mangles rows."""
+    stats = [c for c in STAT_COLUMNS if c in df.columns]
+    return len(df), tuple(round(float(df[c].fillna(0).astype(float).sum()), 6) for c in stats)
+
+
+def run_workload(backend, users, history, saves, seed):
+    rng = np.random.default_rng(seed)
+    timings, results = {}, {}
+
+    start = time.perf_counter()
+    for user_id in users:
+        backend.bulk_append(synthetic_rows(user_id, history, START, rng))
+    timings["bulk_append"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    save_start = START + timedelta(hours=6 * history)
+    for user_id in users:
+        for row in synthetic_rows(user_id, saves, save_start, rng):
+            backend.append(row.pop("user_id"), row.pop("activity"), row)
+    if hasattr(backend, "flush"):
+        backend.flush()
+    timings["append"] = time.perf_counter() - start
+
+    window = START + timedelta(hours=6 * (history // 2))
+    start = time.perf_counter()
+    for user_id in users:
+        results[(user_id, "snapshot")] = fingerprint(backend.snapshot(user_id))
+        for activity in ACTIVITIES:
+            results[(user_id, activity)] = fingerprint(backend.query(user_id, activity=activity))
+        results[(user_id, "window")] = fingerprint(backend.query(user_id, since=window, until=window + timedelta(days=60)))
+    timings["query"] = time.perf_counter() - start
+    return timings, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--history", type=int, default=2000, help="rows bulk-loaded per user")
+    parser.add_argument("--saves", type=int, default=20, help="single saves per user")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    users = [f"player{i}" for i in range(args.users)]
+    reference = None
+    failed = False
+    print(f"{'backend':<15}{'bulk_append':>12}{'append':>10}{'query':>10}{'round trips':>13}  conformance")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, (backend, remote) in make_backends(args.latency_ms / 1000, tmpdir).items():
+            timings, results = run_workload(backend, users, args.history, args.saves, args.seed)
+            reference = reference or results
+            mismatches = [key for key in reference if results.get(key) != reference[key]]
+            failed |= bool(mismatches)
+            trips = remote.round_trips if remote else "-"
+            status = "ok" if not mismatches else f"MISMATCH {mismatches[:3]}"
+            print(f"{name:<15}{timings['bulk_append']:>11.3f}s{timings['append']:>9.3f}s"
+                  f"{timings['query']:>9.3f}s{trips:>13}  {status}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Offline-first sync against the Supabase and Sheets stand-ins.
+
+    python -m benchmarks.bench_sync [--saves 50] [--latency-ms 50]
+
+For each remote: save latency straight to the remote vs. into the journal;
+saves made while the remote is offline; catch-up once it is back; a second
+device looking at the player first (served from its journal at once, the
+history pulled in the background); two saves in the same second; and a push
+that dies before marking its rows synced being retried. Exits 1 if any row
+is lost or duplicated on either side.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.fakes import FakeSpreadsheet, FakeSupabase
+from sheets_gateway import shared_gateway
+from storage import SheetsBackend, SupabaseBackend, SyncedBackend
+from tracker_forms import STAT_COLUMNS
+
+USER = "player1"
+
+
+def remotes(latency):
+    supabase = FakeSupabase(latency=latency)
+    sheets = FakeSpreadsheet(latency=latency)
+    # The fake has no quota, so neither does the gateway every SheetsBackend on it shares
+    shared_gateway(sheets, reads_per_minute=None, writes_per_minute=None)
+    return {
+        "supabase": (supabase, lambda: SupabaseBackend(supabase, columns=STAT_COLUMNS)),
+        "sheets": (sheets, lambda: SheetsBackend(sheets, ttl=60)),
+    }
+
+
+def save_rows(start, count, offset=0):
+    return [
+        {"Points": i + offset, "Assists": i % 7, "Turnovers": i % 3, "timestamp": start + timedelta(minutes=i + offset)}
+        for i in range(count)
+    ]
+
+
+def timed_saves(backend, rows):
+    times = []
+    for row in rows:
+        start = time.perf_counter()
+        backend.append(USER, "Games", dict(row))
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, max(times) * 1000
+
+
+def remote_count(remote):
+    return len(remote.changes_since(USER))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--saves", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    start = datetime(2024, 1, 6, 9, 0)
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (fake, connect) in remotes(args.latency_ms / 1000).items():
+            print(f"== {name} (remote latency {args.latency_ms:g} ms)")
+            direct = connect()
+            p50, worst = timed_saves(direct, save_rows(start - timedelta(days=30), args.saves))
+            print(f"  save straight to remote:   median {p50:7.2f} ms   max {worst:7.2f} ms")
+
+            # Device A works offline
+            fake.offline = True
+            device_a = SyncedBackend(connect, os.path.join(tmp, f"{name}_a.db"), interval=0.05, pull_interval=0.2)
+            p50, worst = timed_saves(device_a, save_rows(start, args.saves))
+            print(f"  save into journal offline: median {p50:7.2f} ms   max {worst:7.2f} ms"
+                  f"   pending {device_a.pending()}   last error: {device_a.sync.last_error}")
+
+            # Back online: push in batches
+            fake.offline = False
+            trips = fake.round_trips
+            t0 = time.perf_counter()
+            device_a.flush()
+            print(f"  catch-up push: {args.saves} rows in {(time.perf_counter() - t0) * 1000:.0f} ms, "
+                  f"{fake.round_trips - trips} round trips, pending {device_a.pending()}")
+
+            # A push that stores rows but dies before marking them synced is pushed again: no duplicates
+            original = device_a.journal.mark_synced
+            device_a.journal.mark_synced = lambda seqs: (_ for _ in ()).throw(RuntimeError("killed"))
+            for row in save_rows(start, 5, offset=args.saves):
+                device_a.append(USER, "Games", row)
+            device_a.flush()
+            device_a.journal.mark_synced = original
+            device_a.flush()
+
+            # Device B's first look is served from its journal; the history is pulled in the background
+            device_b = SyncedBackend(connect, os.path.join(tmp, f"{name}_b.db"), interval=60)
+            t0 = time.perf_counter()
+            first = len(device_b.snapshot(USER))
+            first_ms = (time.perf_counter() - t0) * 1000
+            while device_b.awaiting_pull(USER):
+                time.sleep(0.005)
+            on_b = len(device_b.snapshot(USER))
+            print(f"  second device first look: {first} rows in {first_ms:.1f} ms, "
+                  f"then {on_b} rows pulled in the background after {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+            # B saves twice in one second; A picks both up on its next pull
+            for points in (99, 98):
+                device_b.append(USER, "Games", {"Points": points, "timestamp": start + timedelta(days=1)})
+            device_b.flush()
+            device_a.flush()
+
+            expected = 2 * args.saves + 5 + 2
+            counts = {
+                "remote": remote_count(device_a.sync.remote()),
+                "device A": len(device_a.snapshot(USER)),
+                "device B": len(device_b.snapshot(USER)),
+            }
+            ok = all(c == expected for c in counts.values())
+            failed |= not ok
+            print(f"  rows: {counts}, expected {expected} everywhere: {'ok' if ok else 'MISMATCH'}")
+            for device in (device_a, device_b):
+                device.sync.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Team dashboard cost: one query per player vs. the weekly rollups, as history grows.
+
+    python -m benchmarks.bench_team [--players 50] [--years 1 3 5] [--per-week 4]
+
+"per-player queries" is what a team view costs without rollups: every player's
+history read and averaged on each render. "rollups" is backend.team_rollups()
+plus the summary and leaderboard the dashboard shows, over all time and over
+a fixed window (which stays flat however long the history gets).
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from rollups import leaderboard, team_summary
+from storage import LocalFileBackend, MemoryBackend
+from supabase_query import window_start
+from tracker_forms import ACTIVITY_COLUMNS
+
+ACTIVITY = "Games"
+
+
+def history(players, years, per_week, rng):
+    rows = []
+    entries = int(years * 52 * per_week)
+    start = datetime.now() - timedelta(days=int(years * 365))
+    step = timedelta(days=7 / per_week)
+    for p in range(players):
+        stats = rng.integers(0, 20, size=(entries, len(ACTIVITY_COLUMNS[ACTIVITY])))
+        for i in range(entries):
+            rows.append({"user_id": f"player{p:02d}", "activity": ACTIVITY, "timestamp": start + i * step,
+                         **dict(zip(ACTIVITY_COLUMNS[ACTIVITY], stats[i].tolist()))})
+    return rows
+
+
+def per_player_queries(backend):
+    frames = [backend.query(u, activity=ACTIVITY) for u in backend.users()]
+    df = pd.concat(frames, ignore_index=True)
+    return df.groupby("user_id")[ACTIVITY_COLUMNS[ACTIVITY]].mean()
+
+
+def from_rollups(backend, since=None):
+    rollups = backend.team_rollups(since=since, activity=ACTIVITY)
+    summary = team_summary(rollups)
+    return leaderboard(rollups, summary, "Points")
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--per-week", type=float, default=4, help="entries per player per week")
+    args = parser.parse_args()
+
+    season = window_start("Last 90 days")
+    print(f"{'backend':<15}{'years':>6}{'rows':>9}{'rollup rows':>13}{'per-player queries':>20}"
+          f"{'rollups':>10}{'rollups, 90 days':>18}")
+    for years in args.years:
+        rows = history(args.players, years, args.per_week, np.random.default_rng(0))
+        with tempfile.TemporaryDirectory() as root:
+            for name, backend in [("memory", MemoryBackend()), ("local-parquet", LocalFileBackend(root))]:
+                backend.bulk_append(rows)
+                naive = timed(lambda: per_player_queries(backend))
+                rolled = timed(lambda: from_rollups(backend))
+                recent = timed(lambda: from_rollups(backend, season))
+                size = len(backend.team_rollups(activity=ACTIVITY))
+                print(f"{name:<15}{years:>6g}{len(rows):>9}{size:>13}{naive * 1000:>18.0f}ms"
+                      f"{rolled * 1000:>8.0f}ms{recent * 1000:>16.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+"""In-process stand-ins for remote backends, used by the benchmarks.
+
+FakeSupabase mimics the slice of the supabase-py query builder the apps use
+(table().select()/insert() plus filters, execute()). Every execute() counts
+as one round trip and sleeps for `latency` seconds to model the network;
+`bytes_written` adds up the size of every payload sent. FakeSpreadsheet does
+the same for the gspread calls SheetsBackend makes, and can enforce Sheets'
+per-minute read and write quotas.
+Setting `offline = True` on either makes every call raise ConnectionError.
+
+FakeRedisServer is a real TCP server on localhost speaking the slice of the
+Redis protocol RedisCache uses, with TTLs and allkeys-lru eviction past
+maxmemory (counted by value size).
+"""
+import collections
+import itertools
+import json
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.op = None
+        self.payload = None
+        self.columns = None
+        self.filters = []
+        self.order_by = []
+        self.offset = 0
+        self.row_limit = None
+
+    # ----------- operations -----------
+    def select(self, columns="*"):
+        self.op = "select"
+        self.columns = None if columns == "*" else [c.strip().strip('"') for c in columns.split(",")]
+        return self
+
+    def insert(self, rows):
+        self.op = "insert"
+        self.payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    # ----------- filters -----------
+    def eq(self, column, value):
+        self.filters.append(lambda r: r.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and r.get(column) > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and r.get(column) >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and r.get(column) < value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and r.get(column) <= value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda r: r.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def range(self, start, end):
+        self.offset = start
+        self.row_limit = end - start + 1
+        return self
+
+    # ----------- execution -----------
+    def execute(self):
+        client = self.client
+        client.round_trip()
+        rows = client.tables.setdefault(self.table, [])
+
+        if self.op == "insert":
+            for row in self.payload:
+                client.next_id += 1
+                rows.append({"id": client.next_id, **row})
+            client.rows_written += len(self.payload)
+            client.bytes_written += len(json.dumps(self.payload, default=str))
+            return SimpleNamespace(data=self.payload)
+
+        result = [r for r in rows if all(f(r) for f in self.filters)]
+        for column, desc in reversed(self.order_by):
+            result.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+        limit = client.max_rows if self.row_limit is None else min(self.row_limit, client.max_rows)
+        result = result[self.offset:self.offset + limit]
+        if self.columns:
+            result = [{c: r.get(c) for c in self.columns} for r in result]
+        else:
+            result = [dict(r) for r in result]
+        client.rows_read += len(result)
+        return SimpleNamespace(data=result)
+
+
+class FakeSupabase:
+    """Dict-of-lists Supabase stand-in with round-trip accounting."""
+
+    def __init__(self, latency=0.0, max_rows=1000):
+        self.latency = latency
+        self.max_rows = max_rows  # PostgREST caps a response at 1000 rows by default
+        self.tables = {}
+        self.next_id = 0
+        self.round_trips = 0
+        self.rows_read = 0
+        self.rows_written = 0
+        self.bytes_written = 0
+        self.offline = False
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def round_trip(self):
+        if self.offline:
+            raise ConnectionError("Supabase is unreachable")
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class FakeWorksheet:
+    """A worksheet as a list of rows of strings, like the formatted values Sheets returns."""
+
+    def __init__(self, spreadsheet, title, rows=1000, cols=26, sheet_id=None):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = next(spreadsheet.sheet_ids) if sheet_id is None else sheet_id
+        self.rows = []
+
+    def get_all_values(self, **kwargs):
+        self.spreadsheet.round_trip("read")
+        with self.spreadsheet.lock:
+            self.spreadsheet.cells_read += sum(len(r) for r in self.rows)
+            return [list(r) for r in self.rows]
+
+    def row_values(self, row, **kwargs):
+        self.spreadsheet.round_trip("read")
+        with self.spreadsheet.lock:
+            return list(self.rows[row - 1]) if len(self.rows) >= row else []
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self.spreadsheet.round_trip("write")
+        if range_name != "A1":
+            raise NotImplementedError(f"FakeWorksheet only updates from A1, got {range_name}")
+        with self.spreadsheet.lock:
+            self.write_from_top(values)
+
+    def write_from_top(self, values):
+        self.spreadsheet.count_written(values)
+        for i, row in enumerate(values):
+            cells = [str(v) for v in row]
+            if i < len(self.rows):
+                self.rows[i] = cells + self.rows[i][len(cells):]
+            else:
+                self.rows.append(cells)
+
+    def clear(self):
+        self.spreadsheet.round_trip("write")
+        with self.spreadsheet.lock:
+            self.rows = []
+
+    def append_rows(self, values, **kwargs):
+        self.spreadsheet.round_trip("write")
+        with self.spreadsheet.lock:
+            self.rows.extend([["" if v is None else str(v) for v in row] for row in values])
+            self.spreadsheet.count_written(values)
+
+
+class FakeResponse:
+    """Just enough of a requests.Response for gspread's APIError."""
+
+    def __init__(self, status_code, message, status="INVALID_ARGUMENT"):
+        self.status_code = status_code
+        self.text = message
+        self.status = status
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": self.text, "status": self.status}}
+
+
+def formatted(cell):
+    """The formatted value Sheets would show for a CellData from an appendCells request."""
+    value = cell.get("userEnteredValue")
+    if not value:
+        return ""
+    if "numberValue" in value:
+        number = value["numberValue"]
+        if cell.get("userEnteredFormat", {}).get("numberFormat", {}).get("type") == "DATE_TIME":
+            moment = datetime(1899, 12, 30) + timedelta(days=number)
+            return (moment + timedelta(microseconds=500_000)).replace(microsecond=0).strftime("%Y-%m-%d %H:%M:%S")
+        return str(number)
+    if "boolValue" in value:
+        return "TRUE" if value["boolValue"] else "FALSE"
+    return str(value["stringValue"])
+
+
+def range_title(a1):
+    """Worksheet title of an A1 range like 'Player 1'!1:1."""
+    title = a1.rsplit("!", 1)[0]
+    return title[1:-1].replace("''", "'") if title.startswith("'") else title
+
+
+class FakeSpreadsheet:
+    """Spreadsheet stand-in holding FakeWorksheets, with round-trip accounting.
+
+    read_quota / write_quota: requests allowed per quota_window seconds (sliding),
+    like Sheets' per-minute quotas; requests over it fail with a 429 APIError
+    and are counted in `rejected`. Thread-safe, so sessions can share one.
+    """
+
+    ids = itertools.count()
+
+    def __init__(self, latency=0.0, read_quota=None, write_quota=None, quota_window=60.0):
+        self.latency = latency
+        self.id = f"fake-{next(FakeSpreadsheet.ids)}"
+        self.worksheets_by_title = {}
+        self.sheet_ids = itertools.count()
+        self.quotas = {"read": read_quota, "write": write_quota}
+        self.quota_window = quota_window
+        self.recent = {"read": collections.deque(), "write": collections.deque()}
+        self.lock = threading.RLock()
+        self.round_trips = 0
+        self.rejected = 0
+        self.cells_read = 0
+        self.cells_written = 0
+        self.bytes_written = 0
+        self.offline = False
+
+    def round_trip(self, kind="read"):
+        import gspread
+
+        if self.offline:
+            raise ConnectionError("Google Sheets is unreachable")
+        with self.lock:
+            self.round_trips += 1
+            quota, recent = self.quotas[kind], self.recent[kind]
+            if quota is not None:
+                now = time.monotonic()
+                while recent and now - recent[0] >= self.quota_window:
+                    recent.popleft()
+                if len(recent) >= quota:
+                    self.rejected += 1
+                    raise gspread.exceptions.APIError(FakeResponse(
+                        429, f"Quota exceeded for quota metric '{kind.title()} requests'", "RESOURCE_EXHAUSTED"
+                    ))
+                recent.append(now)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def count_written(self, values):
+        self.cells_written += sum(len(r) for r in values)
+        self.bytes_written += sum(len("" if v is None else str(v)) for r in values for v in r)
+
+    def worksheet(self, title):
+        import gspread
+
+        self.round_trip("read")
+        with self.lock:
+            if title not in self.worksheets_by_title:
+                raise gspread.exceptions.WorksheetNotFound(title)
+            return self.worksheets_by_title[title]
+
+    def worksheets(self):
+        self.round_trip("read")
+        with self.lock:
+            return list(self.worksheets_by_title.values())
+
+    def batch_update(self, body):
+        import gspread
+
+        self.round_trip("write")
+        with self.lock:
+            # Requests apply in order and all or nothing: check them all first
+            ids = {ws.id for ws in self.worksheets_by_title.values()}
+            for request in body["requests"]:
+                if "addSheet" in request:
+                    props = request["addSheet"]["properties"]
+                    if props["title"] in self.worksheets_by_title:
+                        raise gspread.exceptions.APIError(
+                            FakeResponse(400, f"A sheet named {props['title']} already exists"))
+                    ids.add(props.get("sheetId"))
+                target = (request.get("appendCells") or request.get("deleteDimension", {}).get("range")
+                          or request.get("deleteSheet") or {})
+                if target and target["sheetId"] not in ids:
+                    raise gspread.exceptions.APIError(FakeResponse(400, "No grid with that id"))
+            for request in body["requests"]:
+                by_id = {ws.id: ws for ws in self.worksheets_by_title.values()}
+                if "addSheet" in request:
+                    props = request["addSheet"]["properties"]
+                    grid = props.get("gridProperties", {})
+                    self.worksheets_by_title[props["title"]] = FakeWorksheet(
+                        self, props["title"], grid.get("rowCount", 1000), grid.get("columnCount", 26),
+                        sheet_id=props.get("sheetId"),
+                    )
+                elif "appendCells" in request:
+                    append = request["appendCells"]
+                    values = [[formatted(c) for c in row["values"]] for row in append["rows"]]
+                    by_id[append["sheetId"]].rows.extend(values)
+                    self.count_written(values)
+                elif "deleteDimension" in request and request["deleteDimension"]["range"]["dimension"] == "ROWS":
+                    grid = request["deleteDimension"]["range"]
+                    del by_id[grid["sheetId"]].rows[grid["startIndex"]:grid["endIndex"]]
+                elif "deleteSheet" in request:
+                    del self.worksheets_by_title[by_id[request["deleteSheet"]["sheetId"]].title]
+                else:
+                    raise NotImplementedError(f"FakeSpreadsheet does not handle {list(request)}")
+        return {"replies": [{} for _ in body["requests"]]}
+
+    def values_batch_get(self, ranges, params=None):
+        self.round_trip("read")
+        with self.lock:
+            value_ranges = []
+            for a1 in ranges:
+                if not a1.endswith("!1:1"):
+                    raise NotImplementedError(f"FakeSpreadsheet only reads header rows, got {a1}")
+                ws = self.worksheets_by_title[range_title(a1)]
+                value_ranges.append({"range": a1, **({"values": [list(ws.rows[0])]} if ws.rows else {})})
+            return {"valueRanges": value_ranges}
+
+    def values_batch_update(self, body=None):
+        self.round_trip("write")
+        with self.lock:
+            for data in body["data"]:
+                if not data["range"].endswith("!A1"):
+                    raise NotImplementedError(f"FakeSpreadsheet only updates from A1, got {data['range']}")
+                self.worksheets_by_title[range_title(data["range"])].write_from_top(data["values"])
+        return {"totalUpdatedCells": sum(len(r) for d in body["data"] for r in d["values"])}
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        import gspread
+
+        self.round_trip("write")
+        with self.lock:
+            if title in self.worksheets_by_title:
+                raise gspread.exceptions.APIError(FakeResponse(400, f"A sheet named {title} already exists"))
+            ws = FakeWorksheet(self, title, rows, cols)
+            self.worksheets_by_title[title] = ws
+            return ws
+
+
+class FakeRedisServer:
+    """GET/SET (PX, NX)/DEL/DBSIZE/INFO/CONFIG SET on localhost; `commands` counts every one served."""
+
+    def __init__(self, max_bytes=0, latency=0.0):
+        self.max_bytes = max_bytes
+        self.latency = latency
+        self.entries = collections.OrderedDict()  # key -> (value, expires_at), least recently used first
+        self.used = 0
+        self.evicted = 0
+        self.commands = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        args = server.read_command(self.rfile)
+                    except ConnectionError:
+                        return
+                    self.wfile.write(server.execute(args))
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @staticmethod
+    def read_command(rfile):
+        line = rfile.readline()
+        if not line:
+            raise ConnectionError
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(rfile.readline()[1:])
+            args.append(rfile.read(length + 2)[:-2])
+        return args
+
+    @staticmethod
+    def reply(value):
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, str):
+            return f"+{value}\r\n".encode()
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _drop(self, key):
+        value, _ = self.entries.pop(key)
+        self.used -= len(value)
+
+    def _live(self, key):
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            self._drop(key)
+            return None
+        return entry
+
+    def execute(self, args):
+        if self.latency:
+            time.sleep(self.latency)
+        name = args[0].decode().upper()
+        with self.lock:
+            self.commands += 1
+            if name == "GET":
+                entry = self._live(args[1])
+                if entry is None:
+                    return self.reply(None)
+                self.entries.move_to_end(args[1])
+                return self.reply(entry[0])
+            if name == "SET":
+                key, value, options = args[1], args[2], [a.decode().upper() for a in args[3:]]
+                if "NX" in options and self._live(key) is not None:
+                    return self.reply(None)
+                expires_at = None
+                if "PX" in options:
+                    expires_at = time.monotonic() + int(options[options.index("PX") + 1]) / 1000
+                if key in self.entries:
+                    self._drop(key)
+                self.entries[key] = (value, expires_at)
+                self.used += len(value)
+                while self.max_bytes and self.used > self.max_bytes and len(self.entries) > 1:
+                    self._drop(next(iter(self.entries)))
+                    self.evicted += 1
+                return self.reply("OK")
+            if name == "DEL":
+                found = [k for k in args[1:] if k in self.entries]
+                for key in found:
+                    self._drop(key)
+                return self.reply(len(found))
+            if name == "DBSIZE":
+                return self.reply(len(self.entries))
+            if name == "INFO":
+                return self.reply(f"used_memory:{self.used}\r\nmaxmemory:{self.max_bytes}\r\n"
+                                  f"evicted_keys:{self.evicted}\r\n".encode())
+            if name == "CONFIG" and args[1].decode().upper() == "SET":
+                if args[2] == b"maxmemory":
+                    self.max_bytes = int(args[3])
+                return self.reply("OK")
+            if name in ("PING", "SELECT", "AUTH"):
+                return self.reply("OK" if name != "PING" else "PONG")
+            return f"-ERR unknown command '{name}'\r\n".encode()
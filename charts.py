@@ -0,0 +1,120 @@
+import streamlit as st
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from aggregation import AGGREGATIONS, MAX_POINTS, RAW, RESOLUTIONS, metric_series
+from derived_metrics import ROLLING_WINDOW, personal_bests, rolling_average
+from instrumentation import timed
+
+# -------------------------------
+# Performance charts shared by every tracker app
+# -------------------------------
+ROW_HEIGHT = 220
+
+
+def metric_columns(df, exclude=()):
+    """Numeric stat columns worth charting, in table order."""
+    return [
+        col for col in df.columns
+        if df[col].dtype in ['int64', 'float64'] and col not in exclude and df[col].notna().any()
+    ]
+
+
+def activity_figure(df, activity, metrics, x="timestamp", background=None, series=None, trends=None):
+    """One figure for an activity: a stacked subplot per metric on a shared time axis.
+
+    series maps a metric to the (already aggregated) Series to plot; other metrics plot every row.
+    trends maps a metric to a Series drawn as a dashed line over it.
+    """
+    series = series or {}
+    trends = trends or {}
+    fig = make_subplots(
+        rows=len(metrics), cols=1, shared_xaxes=True,
+        subplot_titles=metrics, vertical_spacing=min(0.08, 0.3 / max(len(metrics), 1))
+    )
+    for i, col in enumerate(metrics, start=1):
+        if col in series:
+            xs, ys = series[col].index, series[col].to_numpy()
+        else:
+            xs, ys = df[x], df[col]
+        fig.add_trace(go.Scatter(x=xs, y=ys, name=col, mode="lines+markers"), row=i, col=1)
+        if col in trends:
+            fig.add_trace(go.Scatter(
+                x=trends[col].index, y=trends[col].to_numpy(), name=f"{col} (avg)",
+                mode="lines", line=dict(dash="dash", width=1.5), hoverinfo="skip"
+            ), row=i, col=1)
+    fig.update_layout(
+        title=f"{activity} Metrics", height=ROW_HEIGHT * len(metrics) + 80,
+        showlegend=False, margin=dict(t=80, b=20)
+    )
+    if background:
+        fig.update_layout(**background)
+    return fig
+
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def cached_metric_series(data_key, _df, metric, resolution, how, max_points=MAX_POINTS):
+    # One entry per (user data version, activity, metric, resolution, aggregation)
+    return metric_series(_df, metric, resolution, how, max_points)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_rolling(data_key, _df, metrics, window=ROLLING_WINDOW):
+    return rolling_average(_df, list(metrics), window).assign(timestamp=_df["timestamp"])
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_personal_bests(data_key, _df, metrics):
+    return personal_bests(_df, list(metrics))
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_activity_figure(cache_key, _df, activity, metrics, resolution=RAW, how="mean", trend=False,
+                           _background=None):
+    # cache_key carries the data version (and anything else that changes the figure);
+    # the frame itself is not hashed
+    data_key = cache_key[0]
+    series = {m: cached_metric_series(data_key, _df, m, resolution, how) for m in metrics}
+    trends = {}
+    if trend:
+        # Rolling mean over the logged entries, then brought to the same resolution as the points
+        rolled = cached_rolling(data_key, _df, metrics)
+        trends = {m: metric_series(rolled, m, resolution, how) for m in metrics}
+    return activity_figure(_df, activity, list(metrics), background=_background, series=series, trends=trends)
+
+
+def show_graphs(df, activity, version_key, exclude=(), background=None, background_key=None, shared_cache=None):
+    """Render an activity's metrics as one cached subplot figure; the user can narrow the metrics
+    and pick a resolution (every entry, downsampled, or a per-session/weekly/monthly rollup).
+    With a shared_cache, figures are shared with the app's other processes.
+    """
+    if df.empty:
+        st.info(f"No data for {activity} yet.")
+        return
+    options = metric_columns(df, exclude)
+    if not options:
+        st.info(f"No data for {activity} yet.")
+        return
+    metrics_col, resolution_col, how_col, trend_col = st.columns([3, 1, 1, 1])
+    metrics = metrics_col.multiselect(f"{activity} metrics", options, default=options, key=f"metrics_{activity}")
+    resolution = resolution_col.selectbox("Resolution", list(RESOLUTIONS), key=f"resolution_{activity}")
+    how = how_col.selectbox("Aggregate", AGGREGATIONS, key=f"how_{activity}", disabled=resolution == RAW)
+    trend = trend_col.checkbox(f"{ROLLING_WINDOW}-entry average", key=f"trend_{activity}")
+    if not metrics:
+        return
+    # Row count and newest timestamp also catch rows written by other processes
+    data_key = (version_key, len(df), str(df["timestamp"].max()), activity)
+    cache_key = (data_key, tuple(metrics), resolution, how, trend, background_key)
+    def build():
+        return cached_activity_figure(cache_key, df, activity, tuple(metrics), resolution, how, trend, background)
+
+    with timed(f"chart.figure: {activity}"):
+        # A court background is served by this process, so only figures without one are shared
+        if shared_cache is not None and background_key is None:
+            fig = shared_cache.figure(cache_key, build)
+        else:
+            fig = build()
+    # Serializing the figure to JSON happens here
+    with timed(f"chart.render: {activity}"):
+        st.plotly_chart(fig, width="stretch", key=f"chart_{activity}")
+    with st.expander(f"🏆 {activity} personal bests"):
+        st.dataframe(cached_personal_bests(data_key, df, tuple(metrics)), hide_index=True)
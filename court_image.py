@@ -0,0 +1,93 @@
+import base64
+import hashlib
+import io
+import os
+
+import streamlit as st
+from PIL import Image, ImageOps
+
+# -------------------------------
+# Court background shared by every chart
+# -------------------------------
+# Uploads are shrunk and re-encoded once, stored by content hash and referenced by URL,
+# so each figure carries a short link instead of its own copy of the photo.
+MAX_SIDE = 1280
+JPEG_QUALITY = 70
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "court")
+STATIC_URL = "app/static/court"
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def downscale(data, max_side=MAX_SIDE, quality=JPEG_QUALITY):
+    """Fit an image within max_side pixels and re-encode it as a progressive JPEG."""
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        if img.mode in ("RGBA", "LA", "P"):
+            # JPEG has no alpha: flatten transparent areas onto white
+            img = img.convert("RGBA")
+            flat = Image.new("RGB", img.size, "white")
+            flat.paste(img, mask=img.getchannel("A"))
+            img = flat
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def publish(data, static_dir=STATIC_DIR):
+    """Downscale an upload into static_dir as <hash>.jpg (once per distinct image). Returns the file name."""
+    name = f"{content_hash(data)}.jpg"
+    path = os.path.join(static_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(static_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(downscale(data))
+        os.replace(tmp, path)
+    return name
+
+
+def data_uri(data):
+    return "data:image/jpeg;base64," + base64.b64encode(downscale(data)).decode()
+
+
+def background_layout(source, opacity=0.2):
+    """Layout for a faded full-figure background image."""
+    return dict(
+        images=[dict(
+            source=source,
+            xref="paper", yref="paper",
+            x=0, y=1,
+            sizex=1, sizey=1,
+            xanchor="left",
+            yanchor="top",
+            layer="below",
+            opacity=opacity
+        )],
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)"
+    )
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def court_source(digest, _data, static_serving):
+    # Keyed on the content hash: re-uploading the same photo costs nothing
+    if static_serving:
+        return f"{STATIC_URL}/{publish(_data)}"
+    # Without static serving, fall back to inlining the downscaled copy
+    return data_uri(_data)
+
+
+def court_background(uploaded_file, opacity=0.2):
+    """Background layout and cache key for an uploaded court image, or (None, None) without one."""
+    if uploaded_file is None:
+        return None, None
+    data = uploaded_file.getvalue()
+    digest = content_hash(data)
+    source = court_source(digest, data, bool(st.get_option("server.enableStaticServing")))
+    return background_layout(source, opacity), digest
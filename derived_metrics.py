@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from instrumentation import timed
+
+# -------------------------------
+# Derived metrics, computed at read time
+# -------------------------------
+# Only raw counts are stored. Percentages and ratios are recomputed column-wise over
+# the whole frame whenever it is read, so fixing a formula here fixes every past row
+# without re-ingesting anything. Each entry is numerator / denominator * scale, where
+# both sides are weighted sums of stored columns; rows with a zero denominator get NaN.
+FIELD_GOALS_MADE = {"2P Made": 1, "3P Made": 1}
+FIELD_GOALS_ATTEMPTED = {"2P Attempt": 1, "3P Attempt": 1}
+
+DERIVED_METRICS = {
+    "3P %": ({"3P Made": 1}, {"3P Attempt": 1}, 100),
+    "2P %": ({"2P Made": 1}, {"2P Attempt": 1}, 100),
+    "FG %": (FIELD_GOALS_MADE, FIELD_GOALS_ATTEMPTED, 100),
+    # Effective FG%: a made three counts as 1.5 made twos
+    "eFG %": ({"2P Made": 1, "3P Made": 1.5}, FIELD_GOALS_ATTEMPTED, 100),
+    "AST/TO": ({"Assists": 1}, {"Turnovers": 1}, 1),
+}
+
+# Stats where a smaller number is the better result
+LOWER_IS_BETTER = {
+    "Turnovers", "21 Drill Time (s)", "10 Layups Time (s)",
+    "17s Drill Time (s)", "1 Suicide Time (s)", "5 Suicides Time (s)",
+}
+
+ROLLING_WINDOW = 5
+
+
+def weighted_sum(df, weights):
+    """Row-wise sum of weight * column; None when the frame lacks any of the columns."""
+    if not all(col in df.columns for col in weights):
+        return None
+    cols = list(weights)
+    values = df[cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype="float64")
+    return values @ np.array([weights[c] for c in cols], dtype="float64")
+
+
+def add_derived(df, metrics=DERIVED_METRICS):
+    """A copy of df with every derived metric (re)computed from the stored counts.
+
+    Stale stored values of the same name (e.g. an old 3P % that divided made by made) are overwritten.
+    Metrics whose inputs are missing or never attempted are left out.
+    """
+    df = df.copy()
+    for name, (numerator, denominator, scale) in metrics.items():
+        num = weighted_sum(df, numerator)
+        den = weighted_sum(df, denominator)
+        if num is None or den is None:
+            df = df.drop(columns=[name], errors="ignore")
+            continue
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = np.where(den > 0, num / den * scale, np.nan)
+        if np.isnan(values).all():
+            df = df.drop(columns=[name], errors="ignore")
+        else:
+            df[name] = np.round(values, 2)
+    return df
+
+
+def rolling_average(df, metrics, window=ROLLING_WINDOW, by="activity"):
+    """Trailing mean over the last `window` logged values of each metric, per activity, in time order."""
+    values = df[metrics]
+    if by in df.columns:
+        rolled = values.groupby(df[by], sort=False).rolling(window, min_periods=1).mean()
+        return rolled.reset_index(level=0, drop=True).reindex(df.index)
+    return values.rolling(window, min_periods=1).mean()
+
+
+def personal_bests(df, metrics, x="timestamp"):
+    """Best value of each metric and when it was logged (lowest for times and turnovers)."""
+    rows = []
+    for metric in metrics:
+        values = pd.to_numeric(df[metric], errors="coerce")
+        if values.notna().any():
+            best = values.idxmin() if metric in LOWER_IS_BETTER else values.idxmax()
+            rows.append({"Metric": metric, "Best": values[best], "Date": df.at[best, x]})
+    return pd.DataFrame(rows, columns=["Metric", "Best", "Date"])
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_derived(cache_key, _df):
+    # Recomputed once per data version, not on every rerun
+    return add_derived(_df)
+
+
+def with_derived(df, version_key):
+    """add_derived(df), memoized on the backend's data version plus the frame's row count and last timestamp."""
+    if df.empty:
+        return df
+    with timed("derived"):
+        return cached_derived((version_key, len(df), str(df["timestamp"].max())), df)
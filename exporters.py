@@ -0,0 +1,70 @@
+"""Download artifacts for the tracker apps, built lazily.
+
+Exports are only produced when the user actually clicks download, and a
+LazyExport keeps the last result until the data version changes. The xlsx
+writer streams rows through xlsxwriter's constant_memory mode, so memory
+stays flat however long the history is.
+"""
+import threading
+from io import BytesIO
+
+import pandas as pd
+import xlsxwriter
+
+from instrumentation import instrumented
+
+EXPORT_FORMATS = {
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV": ("csv", "text/csv"),
+}
+
+
+def write_xlsx(sheets):
+    """Workbook bytes with one worksheet per non-empty DataFrame in `sheets` (name -> DataFrame)."""
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {
+        "constant_memory": True,
+        "default_date_format": "yyyy-mm-dd hh:mm:ss",
+    })
+    for name, df in sheets.items():
+        if df.empty:
+            continue
+        worksheet = workbook.add_worksheet(name[:31])  # Excel's sheet-name limit
+        worksheet.write_row(0, 0, [str(c) for c in df.columns])
+        # constant_memory flushes each row as soon as the next one starts, so rows must go in order
+        for r, values in enumerate(df.itertuples(index=False, name=None), start=1):
+            worksheet.write_row(r, 0, [None if pd.isna(v) else v for v in values])
+    workbook.close()
+    return output.getvalue()
+
+
+def write_csv(sheets):
+    """One CSV for all sheets; the sheet name goes into a leading `sheet` column when there are several."""
+    frames = [df for df in sheets.values() if not df.empty]
+    if len(frames) > 1:
+        frames = [df.assign(sheet=name)[["sheet", *df.columns]] for name, df in sheets.items() if not df.empty]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return df.to_csv(index=False).encode("utf-8")
+
+
+@instrumented("export.build")
+def build_export(sheets, export_format):
+    if export_format == "CSV":
+        return write_csv(sheets)
+    return write_xlsx(sheets)
+
+
+class LazyExport:
+    """Memoizes one export per data version; safe to call from Streamlit's download thread."""
+
+    def __init__(self):
+        self._version = None
+        self._data = None
+        self._lock = threading.Lock()
+
+    def get(self, version, build):
+        with self._lock:
+            if self._version != version:
+                self._data = build()
+                self._version = version
+            return self._data
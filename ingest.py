@@ -0,0 +1,376 @@
+"""Streaming import of past seasons' stats into any storage backend.
+
+    python ingest.py FILE [FILE ...] --backend local|supabase|sheets|none
+                     [--user NAME] [--activity NAME] [--chunk-rows 5000] [--restart]
+
+CSV is read in pandas chunks, XLSX row by row with openpyxl in read-only
+mode and JSONL line by line, so memory depends on --chunk-rows, not on the
+file size. Every chunk is mapped onto the activity schemas in tracker_forms
+(column names are matched ignoring case and spacing; derived metrics are
+dropped, they are computed on read), validated, and written with one
+bulk_append. Rows that fail validation go to FILE.rejects.jsonl with the
+reason. --backend none only validates.
+
+The key columns come from the file (user_id/player, activity/sheet,
+timestamp/DateTime/date) or from --user and --activity; an XLSX sheet named
+after an activity supplies that activity, as in the Plotly app's export.
+
+After every written chunk the position in the file is saved to
+FILE.checkpoint.json. Running the same command again after a failure
+resumes from there; the chunk that was in flight is checked against the
+backend first, so nothing is stored twice. --restart ignores a checkpoint.
+
+Backends: local uses LocalFileBackend (--root); supabase reads SUPABASE_URL
+and SUPABASE_KEY from the environment; sheets uses --service-account and
+--sheet.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from derived_metrics import DERIVED_METRICS
+from parquet_store import DEFAULT_ROOT
+from tracker_forms import ACTIVITIES, ACTIVITY_COLUMNS, STAT_COLUMNS
+
+DEFAULT_CHUNK_ROWS = 5000
+
+
+def canonical(name):
+    """Column or activity name for matching: lower case, single spaces."""
+    return " ".join(str(name).lower().split())
+
+
+KEY_ALIASES = {
+    "user_id": ["user_id", "user", "player", "user id"],
+    "activity": ["activity", "sheet"],
+    "timestamp": ["timestamp", "datetime", "date", "date time", "time"],
+}
+ACTIVITY_ALIASES = {canonical(a): a for a in ACTIVITIES} | {"shooting": "Shooting Practice"}
+IGNORED_COLUMNS = {canonical(c) for c in [*DERIVED_METRICS, "id", "created_at"]}
+STATS_BY_NAME = {canonical(c): c for c in STAT_COLUMNS}
+
+
+# -------------------------------
+# Column mapping and validation
+# -------------------------------
+@dataclass
+class ColumnMap:
+    """How a file's header maps onto tracker columns."""
+
+    columns: dict  # file column -> tracker column
+    ignored: list  # derived or server columns, dropped on purpose
+    unknown: list  # columns that match nothing
+
+    @classmethod
+    def from_header(cls, header):
+        keys = {alias: key for key, aliases in KEY_ALIASES.items() for alias in aliases}
+        columns, ignored, unknown = {}, [], []
+        for col in header:
+            name = canonical(col)
+            target = keys.get(name) or STATS_BY_NAME.get(name)
+            if target and target not in columns.values():
+                columns[col] = target
+            elif name in IGNORED_COLUMNS:
+                ignored.append(col)
+            elif name and not name.startswith("unnamed"):
+                unknown.append(col)
+        return cls(columns, ignored, unknown)
+
+
+def parse_timestamps(values):
+    """Naive UTC timestamps; NaT where a value is missing or unparseable."""
+    # One inferred format is much faster; only values that miss it are parsed one by one
+    parsed = pd.to_datetime(values, errors="coerce", utc=True)
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], errors="coerce", utc=True, format="mixed")
+    return parsed.dt.tz_localize(None)
+
+
+def validate(raw, column_map, user=None, activity=None):
+    """Map a chunk of raw rows onto tracker rows. Returns (rows, rejects) where rejects are (index, reason).
+
+    A row needs a user, a known activity, a parseable timestamp and at least one stat of that
+    activity; stats must be non-negative numbers. Values in columns that belong to other
+    activities are dropped (wide exports leave them empty anyway).
+    """
+    df = raw[list(column_map.columns)].rename(columns=column_map.columns)
+    n = len(df)
+    reasons = np.full(n, None, dtype=object)
+
+    def reject(mask, reason):
+        reasons[np.asarray(mask, dtype=bool) & (reasons == None)] = reason  # noqa: E711 (elementwise)
+
+    users = df["user_id"].astype("string").str.strip() if "user_id" in df else pd.Series(pd.NA, index=df.index, dtype="string")
+    if user is not None:
+        users = users.fillna(user)
+    reject(users.isna().to_numpy() | (users.fillna("") == "").to_numpy(), "no user (pass --user)")
+
+    acts = df["activity"] if "activity" in df else pd.Series(activity, index=df.index, dtype="object")
+    if activity is not None:
+        acts = acts.fillna(activity)
+    acts = acts.map({a: ACTIVITY_ALIASES.get(canonical(a)) for a in acts.dropna().unique()})
+    reject(acts.isna(), "unknown or missing activity")
+
+    stamps = parse_timestamps(df["timestamp"]) if "timestamp" in df else pd.Series(pd.NaT, index=df.index)
+    reject(stamps.isna(), "missing or unparseable timestamp")
+
+    stats = [c for c in df.columns if c in STAT_COLUMNS]
+    values = df[stats].apply(lambda col: pd.to_numeric(col, errors="coerce"))
+    for col in stats:
+        given = df[col].notna() & (df[col].astype("string").str.strip() != "")
+        reject(given & values[col].isna(), f"{col} is not a number")
+        reject(values[col] < 0, f"{col} is negative")
+
+    rows, rejects = [], []
+    valid = reasons == None  # noqa: E711
+    keys = pd.DataFrame({"user_id": users, "activity": acts, "timestamp": stamps})[valid]
+    # Per activity: only its own columns, as plain Python floats (NaN != NaN drops the empty ones)
+    for act, group in keys.groupby("activity", sort=False):
+        cols = [c for c in ACTIVITY_COLUMNS[act] if c in stats]
+        stat_rows = values.loc[group.index, cols].to_numpy(dtype="float64").tolist()
+        for idx, user_id, ts, stat_values in zip(
+            group.index, group["user_id"], group["timestamp"].dt.to_pydatetime(), stat_rows
+        ):
+            row = {c: v for c, v in zip(cols, stat_values) if v == v}
+            if row:
+                rows.append({"user_id": user_id, "activity": act, "timestamp": ts, **row})
+            else:
+                rejects.append((idx, f"no {act} stats"))
+    rejects += [(idx, reason) for idx, reason in zip(df.index[~valid], reasons[~valid])]
+    return rows, rejects
+
+
+# -------------------------------
+# Readers: each yields (raw chunk, position after it, default activity)
+# -------------------------------
+def read_csv(path, chunk_rows, position):
+    """Position: data rows consumed."""
+    skip = range(1, position + 1) if position else None
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, skiprows=skip, dtype=str, keep_default_na=False,
+                             na_values=[""]):
+        chunk.index = range(position, position + len(chunk))
+        position += len(chunk)
+        yield chunk, position, None
+
+
+def read_jsonl(path, chunk_rows, position):
+    """Position: byte offset of the next line; rows are identified by their line's offset.
+    Lines that are not JSON objects come back as bad rows."""
+    with open(path, "rb") as f:
+        f.seek(position)
+        records, offsets = [], []
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                    records.append(record if isinstance(record, dict) else {"__bad__": "not a JSON object"})
+                except ValueError:
+                    records.append({"__bad__": "invalid JSON"})
+                offsets.append(f"byte {offset}")
+            if records and (len(records) >= chunk_rows or not line):
+                chunk = pd.DataFrame.from_records(records)
+                chunk.index = offsets
+                yield chunk, f.tell(), None
+                records, offsets = [], []
+            if not line:
+                return
+
+
+def read_xlsx(path, chunk_rows, position):
+    """Position: [sheet index, data rows consumed in that sheet]."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        start_sheet, start_row = position or (0, 0)
+        for sheet_index, ws in enumerate(workbook.worksheets):
+            if sheet_index < start_sheet:
+                continue
+            consumed = start_row if sheet_index == start_sheet else 0
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            header = [str(h) if h is not None else "" for h in header]
+            activity = ACTIVITY_ALIASES.get(canonical(ws.title))
+            rows = ws.iter_rows(min_row=2 + consumed, values_only=True)
+            while True:
+                batch = [row for _, row in zip(range(chunk_rows), rows)]
+                if not batch:
+                    break
+                chunk = pd.DataFrame([list(r) + [None] * (len(header) - len(r)) for r in batch], columns=header)
+                chunk = chunk.loc[:, [bool(h) for h in header]]
+                chunk.index = [f"{ws.title}!{consumed + 2 + i}" for i in range(len(batch))]
+                consumed += len(batch)
+                yield chunk, [sheet_index, consumed], activity
+            start_row = 0
+    finally:
+        workbook.close()
+
+
+READERS = {".csv": read_csv, ".jsonl": read_jsonl, ".ndjson": read_jsonl, ".xlsx": read_xlsx}
+
+
+# -------------------------------
+# Checkpoints
+# -------------------------------
+def checkpoint_path(path):
+    return f"{path}.checkpoint.json"
+
+
+def file_identity(path):
+    stat = os.stat(path)
+    return {"file": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load_checkpoint(path):
+    try:
+        with open(checkpoint_path(path)) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    if {k: checkpoint.get(k) for k in ("file", "size", "mtime_ns")} != file_identity(path):
+        raise SystemExit(f"{path} changed since its checkpoint was written; rerun with --restart")
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    # Written aside and renamed, so a crash never leaves half a checkpoint
+    tmp = checkpoint_path(path) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, checkpoint_path(path))
+
+
+# -------------------------------
+# Ingestion
+# -------------------------------
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def ingest(path, backend, user=None, activity=None, chunk_rows=DEFAULT_CHUNK_ROWS, restart=False, log=print):
+    """Stream one file into `backend` (None: validate only). Returns the final checkpoint dict."""
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise SystemExit(f"{path}: unsupported file type (use {', '.join(READERS)})")
+    if restart and os.path.exists(checkpoint_path(path)):
+        os.remove(checkpoint_path(path))
+    checkpoint = load_checkpoint(path) or {
+        **file_identity(path), "position": None, "rows_read": 0, "rows_written": 0, "rows_rejected": 0, "rows_already_stored": 0,
+        "seconds": 0.0,
+    }
+    resumed = checkpoint["position"] is not None
+    if resumed:
+        log(f"{path}: resuming after {checkpoint['rows_read']} rows")
+
+    start = time.perf_counter()
+    seconds_before = checkpoint["seconds"]
+    maps, reported = {}, set()
+    with open(f"{path}.rejects.jsonl", "a" if resumed else "w", encoding="utf-8") as rejects_file:
+        for raw, position, sheet_activity in reader(path, chunk_rows, checkpoint["position"] or 0):
+            header = tuple(raw.columns)
+            if header not in maps:
+                maps[header] = ColumnMap.from_header([c for c in header if c != "__bad__"])
+                unknown = [c for c in maps[header].unknown if c not in reported]
+                if unknown:
+                    reported.update(unknown)
+                    log(f"{path}: ignoring unknown columns {unknown}")
+            bad = raw.pop("__bad__") if "__bad__" in raw else pd.Series(dtype="object")
+            rows, rejects = validate(raw, maps[header], user, activity or sheet_activity)
+            rejects = [(i, bad[i]) if i in bad.index and pd.notna(bad[i]) else (i, r) for i, r in rejects]
+
+            already_stored = 0
+            if backend is not None and rows:
+                if resumed:
+                    # This chunk may have been written just before the previous run stopped
+                    new = backend.missing(rows)
+                    already_stored = len(rows) - len(new)
+                    rows, resumed = new, False
+                backend.bulk_append(rows)
+            for i, reason in rejects:
+                rejects_file.write(json.dumps({"row": str(i), "reason": reason}) + "\n")
+            rejects_file.flush()
+
+            checkpoint.update(
+                position=position,
+                rows_read=checkpoint["rows_read"] + len(raw),
+                rows_written=checkpoint["rows_written"] + (len(rows) if backend is not None else 0),
+                rows_rejected=checkpoint["rows_rejected"] + len(rejects),
+                rows_already_stored=checkpoint["rows_already_stored"] + already_stored,
+                seconds=seconds_before + time.perf_counter() - start,
+            )
+            save_checkpoint(path, checkpoint)
+            rate = checkpoint["rows_read"] / checkpoint["seconds"] if checkpoint["seconds"] else 0
+            log(f"{path}: {checkpoint['rows_read']} rows read, {checkpoint['rows_written']} written, "
+                f"{checkpoint['rows_rejected']} rejected ({rate:,.0f} rows/s)")
+
+    if hasattr(backend, "flush"):
+        backend.flush()
+    os.remove(checkpoint_path(path))
+    return checkpoint
+
+
+def open_backend(args):
+    if args.backend == "none":
+        return None
+    if args.backend == "local":
+        from storage import LocalFileBackend
+
+        return LocalFileBackend(args.root)
+    if args.backend == "supabase":
+        from supabase import create_client
+
+        from storage import SupabaseBackend
+
+        client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+        return SupabaseBackend(client, columns=STAT_COLUMNS)
+    import gspread
+
+    from storage import SheetsBackend
+
+    client = gspread.service_account(filename=args.service_account)
+    return SheetsBackend(client.open(args.sheet))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--backend", choices=["local", "supabase", "sheets", "none"], required=True)
+    parser.add_argument("--user", help="user for rows without a user column")
+    parser.add_argument("--activity", help="activity for rows without an activity column")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--restart", action="store_true", help="ignore existing checkpoints")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="LocalFileBackend directory")
+    parser.add_argument("--service-account", default="service_account.json")
+    parser.add_argument("--sheet", default="Basketball Tracker")
+    args = parser.parse_args(argv)
+
+    backend = open_backend(args)
+    for path in args.files:
+        start = time.perf_counter()
+        done = ingest(path, backend, args.user, args.activity, args.chunk_rows, args.restart)
+        seconds = max(done["seconds"], 1e-9)
+        peak = peak_rss_mb()
+        print(f"{path}: done in {time.perf_counter() - start:.1f}s, {done['rows_written']} rows written, "
+              f"{done['rows_already_stored']} already stored, {done['rows_rejected']} rejected (see {path}.rejects.jsonl); "
+              f"{done['rows_read'] / seconds:,.0f} rows/s, {done['size'] / 2**20 / seconds:.1f} MB/s"
+              + (f", peak RSS {peak:.0f} MB" if peak else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Timers for the apps' hot paths, a sidebar breakdown of each rerun, and exporters.
+
+Backend calls, exports and chart renders are wrapped in `timed("name")` or
+decorated with `@instrumented("name")`. Nothing is recorded unless this
+rerun is collecting (the session turned the sidebar panel on) or an
+exporter is configured; otherwise a timer is a shared no-op object.
+
+Exporters, switched on by environment variables:
+  TRACKER_PERF_LOG   path of a JSON-lines file, one record per rerun
+  TRACKER_PERF_PROM  path of a Prometheus text file (e.g. for node_exporter's
+                     textfile collector), rewritten after every rerun
+
+Spans from other threads (the background sync, deferred downloads) only
+count towards the process totals. Those are kept while an exporter is on or
+any session has the panel open: each such session holds a lease, renewed
+by its reruns, that lapses PANEL_IDLE seconds after its last one (a closed
+browser tab never says so) or as soon as it turns the panel off. Storage code imports this module, so
+Streamlit and pandas are only imported by the functions that draw.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+LOG_PATH = os.environ.get("TRACKER_PERF_LOG")
+PROM_PATH = os.environ.get("TRACKER_PERF_PROM")
+
+_lock = threading.Lock()
+_totals = {}  # span name -> [calls, seconds], for the whole process
+_reruns = {}  # app -> [reruns, seconds]
+_collectors = []  # functions returning more Prometheus lines (e.g. the shared cache's counters)
+PANEL_IDLE = 600  # seconds a session's open panel keeps the process totals on after its last rerun
+_panel_leases = {}  # session key -> monotonic time its lease lapses
+_totals_until = float("inf") if LOG_PATH or PROM_PATH else 0.0  # monotonic time totals stop
+
+
+class _RerunState(threading.local):
+    spans = None  # spans of the rerun running on this thread, when it is collecting
+    depth = 0
+    started = 0.0
+
+
+_local = _RerunState()
+
+
+class _Timer:
+    __slots__ = ("name", "spans", "span", "start")
+
+    def __init__(self, name, spans):
+        self.name = name
+        self.spans = spans
+
+    def __enter__(self):
+        if self.spans is not None:
+            # Appended on entry so the breakdown lists a call before the calls it makes
+            self.span = [self.name, _local.depth, 0.0]
+            self.spans.append(self.span)
+            _local.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        if self.spans is not None:
+            _local.depth -= 1
+            self.span[2] = seconds
+        if time.monotonic() < _totals_until:
+            with _lock:
+                total = _totals.setdefault(self.name, [0, 0.0])
+                total[0] += 1
+                total[1] += seconds
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timed(name):
+    """Context manager timing its block as `name`."""
+    spans = _local.spans
+    if spans is None and time.monotonic() >= _totals_until:
+        return _NULL_TIMER
+    return _Timer(name, spans)
+
+
+def instrumented(name):
+    """Decorator: time every call of the function as `name`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def totals():
+    """Process-wide {name: (calls, seconds)} since the first rerun that recorded anything."""
+    with _lock:
+        return {name: tuple(t) for name, t in _totals.items()}
+
+
+# -------------------------------
+# Reruns
+# -------------------------------
+def _collecting():
+    import streamlit as st
+
+    return bool(st.session_state.get("perf_panel")) or LOG_PATH is not None or PROM_PATH is not None
+
+
+def _renew_panel_lease(state):
+    """Take, renew or give up this session's hold on the process totals, by its panel toggle."""
+    global _totals_until
+    if LOG_PATH or PROM_PATH:
+        return  # always on
+    key = state.setdefault("perf_session", uuid.uuid4().hex)
+    now = time.monotonic()
+    with _lock:
+        if state.get("perf_panel"):
+            _panel_leases[key] = now + PANEL_IDLE
+        else:
+            _panel_leases.pop(key, None)
+        for lapsed in [k for k, until in _panel_leases.items() if until <= now]:
+            del _panel_leases[lapsed]
+        _totals_until = max(_panel_leases.values(), default=0.0)
+
+
+def begin_rerun():
+    """Call at the top of the app: draws the panel toggle and starts collecting this rerun's spans."""
+    import streamlit as st
+
+    st.sidebar.toggle("⏱ Performance panel", key="perf_panel")
+    _renew_panel_lease(st.session_state)
+    if not _collecting():
+        _local.spans = None
+        return
+    # Spans from a fragment that saved and then asked for this rerun come first
+    _local.spans = st.session_state.pop("perf_carried", [])
+    _local.depth = 0
+    _local.started = time.perf_counter()
+
+
+def end_rerun(app):
+    """Call at the end of the app (and before any st.stop()): shows the panel and writes the exporters."""
+    import streamlit as st
+
+    spans = _local.spans
+    _local.spans = None
+    if spans is None:
+        return
+    seconds = time.perf_counter() - _local.started
+    with _lock:
+        rerun = _reruns.setdefault(app, [0, 0.0])
+        rerun[0] += 1
+        rerun[1] += seconds
+    if LOG_PATH:
+        write_json_line(LOG_PATH, app, seconds, spans)
+    if PROM_PATH:
+        write_prometheus(PROM_PATH)
+    if st.session_state.get("perf_panel"):
+        show_panel(seconds, spans)
+
+
+class carried_spans:
+    """Time a block in a fragment (e.g. a save followed by st.rerun()) so it shows in the next
+    full rerun's breakdown."""
+
+    def __init__(self, name):
+        self.name = name
+        self.timer = _NULL_TIMER
+
+    def __enter__(self):
+        if _collecting():
+            _local.spans, _local.depth = [], 0
+            self.timer = timed(self.name)
+        return self.timer.__enter__()
+
+    def __exit__(self, *exc):
+        import streamlit as st
+
+        self.timer.__exit__(*exc)
+        if self.timer is not _NULL_TIMER:
+            st.session_state.perf_carried = _local.spans
+            _local.spans = None
+        return False
+
+
+# -------------------------------
+# Panel
+# -------------------------------
+def show_panel(seconds, spans):
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander("⏱ This rerun", expanded=True):
+        instrumented_seconds = sum(s for _, depth, s in spans if depth == 0)
+        st.caption(f"{seconds * 1000:.0f} ms in total, {instrumented_seconds * 1000:.0f} ms in timed calls")
+        if spans:
+            st.dataframe(pd.DataFrame(
+                [{"call": "\u2003" * depth + name, "ms": round(s * 1000, 1)} for name, depth, s in spans]
+            ), hide_index=True)
+    with st.sidebar.expander("⏱ Process totals"):
+        rows = [{"call": name, "calls": calls, "ms": round(s * 1000, 1), "ms/call": round(s * 1000 / calls, 2)}
+                for name, (calls, s) in sorted(totals().items(), key=lambda item: -item[1][1])]
+        st.dataframe(pd.DataFrame(rows), hide_index=True)
+
+
+# -------------------------------
+# Exporters
+# -------------------------------
+def write_json_line(path, app, seconds, spans):
+    record = {
+        "time": datetime.now().isoformat(timespec="milliseconds"),
+        "app": app,
+        "rerun_ms": round(seconds * 1000, 3),
+        "spans": [{"name": name, "depth": depth, "ms": round(s * 1000, 3)} for name, depth, s in spans],
+    }
+    with _lock, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def add_collector(fn):
+    """Have the Prometheus exporter also write the lines fn() returns."""
+    with _lock:
+        _collectors.append(fn)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    """The process totals in Prometheus text exposition format."""
+    with _lock:
+        spans = {name: tuple(t) for name, t in _totals.items()}
+        reruns = {app: tuple(r) for app, r in _reruns.items()}
+        collectors = list(_collectors)
+    lines = [
+        "# HELP tracker_rerun_total Script reruns.",
+        "# TYPE tracker_rerun_total counter",
+        *(f'tracker_rerun_total{{app="{_label(app)}"}} {n}' for app, (n, _) in reruns.items()),
+        "# HELP tracker_rerun_seconds_total Time spent in script reruns.",
+        "# TYPE tracker_rerun_seconds_total counter",
+        *(f'tracker_rerun_seconds_total{{app="{_label(app)}"}} {s:.6f}' for app, (_, s) in reruns.items()),
+        "# HELP tracker_span_total Calls of timed sections.",
+        "# TYPE tracker_span_total counter",
+        *(f'tracker_span_total{{span="{_label(name)}"}} {n}' for name, (n, _) in spans.items()),
+        "# HELP tracker_span_seconds_total Time spent in timed sections.",
+        "# TYPE tracker_span_seconds_total counter",
+        *(f'tracker_span_seconds_total{{span="{_label(name)}"}} {s:.6f}' for name, (_, s) in spans.items()),
+    ]
+    for collect in collectors:
+        lines += collect()
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    # Written aside and renamed, so a scraper never reads half a file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
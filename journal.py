@@ -0,0 +1,192 @@
+"""Local journal of tracker rows: SQLite in WAL mode.
+
+Every save lands here first, so saving never waits on the network and
+nothing is lost while the gym has no signal. Each entry is keyed by
+(user_id, activity, timestamp, n) with the timestamp at whole seconds (what
+the sheets keep) and n numbering the entries within that second, in save
+order locally and in the remote's order on pull, so two saves in one
+second are two entries on both sides. Entries carry a synced flag: saves
+start unsynced and are marked once the sync engine has pushed them; rows
+pulled from the remote are stored as already synced.
+
+Merge rule for a key present on both sides: an unsynced local save is kept
+(it is about to be pushed); a synced copy takes the remote's values, since
+the remote is the shared source of truth.
+"""
+import json
+import math
+import sqlite3
+import threading
+from collections import Counter
+
+import pandas as pd
+
+DEFAULT_PATH = "tracker_journal.db"
+KEY_COLUMNS = ["user_id", "activity", "timestamp"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq       INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id   TEXT NOT NULL,
+    activity  TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    n         INTEGER NOT NULL DEFAULT 0,
+    data      TEXT NOT NULL,
+    synced    INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (user_id, activity, timestamp, n)
+);
+CREATE INDEX IF NOT EXISTS entries_unsynced ON entries (synced, seq);
+CREATE TABLE IF NOT EXISTS pull_cursors (
+    user_id TEXT PRIMARY KEY,
+    pulled_until TEXT NOT NULL
+);
+"""
+
+
+def journal_key(value):
+    """ISO timestamp at whole seconds, naive UTC for tz-aware values: the journal's key format."""
+    ts = pd.Timestamp(value)
+    ts = ts.tz_convert(None) if ts.tz else ts
+    return ts.floor("s").strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _value(v):
+    v = v.item() if hasattr(v, "item") else v
+    # Numbers as floats, so a saved 3 and the remote's 3.0 compare equal
+    return float(v) if isinstance(v, int) and not isinstance(v, bool) else v
+
+
+def _stats(row):
+    """The row's stat values as canonical JSON (sorted keys), without keys or empty values."""
+    return json.dumps({
+        k: _value(v) for k, v in row.items()
+        if k not in KEY_COLUMNS and v is not None and not (isinstance(v, float) and math.isnan(v))
+    }, sort_keys=True)
+
+
+class Journal:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: a save is one append to the WAL file, fsynced at checkpoints
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._upgrade()
+        self._db.executescript(SCHEMA)
+
+    def _upgrade(self):
+        # Journals from before the n column: rebuild the table under the new key (n = 0 everywhere)
+        columns = [r[1] for r in self._db.execute("PRAGMA table_info(entries)")]
+        if not columns or "n" in columns:
+            return
+        self._db.executescript(
+            "BEGIN IMMEDIATE;"
+            "ALTER TABLE entries RENAME TO entries_old;"
+            "DROP INDEX IF EXISTS entries_unsynced;"
+            + SCHEMA +
+            "INSERT INTO entries (seq, user_id, activity, timestamp, data, synced) "
+            "SELECT seq, user_id, activity, timestamp, data, synced FROM entries_old;"
+            "DROP TABLE entries_old;"
+            "COMMIT;"
+        )
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _executemany(self, sql, rows):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                before = self._db.total_changes
+                self._db.executemany(sql, rows)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return self._db.total_changes - before
+
+    # ----------- writes -----------
+    def append(self, rows):
+        """Record local saves (unsynced), each as a new entry, after any already in the same second."""
+        return self._executemany(
+            "INSERT INTO entries (user_id, activity, timestamp, n, data, synced) VALUES (?1, ?2, ?3, "
+            "(SELECT count(*) FROM entries WHERE user_id = ?1 AND activity = ?2 AND timestamp = ?3), ?4, 0)",
+            [(r["user_id"], r["activity"], journal_key(r["timestamp"]), _stats(r)) for r in rows],
+        )
+
+    def merge_remote(self, rows):
+        """Merge rows pulled from the remote, in the remote's order, with every row of a second
+        included (a pull's window starts on a whole second). Returns how many entries were added or changed."""
+        seen = Counter()
+        params = []
+        for r in rows:
+            key = (r["user_id"], r["activity"], journal_key(r["timestamp"]))
+            params.append((*key, seen[key], _stats(r)))
+            seen[key] += 1
+        return self._executemany(
+            "INSERT INTO entries (user_id, activity, timestamp, n, data, synced) VALUES (?, ?, ?, ?, ?, 1) "
+            "ON CONFLICT (user_id, activity, timestamp, n) DO UPDATE SET data = excluded.data "
+            "WHERE entries.synced = 1 AND entries.data != excluded.data",
+            params,
+        )
+
+    def mark_synced(self, seqs):
+        self._executemany("UPDATE entries SET synced = 1 WHERE seq = ?", [(s,) for s in seqs])
+
+    # ----------- reads -----------
+    def unsynced(self, limit=500, user_id=None):
+        """Oldest saves not pushed yet (optionally one user's, limit None: all), as (seq, n, row) triples."""
+        sql = "SELECT seq, n, user_id, activity, timestamp, data FROM entries WHERE synced = 0"
+        params = []
+        if user_id is not None:
+            sql += " AND user_id = ?"
+            params.append(user_id)
+        rows = self._execute(sql + " ORDER BY seq LIMIT ?", (*params, -1 if limit is None else limit))
+        return [(seq, n, self._row(*entry)) for seq, n, *entry in rows]
+
+    def pending_count(self):
+        return self._execute("SELECT count(*) FROM entries WHERE synced = 0")[0][0]
+
+    def read(self, user_id, activity=None, since=None, until=None):
+        sql = "SELECT user_id, activity, timestamp, data FROM entries WHERE user_id = ?"
+        params = [user_id]
+        if activity is not None:
+            sql += " AND activity = ?"
+            params.append(activity)
+        if since is not None:
+            sql += " AND timestamp >= ?"
+            params.append(journal_key(since))
+        if until is not None:
+            sql += " AND timestamp < ?"
+            params.append(journal_key(until))
+        rows = [self._row(*r) for r in self._execute(sql + " ORDER BY timestamp, n", params)]
+        return pd.DataFrame(rows)
+
+    def users(self):
+        return [r[0] for r in self._execute("SELECT DISTINCT user_id FROM entries ORDER BY user_id")]
+
+    @staticmethod
+    def _row(user_id, activity, timestamp, data):
+        return {"user_id": user_id, "activity": activity, "timestamp": pd.Timestamp(timestamp), **json.loads(data)}
+
+    # ----------- pull cursors -----------
+    def pull_cursor(self, user_id):
+        rows = self._execute("SELECT pulled_until FROM pull_cursors WHERE user_id = ?", (user_id,))
+        return rows[0][0] if rows else None
+
+    def set_pull_cursor(self, user_id, pulled_until):
+        self._execute(
+            "INSERT INTO pull_cursors (user_id, pulled_until) VALUES (?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET pulled_until = excluded.pulled_until",
+            (user_id, pulled_until),
+        )
+
+    def reset_pull_cursor(self, user_id):
+        self._execute("DELETE FROM pull_cursors WHERE user_id = ?", (user_id,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,202 @@
+"""Columnar local store: partitioned Parquet per player and activity.
+
+Layout: <root>/<player>/<activity>/part-<time_ns>.parquet, plus the player's
+id as given in <root>/<player>/_id (directory names are sanitized, so they
+cannot be turned back into ids). Every append writes one new part file and
+never touches existing ones; reads go through an Arrow dataset so only the
+requested columns are decoded. compact() merges the parts of a partition
+when they pile up; the merged part names the parts it replaces in its
+metadata, so if the old parts outlive it (a crash before they are deleted)
+reads skip them rather than count their rows twice.
+
+One-time migration from the old CSV format:
+
+    python parquet_store.py migrate basketball_data.csv --player Player1
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DEFAULT_ROOT = "basketball_data"
+
+
+def _safe_name(name):
+    return "".join(ch if ch.isalnum() or ch in " -_" else "_" for ch in str(name)).strip() or "_"
+
+
+def to_arrow(rows):
+    """Typed Arrow table for a batch of rows (dicts or a DataFrame): numbers as float64, timestamps as timestamp[us]."""
+    df = pd.DataFrame(rows)
+    if "timestamp" not in df.columns:
+        df["timestamp"] = datetime.now()
+    df["timestamp"] = pd.to_datetime(df["timestamp"]).astype("datetime64[us]")
+    for col in df.columns:
+        if col != "timestamp" and pd.api.types.is_numeric_dtype(df[col]):
+            # One numeric type everywhere, so parts written months apart share a schema
+            df[col] = df[col].astype("float64")
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+class ParquetStore:
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    def partition(self, player, activity):
+        return os.path.join(self.root, _safe_name(player), _safe_name(activity))
+
+    def parts(self, player, activity):
+        """The partition's part files, leaving out any a compacted part replaces."""
+        return list(self._schemas(player, activity))
+
+    def _schemas(self, player, activity, files=None):
+        """{part file: schema} for the live parts among `files` (default: the partition's files)."""
+        if files is None:
+            path = self.partition(player, activity)
+            if not os.path.isdir(path):
+                return {}
+            files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".parquet"))
+        schemas = {f: pq.read_schema(f) for f in files}
+        replaced = {name for schema in schemas.values()
+                    for name in json.loads((schema.metadata or {}).get(b"replaces", b"[]"))}
+        return {f: schema for f, schema in schemas.items() if os.path.basename(f) not in replaced}
+
+    def players(self):
+        """Every player's id, as passed to append()."""
+        if not os.path.isdir(self.root):
+            return []
+        # Directories starting with "_" hold store metadata (e.g. team rollups), not players
+        dirs = [d for d in os.listdir(self.root) if not d.startswith("_") and os.path.isdir(os.path.join(self.root, d))]
+        return sorted(self._player_id(d) for d in dirs)
+
+    def _player_id(self, directory):
+        try:
+            with open(os.path.join(self.root, directory, "_id"), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return directory  # written before ids were recorded
+
+    def activities(self, player):
+        path = os.path.join(self.root, _safe_name(player))
+        if not os.path.isdir(path):
+            return []
+        return sorted(d for d in os.listdir(path) if not d.startswith("_") and os.path.isdir(os.path.join(path, d)))
+
+    def append(self, player, activity, rows, replaces=()):
+        """Write rows (dicts or a DataFrame) as a new part file. Existing files are never rewritten.
+
+        replaces: names of part files the new one supersedes (see compact()).
+        """
+        if len(rows) == 0:
+            return
+        path = self.partition(player, activity)
+        os.makedirs(path, exist_ok=True)
+        id_path = os.path.join(self.root, _safe_name(player), "_id")
+        if not os.path.exists(id_path):
+            with open(f"{id_path}.{time.time_ns()}.tmp", "w", encoding="utf-8") as f:
+                f.write(str(player))
+            os.replace(f.name, id_path)
+        name = f"part-{time.time_ns()}"
+        tmp_path = os.path.join(path, f".{name}.tmp")
+        table = to_arrow(rows)
+        if replaces:
+            table = table.replace_schema_metadata({**table.schema.metadata, b"replaces": json.dumps(list(replaces)).encode()})
+        pq.write_table(table, tmp_path)
+        # Rename into place so readers never see a half-written part
+        os.replace(tmp_path, os.path.join(path, f"{name}.parquet"))
+
+    def read(self, player, activity, columns=None, since=None, until=None):
+        """One partition as a DataFrame, decoding only `columns` (plus timestamp) when given.
+
+        since/until bound the timestamp (inclusive/exclusive) and are pushed down to the scan.
+        """
+        return self._read_parts(self._schemas(player, activity), columns, since, until)
+
+    @staticmethod
+    def _read_parts(schemas, columns=None, since=None, until=None):
+        if not schemas:
+            return pd.DataFrame()
+        files = list(schemas)
+        # Columns added to a form later only exist in newer parts; merge every part's schema
+        schema = pa.unify_schemas(list(schemas.values()))
+        dataset = ds.dataset(files, schema=schema, format="parquet")
+        if columns is not None:
+            columns = [c for c in dict.fromkeys(["timestamp", *columns]) if c in schema.names]
+        condition = None
+        if since is not None:
+            condition = ds.field("timestamp") >= pa.scalar(since, pa.timestamp("us"))
+        if until is not None:
+            upper = ds.field("timestamp") < pa.scalar(until, pa.timestamp("us"))
+            condition = upper if condition is None else condition & upper
+        table = dataset.to_table(columns=columns, filter=condition)
+        return table.to_pandas().sort_values("timestamp", ignore_index=True)
+
+    def compact(self, player, activity):
+        """Merge a partition's parts into one file. Returns the number of parts merged.
+
+        The merged part is renamed into place before the old parts are deleted, and names
+        them as replaced: a crash in between leaves files that reads skip, not duplicates.
+        """
+        path = self.partition(player, activity)
+        if not os.path.isdir(path):
+            return 0
+        # Every file on disk, including parts an interrupted compaction already replaced;
+        # parts appended from here on are neither merged nor deleted
+        files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".parquet"))
+        schemas = self._schemas(player, activity, files)
+        if len(schemas) < 2 and len(files) == len(schemas):
+            return len(schemas)
+        merged = self._read_parts(schemas)
+        self.append(player, activity, merged, replaces=[os.path.basename(f) for f in files])
+        for f in files:
+            os.remove(f)
+        return len(schemas)
+
+
+def migrate_csv(csv_path, store, player):
+    """Copy an old basketball_data.csv into the store once. Returns the number of rows migrated."""
+    marker = os.path.join(store.partition(player, "_meta"), f"migrated-{_safe_name(os.path.basename(csv_path))}")
+    if os.path.exists(marker):
+        return 0
+    df = pd.read_csv(csv_path)
+    activity_col = next((c for c in df.columns if c.lower() == "activity"), None)
+    if activity_col is None:
+        raise ValueError(f"{csv_path} has no Activity column; cannot tell which form each row came from")
+    if "DateTime" in df.columns and "timestamp" not in df.columns:
+        df = df.rename(columns={"DateTime": "timestamp"})
+    for activity, group in df.groupby(activity_col, sort=False):
+        rows = group.drop(columns=[activity_col]).dropna(axis=1, how="all").to_dict("records")
+        store.append(player, activity, rows)
+    os.makedirs(os.path.dirname(marker), exist_ok=True)
+    open(marker, "w").close()
+    return len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the local Parquet store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="one-time import of a basketball_data.csv file")
+    migrate.add_argument("csv_path")
+    migrate.add_argument("--player", required=True)
+    migrate.add_argument("--root", default=DEFAULT_ROOT)
+    compact = sub.add_parser("compact", help="merge part files for every player and activity")
+    compact.add_argument("--root", default=DEFAULT_ROOT)
+    args = parser.parse_args()
+
+    store = ParquetStore(args.root)
+    if args.command == "migrate":
+        print(f"Migrated {migrate_csv(args.csv_path, store, args.player)} rows")
+    else:
+        for player in store.players():
+            for activity in store.activities(player):
+                print(f"{player}/{activity}: merged {store.compact(player, activity)} parts")
+
+
+if __name__ == "__main__":
+    main()
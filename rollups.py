@@ -0,0 +1,183 @@
+"""Weekly team rollups: per player, per activity, per week, per metric.
+
+Each write contributes a small delta (entries, total, high, low for every
+stat it fills in); deltas are additive, so backends can persist them as an
+append-only log and merge on load. A coach's dashboard reads the rollup
+table instead of every player's history: its size depends on players x
+weeks x metrics, not on how many rows were ever logged.
+"""
+import math
+import threading
+
+import pandas as pd
+
+from derived_metrics import DERIVED_METRICS, LOWER_IS_BETTER, add_derived
+
+ROLLUP_KEYS = ["user_id", "activity", "week", "metric"]
+ROLLUP_COLUMNS = [*ROLLUP_KEYS, "entries", "total", "high", "low"]
+# How each rollup column combines across deltas
+COMBINE = {"entries": "sum", "total": "sum", "high": "max", "low": "min"}
+ROW_KEYS = ["user_id", "activity", "timestamp"]
+# Batches up to this size (e.g. one saved form) skip pandas: its fixed overhead dominates
+SMALL_BATCH = 32
+
+
+def empty_rollups():
+    return pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+
+def week_start(timestamps):
+    """Monday 00:00 of each timestamp's week."""
+    ts = pd.to_datetime(pd.Series(timestamps), utc=True, format="mixed").dt.tz_localize(None)
+    return ts.dt.to_period("W-SUN").dt.start_time
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def _small_delta(rows):
+    cells = {}
+    for row in rows:
+        ts = pd.Timestamp(row["timestamp"])
+        ts = ts.tz_convert(None) if ts.tz else ts
+        week = ts.normalize() - pd.Timedelta(days=ts.weekday())
+        for metric, value in row.items():
+            if metric in ROW_KEYS or metric in DERIVED_METRICS:
+                continue
+            value = _number(value)
+            if value is None:
+                continue
+            key = (row["user_id"], row["activity"], week, metric)
+            cell = cells.get(key)
+            if cell is None:
+                cells[key] = [1, value, value, value]
+            else:
+                cell[0] += 1
+                cell[1] += value
+                cell[2] = max(cell[2], value)
+                cell[3] = min(cell[3], value)
+    if not cells:
+        return empty_rollups()
+    return pd.DataFrame([(*key, *cell) for key, cell in cells.items()], columns=ROLLUP_COLUMNS)
+
+
+def rollup_delta(rows):
+    """Rollup rows for a batch of stored rows (dicts or a DataFrame) in one vectorized pass."""
+    if isinstance(rows, list) and len(rows) <= SMALL_BATCH:
+        return _small_delta(rows)
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return empty_rollups()
+    stats = [c for c in df.columns if c not in ROW_KEYS and c not in DERIVED_METRICS]
+    # By position: the frame's index may repeat (e.g. several players' snapshots concatenated)
+    df = df.assign(week=week_start(df["timestamp"].to_numpy()).to_numpy())
+    long = df.melt(id_vars=["user_id", "activity", "week"], value_vars=stats, var_name="metric")
+    long["value"] = pd.to_numeric(long["value"], errors="coerce")
+    long = long.dropna(subset=["value"])
+    if long.empty:
+        return empty_rollups()
+    delta = long.groupby(ROLLUP_KEYS, sort=False)["value"].agg(
+        entries="count", total="sum", high="max", low="min"
+    )
+    return delta.reset_index()[ROLLUP_COLUMNS]
+
+
+def combine(*frames):
+    """Merge rollup frames (e.g. a log of deltas) into one row per key."""
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
+        return empty_rollups()
+    df = pd.concat(frames, ignore_index=True)
+    df["week"] = pd.to_datetime(df["week"])
+    for col in COMBINE:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df.groupby(ROLLUP_KEYS, sort=False).agg(COMBINE).reset_index()[ROLLUP_COLUMNS]
+
+
+class RollupTable:
+    """The merged rollups of one backend, kept as a dict keyed by (user, activity, week, metric).
+
+    add() touches only the keys in the delta (which must have typed columns, as rollup_delta()
+    and combine() return); frame() is rebuilt lazily after a change.
+    """
+
+    def __init__(self, frame=None):
+        self._cells = {}
+        self._frame = None
+        self._lock = threading.Lock()
+        self.version = 0
+        if frame is not None:
+            self.add(frame)
+
+    def add(self, delta):
+        if delta is None or delta.empty:
+            return
+        with self._lock:
+            for user_id, activity, week, metric, entries, total, high, low in delta.itertuples(index=False):
+                key = (user_id, activity, week, metric)
+                cell = self._cells.get(key)
+                if cell is None:
+                    self._cells[key] = [entries, total, high, low]
+                else:
+                    cell[0] += entries
+                    cell[1] += total
+                    cell[2] = max(cell[2], high)
+                    cell[3] = min(cell[3], low)
+            self._frame = None
+            self.version += 1
+
+    def frame(self):
+        with self._lock:
+            if self._frame is None:
+                self._frame = pd.DataFrame(
+                    [(*key, *cell) for key, cell in self._cells.items()], columns=ROLLUP_COLUMNS
+                )
+                self._frame["week"] = pd.to_datetime(self._frame["week"])
+            return self._frame
+
+    def __len__(self):
+        return len(self._cells)
+
+
+# -------------------------------
+# Team views over a rollup frame
+# -------------------------------
+def team_summary(rollups):
+    """One row per player: the average of every metric, plus derived metrics computed from the summed counts."""
+    if rollups.empty:
+        return pd.DataFrame()
+    rollups = rollups[~rollups["metric"].isin(list(DERIVED_METRICS))]
+    sums = rollups.groupby(["user_id", "metric"])[["entries", "total"]].sum()
+    totals = sums["total"].unstack("metric")
+    averages = totals / sums["entries"].unstack("metric")
+    # 3P % etc. over the whole window: made and attempts summed first, then divided
+    derived = add_derived(totals).drop(columns=totals.columns)
+    summary = pd.concat([averages.round(2), derived], axis=1).rename_axis(columns=None)
+    summary.insert(0, "Entries", sums["entries"].groupby("user_id").max().astype(int))
+    return summary.rename_axis("Player").reset_index()
+
+
+def leaderboard(rollups, summary, metric, stat="Average"):
+    """Players ranked on a metric: by their average (or derived value), or by their single best entry."""
+    lower_is_better = metric in LOWER_IS_BETTER
+    if stat == "Best" and metric not in DERIVED_METRICS:
+        rows = rollups[rollups["metric"] == metric].groupby("user_id")
+        values = rows["low"].min() if lower_is_better else rows["high"].max()
+        board = values.rename(metric).rename_axis("Player").reset_index()
+    else:
+        board = summary[["Player", metric]]
+    board = board.dropna(subset=[metric]).sort_values(metric, ascending=lower_is_better, ignore_index=True)
+    board.insert(0, "Rank", range(1, len(board) + 1))
+    return board
+
+
+def weekly_averages(rollups, metric, players):
+    """Week x player table of a metric's weekly average, for comparing a few players."""
+    rows = rollups[(rollups["metric"] == metric) & rollups["user_id"].isin(players)]
+    return (rows.assign(average=rows["total"] / rows["entries"])
+            .pivot_table(index="week", columns="user_id", values="average").sort_index())
@@ -0,0 +1,285 @@
+"""Season reports for every player, built in parallel.
+
+    python season_report.py --backend local|supabase|sheets [--players NAME ...]
+                            [--since 2024-09-01] [--until 2025-07-01] [--out reports]
+                            [--formats html xlsx png] [--workers N] [--tasks-per-worker 25]
+
+Each player's rows are fetched once (a few at a time, on threads: fetching
+waits on the network) and handed to a process pool. A worker computes the
+derived stats, a season summary and one chart per activity, and writes
+OUT/PLAYER.html (summary plus interactive charts), OUT/PLAYER.xlsx (summary
+plus one sheet per activity) and, with png, OUT/PLAYER/ACTIVITY.png (needs
+the kaleido package). OUT/index.html links them all.
+
+Memory stays bounded: at most two players per worker are in flight, charts
+plot at most MAX_POINTS points per metric, the workbook is streamed, and
+each worker is replaced after --tasks-per-worker players. Workers fork from
+a server that has already imported pandas and plotly, so starting one is
+cheap. --workers 0 builds everything in this process.
+
+Backends are opened as in ingest.py.
+"""
+import argparse
+import html
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import pandas as pd
+
+from aggregation import RAW, metric_series
+from charts import activity_figure, metric_columns
+from derived_metrics import LOWER_IS_BETTER, ROLLING_WINDOW, add_derived, rolling_average
+from exporters import write_xlsx
+from ingest import open_backend, peak_rss_mb
+from parquet_store import DEFAULT_ROOT
+from tracker_forms import ACTIVITIES
+
+FORMATS = ["html", "xlsx", "png"]
+# Attempts are charted through the percentages computed from them
+EXCLUDE = ["3P Attempt", "2P Attempt"]
+SUMMARY_COLUMNS = ["Activity", "Metric", "Entries", "Total", "Average", "Best", "Best date", "Last"]
+
+
+def safe_name(player):
+    """The player's name as a file name."""
+    return re.sub(r"[^\w.-]+", "_", str(player)).strip("._") or "player"
+
+
+# -------------------------------
+# One player's report (runs in a worker)
+# -------------------------------
+def season_summary(df):
+    """One row per activity and metric: entries, total, average, best (lowest for times) and last value."""
+    rows = []
+    for activity, group in df.groupby("activity", sort=False):
+        group = group.sort_values("timestamp")
+        for metric in metric_columns(group.drop(columns=["user_id"], errors="ignore")):
+            values = group[metric].dropna()
+            best = values.idxmin() if metric in LOWER_IS_BETTER else values.idxmax()
+            rows.append({
+                "Activity": activity, "Metric": metric, "Entries": len(values),
+                "Total": round(values.sum(), 2), "Average": round(values.mean(), 2),
+                "Best": values[best], "Best date": group.at[best, "timestamp"], "Last": values.iloc[-1],
+            })
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+
+def activity_figures(df):
+    """{activity: figure} with every entry (downsampled) and the rolling average, as the apps draw them."""
+    figures = {}
+    for activity in [a for a in ACTIVITIES if a in set(df["activity"])]:
+        act_df = df[df["activity"] == activity].sort_values("timestamp").reset_index(drop=True)
+        metrics = metric_columns(act_df, EXCLUDE)
+        if not metrics:
+            continue
+        rolled = rolling_average(act_df, metrics).assign(timestamp=act_df["timestamp"])
+        figures[activity] = activity_figure(
+            act_df, activity, metrics,
+            series={m: metric_series(act_df, m, RAW) for m in metrics},
+            trends={m: metric_series(rolled, m, RAW) for m in metrics},
+        )
+    return figures
+
+
+def report_html(player, season, rows, summary, figures):
+    parts = [
+        "<!doctype html><html><head><meta charset='utf-8'>",
+        f"<title>{html.escape(str(player))}: season report</title>",
+        "<script src='plotly.min.js'></script>",
+        "<style>body{font-family:sans-serif;max-width:1100px;margin:auto}"
+        "table{border-collapse:collapse}th,td{padding:2px 10px;border-bottom:1px solid #ddd}</style>",
+        "</head><body>",
+        f"<h1>🏀 {html.escape(str(player))}</h1><p>{html.escape(season)} · {rows} entries</p>",
+        "<h2>Season summary</h2>",
+        summary.to_html(index=False, na_rep="", float_format=lambda v: f"{v:g}"),
+    ]
+    for activity, fig in figures.items():
+        parts.append(f"<h2>{html.escape(activity)}</h2>")
+        parts.append(f"<p>Every entry, with the {ROLLING_WINDOW}-entry average dashed.</p>")
+        parts.append(fig.to_html(full_html=False, include_plotlyjs=False))
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def build_report(player, df, out_dir, formats, season):
+    """Write one player's report files. Returns what was written, the time taken and this worker's peak RSS."""
+    start = time.perf_counter()
+    df = add_derived(df)
+    summary = season_summary(df)
+    figures = activity_figures(df)
+    name = safe_name(player)
+    files = []
+    if "html" in formats:
+        path = os.path.join(out_dir, f"{name}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(report_html(player, season, len(df), summary, figures))
+        files.append(path)
+    if "xlsx" in formats:
+        sheets = {"Summary": summary}
+        for activity in ACTIVITIES:
+            act_df = df[df["activity"] == activity]
+            sheets[activity] = act_df.drop(columns=["user_id", "activity"]).dropna(axis=1, how="all")
+        path = os.path.join(out_dir, f"{name}.xlsx")
+        with open(path, "wb") as f:
+            f.write(write_xlsx(sheets))
+        files.append(path)
+    if "png" in formats:
+        os.makedirs(os.path.join(out_dir, name), exist_ok=True)
+        for activity, fig in figures.items():
+            path = os.path.join(out_dir, name, f"{safe_name(activity)}.png")
+            fig.write_image(path, width=1000, height=fig.layout.height)
+            files.append(path)
+    return {"player": player, "rows": len(df), "files": files,
+            "seconds": time.perf_counter() - start, "pid": os.getpid(), "peak_rss_mb": peak_rss_mb()}
+
+
+# -------------------------------
+# All players
+# -------------------------------
+def write_index(out_dir, season, results):
+    rows = "".join(
+        f"<tr><td><a href='{safe_name(r['player'])}.html'>{html.escape(str(r['player']))}</a></td>"
+        f"<td>{r['rows']}</td></tr>"
+        for r in sorted(results, key=lambda r: str(r["player"]))
+    )
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write("<!doctype html><html><head><meta charset='utf-8'><title>Season reports</title></head><body>"
+                f"<h1>🏀 Season reports</h1><p>{html.escape(season)}</p>"
+                f"<table><tr><th>Player</th><th>Entries</th></tr>{rows}</table></body></html>")
+
+
+def worker_pool(workers, tasks_per_worker):
+    # Workers fork from a server that imported this module (pandas, plotly, xlsxwriter) once;
+    # replacing them after a few players needs a start method other than plain fork
+    context = multiprocessing.get_context("forkserver" if sys.platform != "win32" else "spawn")
+    if hasattr(context, "set_forkserver_preload"):
+        context.set_forkserver_preload(["season_report"])
+    return ProcessPoolExecutor(workers, mp_context=context, max_tasks_per_child=tasks_per_worker)
+
+
+def generate(backend, players, out_dir, formats=("html", "xlsx"), since=None, until=None, workers=None,
+             tasks_per_worker=25, fetch_threads=4, log=print):
+    """Build every player's report. Returns (results, failures) with failures as {player: error}."""
+    workers = os.cpu_count() if workers is None else workers
+    os.makedirs(out_dir, exist_ok=True)
+    if "html" in formats:
+        # One copy of plotly.js next to the reports instead of 3.5 MB inside each of them
+        from plotly.offline import get_plotlyjs
+
+        with open(os.path.join(out_dir, "plotly.min.js"), "w", encoding="utf-8") as f:
+            f.write(get_plotlyjs())
+    season = season_label(since, until)
+
+    results, failures = [], {}
+    pool = worker_pool(workers, tasks_per_worker) if workers else None
+    fetcher = ThreadPoolExecutor(fetch_threads)
+    try:
+        remaining = iter(players)
+        fetches = deque()  # (future, player) in player order, at most fetch_threads of them
+        pending = {}  # report future -> player
+        in_flight = 2 * max(workers, 1)
+
+        def fetch_ahead():
+            # Fetched frames wait here until a worker is free, so only fetch as many as there are threads
+            for player in remaining:
+                fetches.append((fetcher.submit(backend.query, player, since=since, until=until), player))
+                if len(fetches) >= fetch_threads:
+                    break
+
+        fetch_ahead()
+        while fetches:
+            fetched, player = fetches.popleft()
+            fetch_ahead()
+            try:
+                df = fetched.result()
+            except Exception as e:
+                failures[player] = f"fetch failed: {type(e).__name__}: {e}"
+                continue
+            if df.empty:
+                log(f"{player}: no entries, skipped")
+                continue
+            if pool is None:
+                try:
+                    results.append(build_report(player, df, out_dir, formats, season))
+                except Exception as e:
+                    failures[player] = f"{type(e).__name__}: {e}"
+                continue
+            pending[pool.submit(build_report, player, df, out_dir, formats, season)] = player
+            del df
+            # Only a couple of players per worker wait in the queue, so the data fetched ahead stays small
+            while len(pending) >= in_flight or (pending and not fetches):
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    player = pending.pop(future)
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        failures[player] = f"{type(e).__name__}: {e}"
+    finally:
+        fetcher.shutdown(wait=False, cancel_futures=True)
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    if "html" in formats:
+        write_index(out_dir, season, results)
+    return results, failures
+
+
+def season_label(since, until):
+    if since is not None and until is not None:
+        return f"{since:%Y-%m-%d} to {until:%Y-%m-%d}"
+    if since is not None:
+        return f"Since {since:%Y-%m-%d}"
+    if until is not None:
+        return f"Until {until:%Y-%m-%d}"
+    return "All entries"
+
+
+def parse_date(value):
+    return datetime.fromisoformat(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["local", "supabase", "sheets"], required=True)
+    parser.add_argument("--players", nargs="+", help="default: every player in the backend")
+    parser.add_argument("--since", type=parse_date, help="first day of the season (YYYY-MM-DD)")
+    parser.add_argument("--until", type=parse_date, help="day after the season (YYYY-MM-DD)")
+    parser.add_argument("--out", default="reports")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["html", "xlsx"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="0: build in this process")
+    parser.add_argument("--tasks-per-worker", type=int, default=25, help="players before a worker is replaced")
+    parser.add_argument("--fetch-threads", type=int, default=4)
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="LocalFileBackend directory")
+    parser.add_argument("--service-account", default="service_account.json")
+    parser.add_argument("--sheet", default="Basketball Tracker")
+    args = parser.parse_args(argv)
+
+    if "png" in args.formats:
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            raise SystemExit("PNG charts need the kaleido package: pip install kaleido")
+    backend = open_backend(args)
+    players = args.players or backend.users()
+    start = time.perf_counter()
+    results, failures = generate(backend, players, args.out, args.formats, args.since, args.until,
+                                 args.workers, args.tasks_per_worker, args.fetch_threads)
+    seconds = time.perf_counter() - start
+    for player, error in failures.items():
+        print(f"{player}: {error}", file=sys.stderr)
+    worker_peak = max((r["peak_rss_mb"] or 0 for r in results), default=0)
+    print(f"{len(results)} reports in {seconds:.1f}s with {args.workers} workers: "
+          f"{len(results) / seconds:.2f} players/s, {sum(r['rows'] for r in results) / seconds:,.0f} rows/s"
+          + (f", worker peak RSS {worker_peak:.0f} MB" if worker_peak else "")
+          + (f"; {len(failures)} failed" if failures else "") + f" -> {os.path.join(args.out, 'index.html')}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
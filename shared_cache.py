@@ -0,0 +1,582 @@
+"""A cache shared by every replica of the apps: user snapshots and chart figures.
+
+Replicas behind a load balancer each have their own st.cache_data and
+backends, so each would read the same player's rows from Sheets or Supabase
+and draw the same figures. A SharedCache keeps one copy where they all look
+first, in one of two stores:
+
+- SQLiteCache: a file on a disk the replicas share (WAL mode), bounded to
+  max_bytes by evicting the least recently used entries;
+- RedisCache: any server speaking the Redis protocol; entries expire with
+  PX, and the server's maxmemory with allkeys-lru bounds the size.
+
+Keys are versioned. Each user has a version token in the store; a save
+replaces it once its rows are stored, so every replica stops finding the old
+entries at once, and those age out by TTL or LRU. Entries are only ever
+filled by a reader, from the source, after it has seen the token: nothing
+read before a save can be stored under the version that save created. Tokens are random rather than counters: a token lost to eviction can
+never bring back entries written under an earlier one.
+
+A miss takes a short lease on the key (SET NX) before building, and other
+processes missing the same key meanwhile wait for its value instead of
+building it too: a save does not make every replica redraw the same figures.
+
+Frames are stored as Arrow IPC and figures as plotly JSON, not pickles: a
+shared server is no place to load code from. Each process also keeps the
+last few values it decoded, so a rerun whose user version has not changed
+costs one lookup of the token (at most one a second per user).
+
+TRACKER_CACHE_URL picks the store (sqlite:///path/to/cache.db or
+redis://[:password@]host:6379/0); see default_cache().
+"""
+import hashlib
+import io
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import unquote, urlparse
+
+from instrumentation import add_collector, timed
+
+CACHE_URL = os.environ.get("TRACKER_CACHE_URL")
+DEFAULT_PATH = "tracker_cache.db"
+# Part of every key: bump when the encoding of stored values changes
+KEY_FORMAT = 1
+
+
+class CacheError(Exception):
+    """An error reply from the cache server."""
+
+
+# -------------------------------
+# Stores: bytes by key, with TTL and a size bound
+# -------------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key        TEXT PRIMARY KEY,
+    value      BLOB NOT NULL,
+    size       INTEGER NOT NULL,
+    expires_at REAL,
+    used_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used_at);
+CREATE TABLE IF NOT EXISTS totals (
+    id        INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes     INTEGER NOT NULL,
+    evictions INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries
+    BEGIN UPDATE totals SET bytes = bytes + NEW.size; END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries
+    BEGIN UPDATE totals SET bytes = bytes + NEW.size - OLD.size; END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries
+    BEGIN UPDATE totals SET bytes = bytes - OLD.size; END;
+"""
+
+
+class SQLiteCache:
+    """Entries in a SQLite file any number of processes open at once.
+
+    Reads stamp the entry's last use; a write that takes the total past
+    max_bytes drops expired entries, then the least recently used ones.
+    The total is kept by triggers, so no process has to scan the table.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=256 * 2**20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # A cache can lose its last writes in a power cut; it cannot afford an fsync per entry
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(SCHEMA)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] <= now:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE entries SET used_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, value, ttl=None, only_if_absent=False):
+        """Store value (bytes) for ttl seconds (None: until evicted). Returns False if only_if_absent and
+        an unexpired entry is there already."""
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if only_if_absent:
+                    self._db.execute("DELETE FROM entries WHERE key = ? AND expires_at <= ?", (key, now))
+                    stored = self._db.execute(
+                        "INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?, ?)",
+                        (key, value, len(value), expires_at, now),
+                    ).rowcount > 0
+                else:
+                    self._db.execute(
+                        "INSERT INTO entries VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                        "value = excluded.value, size = excluded.size, expires_at = excluded.expires_at, "
+                        "used_at = excluded.used_at",
+                        (key, value, len(value), expires_at, now),
+                    )
+                    stored = True
+                if stored:
+                    self._evict(now)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return stored
+
+    def _evict(self, now):
+        (total,) = self._db.execute("SELECT bytes FROM totals").fetchone()
+        if self.max_bytes is None or total <= self.max_bytes:
+            return
+        evicted = self._db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+        (total,) = self._db.execute("SELECT bytes FROM totals").fetchone()
+        # Down to 90%, so the next few writes do not each evict again
+        target = int(self.max_bytes * 0.9)
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY used_at").fetchall():
+            if total <= target:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self._db.execute("UPDATE totals SET evictions = evictions + ?", (evicted,))
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            total, evictions = self._db.execute("SELECT bytes, evictions FROM totals").fetchone()
+        return {"entries": entries, "bytes": total, "max_bytes": self.max_bytes, "evictions": evictions}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RedisCache:
+    """Entries on a Redis-protocol server, over one connection (RESP2, no client library needed).
+
+    With max_bytes, the server is asked to hold at most that much and evict the
+    least recently used keys beyond it; managed servers that refuse CONFIG keep
+    their own policy, which is then theirs to set.
+    """
+
+    def __init__(self, host="localhost", port=6379, db=0, password=None, max_bytes=None, timeout=2.0):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.config_error = None
+        self._lock = threading.Lock()
+        self._sock = None
+        self._reader = None
+
+    def _connect(self):
+        self._sock = socket.create_connection(self.address, timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._roundtrip("AUTH", self.password)
+        if self.db:
+            self._roundtrip("SELECT", self.db)
+        if self.max_bytes is not None:
+            try:
+                self._roundtrip("CONFIG", "SET", "maxmemory", self.max_bytes)
+                self._roundtrip("CONFIG", "SET", "maxmemory-policy", "allkeys-lru")
+            except CacheError as e:
+                self.config_error = str(e)
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._reader = None
+
+    def _roundtrip(self, *args):
+        parts = [a if isinstance(a, bytes) else str(a).encode() for a in args]
+        self._sock.sendall(
+            b"*%d\r\n" % len(parts) + b"".join(b"$%d\r\n%s\r\n" % (len(p), p) for p in parts)
+        )
+        return self._reply()
+
+    def _reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("the cache server closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise CacheError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._reply() for _ in range(length)]
+        raise CacheError(f"unexpected reply {line[:40]!r}")
+
+    def command(self, *args):
+        """Send one command and return its reply, reconnecting once if the connection dropped."""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._roundtrip(*args)
+                except (OSError, ConnectionError):
+                    self._disconnect()
+                    if attempt:
+                        raise
+
+    def get(self, key):
+        return self.command("GET", key)
+
+    def set(self, key, value, ttl=None, only_if_absent=False):
+        args = ["SET", key, value]
+        if ttl:
+            args += ["PX", int(ttl * 1000)]
+        if only_if_absent:
+            args.append("NX")
+        return self.command(*args) is not None
+
+    def delete(self, key):
+        self.command("DEL", key)
+
+    def stats(self):
+        info = {}
+        for section in ("memory", "stats"):
+            for line in self.command("INFO", section).decode().splitlines():
+                name, _, value = line.partition(":")
+                info[name] = value
+        return {
+            "entries": self.command("DBSIZE"), "bytes": int(info.get("used_memory", 0)),
+            "max_bytes": int(info.get("maxmemory", 0)) or self.max_bytes,
+            "evictions": int(info.get("evicted_keys", 0)),
+        }
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+
+def open_store(url, max_bytes=None):
+    """A store from a URL: sqlite:///relative.db, sqlite:////absolute.db or redis://[:password@]host[:port][/db]."""
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        path = parsed.path[1:] if parsed.path.startswith("/") else parsed.path
+        return SQLiteCache(path or DEFAULT_PATH, **({"max_bytes": max_bytes} if max_bytes else {}))
+    if parsed.scheme == "redis":
+        return RedisCache(
+            parsed.hostname or "localhost", parsed.port or 6379, db=int(parsed.path.strip("/") or 0),
+            password=unquote(parsed.password) if parsed.password else None, max_bytes=max_bytes,
+        )
+    raise ValueError(f"unsupported cache URL {url!r}: use sqlite:///path or redis://host:port/db")
+
+
+# -------------------------------
+# Values: frames as Arrow IPC, figures as plotly JSON
+# -------------------------------
+def encode_frame(df):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def decode_frame(data):
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(data).read_all().to_pandas()
+
+
+def encode_figure(fig):
+    return fig.to_json(validate=False).encode()
+
+
+def decode_figure(data):
+    import plotly.graph_objects as go
+
+    # The figure was validated when it was built; validating it again costs 4x the decode
+    return go.Figure(json.loads(data), _validate=False)
+
+
+CODECS = {
+    "snapshot": (encode_frame, decode_frame),
+    "figure": (encode_figure, decode_figure),
+}
+
+
+# -------------------------------
+# The cache the apps read through
+# -------------------------------
+class SharedCache:
+    """Versioned snapshots and figures in a store shared by every process. Thread-safe.
+
+    ttl: seconds an entry lives (also a bound on how long rows written straight to
+    the source, by no process using this cache, can go unseen). Store errors are
+    counted and the value built locally instead, so a cache outage only costs speed.
+    Values returned are shared with other callers in this process: do not mutate them.
+    """
+
+    def __init__(self, store, namespace="tracker", ttl=3600, version_ttl=1.0, local_entries=64, lease=5.0,
+                 poll=0.02):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+        self.local_entries = local_entries
+        self.lease = lease  # longest wait for another process's build before building anyway
+        self.poll = poll
+        self._lock = threading.Lock()
+        self._versions = {}  # user_id -> (checked_at, token)
+        self._local = OrderedDict()  # key -> decoded value, most recently used last
+        # local: decoded in this process already; hits: read from the store (waits: after another
+        # process built it); misses: built here
+        self.counts = {kind: {"local": 0, "hits": 0, "waits": 0, "misses": 0} for kind in CODECS}
+        self.invalidations = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.errors = 0
+        self.last_error = None
+
+    def _failed(self, e):
+        with self._lock:
+            self.errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+
+    # ----------- versions -----------
+    def _version_key(self, user_id):
+        return f"{self.namespace}:{KEY_FORMAT}:version:{user_id}"
+
+    def version(self, user_id):
+        """The user's current version token, as every process sees it (re-checked once a second)."""
+        with self._lock:
+            checked = self._versions.get(user_id)
+        if checked is not None and time.monotonic() - checked[0] < self.version_ttl:
+            return checked[1]
+        key = self._version_key(user_id)
+        try:
+            token = self.store.get(key)
+            if token is None:
+                # First use, or evicted: a fresh token, so no entry from before can match
+                self.store.set(key, uuid.uuid4().hex.encode(), only_if_absent=True)
+                token = self.store.get(key)
+            token = token.decode()
+        except Exception as e:
+            self._failed(e)
+            # Unreachable: a token nobody else has, so nothing stale is served from this process either
+            token = checked[1] if checked is not None else f"local-{uuid.uuid4().hex}"
+        with self._lock:
+            self._versions[user_id] = (time.monotonic(), token)
+        return token
+
+    def invalidate(self, user_id):
+        """Give the user a new version, so no process finds the old entries."""
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._versions[user_id] = (time.monotonic(), token)
+            self.invalidations += 1
+        try:
+            self.store.set(self._version_key(user_id), token.encode())
+        except Exception as e:
+            self._failed(e)
+
+    # ----------- values -----------
+    def _key(self, kind, parts):
+        digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+        return f"{self.namespace}:{KEY_FORMAT}:{kind}:{digest}"
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_entries:
+                self._local.popitem(last=False)
+
+    def _put(self, kind, key, value):
+        self._remember(key, value)
+        try:
+            data = CODECS[kind][0](value)
+            self.store.set(key, data, self.ttl, only_if_absent=True)
+        except Exception as e:
+            self._failed(e)
+            return
+        with self._lock:
+            self.bytes_written += len(data)
+
+    def get_or_build(self, kind, parts, build):
+        """The `kind` value for `parts` (which must include every version it depends on), built once
+        by whichever process misses first."""
+        key = self._key(kind, parts)
+        counts = self.counts[kind]
+        with self._lock:
+            value = self._local.get(key)
+            if value is not None:
+                self._local.move_to_end(key)
+                counts["local"] += 1
+                return value
+        with timed(f"cache.get: {kind}"):
+            value, result, leased = self._load(key, kind), "hits", False
+            if value is None:
+                leased = self._take_lease(key)
+            if value is None and not leased:
+                # Another process is building it: wait for its copy rather than build a second one
+                deadline = time.monotonic() + self.lease
+                while value is None and time.monotonic() < deadline:
+                    time.sleep(self.poll)
+                    value = self._load(key, kind)
+                result = "waits"
+        with self._lock:
+            counts[result if value is not None else "misses"] += 1
+        if value is not None:
+            return value
+        try:
+            value = build()
+            with timed(f"cache.put: {kind}"):
+                # Whoever builds after a lease ran out may have stored it first; either copy will do
+                self._put(kind, key, value)
+        finally:
+            if leased:
+                self._release_lease(key)
+        return value
+
+    def _load(self, key, kind):
+        try:
+            data = self.store.get(key)
+            value = CODECS[kind][1](data) if data is not None else None
+        except Exception as e:
+            self._failed(e)
+            return None
+        if value is not None:
+            with self._lock:
+                self.bytes_read += len(data)
+            self._remember(key, value)
+        return value
+
+    def _take_lease(self, key):
+        try:
+            return self.store.set(f"{key}:lease", b"1", self.lease, only_if_absent=True)
+        except Exception as e:
+            # Nothing to wait for when the store is down: build here
+            self._failed(e)
+            return True
+
+    def _release_lease(self, key):
+        try:
+            self.store.delete(f"{key}:lease")
+        except Exception as e:
+            self._failed(e)
+
+    def snapshot(self, user_id, build):
+        """The user's snapshot at their current version; build() reads it from the backend."""
+        return self.get_or_build("snapshot", (user_id, self.version(user_id)), build)
+
+    def figure(self, parts, build):
+        return self.get_or_build("figure", parts, build)
+
+    # ----------- metrics -----------
+    def stats(self):
+        with self._lock:
+            counts = {kind: dict(c) for kind, c in self.counts.items()}
+            stats = {"invalidations": self.invalidations, "bytes_read": self.bytes_read,
+                     "bytes_written": self.bytes_written, "errors": self.errors, "last_error": self.last_error}
+        for c in counts.values():
+            lookups = c["local"] + c["hits"] + c["waits"] + c["misses"]
+            c["hit_rate"] = (lookups - c["misses"]) / lookups if lookups else None
+        try:
+            store = self.store.stats()
+        except Exception as e:
+            self._failed(e)
+            store = {}
+        return {**stats, "kinds": counts, "store": store}
+
+    def summary(self):
+        """One line for the sidebar: hit rate per kind and the store's size."""
+        stats = self.stats()
+        rates = ", ".join(
+            f"{kind} {c['hit_rate']:.0%}" for kind, c in stats["kinds"].items() if c["hit_rate"] is not None
+        )
+        store = stats["store"]
+        size = f" · {store['entries']} entries, {store['bytes'] / 2**20:.1f} MB" if store else ""
+        error = f" · {stats['last_error']}" if stats["errors"] else ""
+        return f"🗄 Shared cache: {rates or 'no lookups yet'}{size}{error}"
+
+    def prometheus_lines(self):
+        stats = self.stats()
+        lines = [
+            "# HELP tracker_cache_lookups_total Shared cache lookups, by kind and where they were answered.",
+            "# TYPE tracker_cache_lookups_total counter",
+        ]
+        for kind, c in stats["kinds"].items():
+            for result in ("local", "hits", "waits", "misses"):
+                lines.append(f'tracker_cache_lookups_total{{kind="{kind}",result="{result}"}} {c[result]}')
+        lines += [
+            "# HELP tracker_cache_invalidations_total User versions replaced by this process.",
+            "# TYPE tracker_cache_invalidations_total counter",
+            f"tracker_cache_invalidations_total {stats['invalidations']}",
+            "# HELP tracker_cache_errors_total Store errors (the value was built locally instead).",
+            "# TYPE tracker_cache_errors_total counter",
+            f"tracker_cache_errors_total {stats['errors']}",
+        ]
+        store = stats["store"]
+        if store:
+            lines += [
+                "# HELP tracker_cache_store_bytes Bytes held by the shared store.",
+                "# TYPE tracker_cache_store_bytes gauge",
+                f"tracker_cache_store_bytes {store['bytes']}",
+                "# HELP tracker_cache_evictions_total Entries the store evicted to stay within its size.",
+                "# TYPE tracker_cache_evictions_total counter",
+                f"tracker_cache_evictions_total {store['evictions']}",
+            ]
+        return lines
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """The process's SharedCache on TRACKER_CACHE_URL, or None when the variable is not set."""
+    global _default
+    if not CACHE_URL:
+        return None
+    with _default_lock:
+        if _default is None:
+            _default = SharedCache(
+                open_store(CACHE_URL, max_bytes=int(os.environ.get("TRACKER_CACHE_MAX_BYTES", 0)) or None),
+                namespace=os.environ.get("TRACKER_CACHE_NAMESPACE", "tracker"),
+                ttl=float(os.environ.get("TRACKER_CACHE_TTL", 3600)),
+            )
+            add_collector(_default.prometheus_lines)
+        return _default
@@ -0,0 +1,322 @@
+"""Process-wide gateway for Google Sheets calls: quota, backoff, coalescing.
+
+Every SheetsBackend on a spreadsheet sends its calls through one
+SheetsGateway (see shared_gateway), so all sessions in the process share:
+
+- token buckets sized to the per-minute read and write quotas, so calls wait
+  their turn instead of running into 429s;
+- retries with exponential backoff when a 429 gets through anyway (another
+  process on the same quota), pausing every caller of that bucket meanwhile;
+- singleflight reads: a read already in flight for the same key is joined,
+  not repeated;
+- merged appends: rows appended while another append waits for its token
+  go out with it, as appendCells requests in a single batch_update.
+"""
+import random
+import threading
+import time
+from datetime import datetime
+
+# Sheets counts serial dates in days from this epoch
+SERIAL_EPOCH = datetime(1899, 12, 30)
+DATE_TIME_FORMAT = {"numberFormat": {"type": "DATE_TIME", "pattern": "yyyy-mm-dd hh:mm:ss"}}
+
+
+def status_code(error):
+    """HTTP status of a gspread APIError (or anything carrying a response), else None."""
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code > 0:
+        return code
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+
+def cell_data(value):
+    """CellData for a value, as USER_ENTERED would store it: numbers as numbers, datetimes as dates."""
+    if value is None or value == "" or (isinstance(value, float) and value != value):
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, datetime):
+        serial = (value.replace(tzinfo=None) - SERIAL_EPOCH).total_seconds() / 86400
+        return {"userEnteredValue": {"numberValue": serial}, "userEnteredFormat": DATE_TIME_FORMAT}
+    if hasattr(value, "item"):  # NumPy scalar
+        value = value.item()
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
+class TokenBucket:
+    """At most `limit` calls per `window` seconds, `burst` of them back to back.
+
+    The refill rate leaves room for the burst, so even a full burst followed by
+    steady use stays within the limit over any window. take() reserves a token
+    and sleeps until it is due; callers queue up in the order they asked.
+    """
+
+    def __init__(self, limit, window=60.0, burst=10, clock=time.monotonic, sleep=time.sleep):
+        self.burst = max(1, min(burst, limit - 1)) if limit > 1 else 1
+        self.rate = max(limit - self.burst, 1) / window
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self):
+        """Block until a token is available. Returns the seconds waited."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += wait
+        if wait:
+            self.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """Hold every caller back for `seconds` on top of the tokens already owed (after a 429)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Append:
+    __slots__ = ("targets", "wake", "lead", "error")
+
+    def __init__(self, targets):
+        self.targets = targets  # [(sheet id, rows of values)]
+        self.wake = threading.Event()
+        self.lead = False  # set when this caller has to send the next batch
+        self.error = None
+
+
+class SheetsGateway:
+    """Quota-aware access to one spreadsheet. Thread-safe; share one per spreadsheet and process.
+
+    reads_per_minute / writes_per_minute: the quotas to stay under (None: no limit).
+    Results of read() are shared by every caller that joined the flight: do not mutate them.
+    """
+
+    def __init__(self, spreadsheet, reads_per_minute=60, writes_per_minute=60, burst=10, window=60.0,
+                 max_retries=5, backoff=1.0, max_backoff=32.0, coalesce=True, sleep=time.sleep):
+        self.spreadsheet = spreadsheet
+        self.buckets = {
+            "read": TokenBucket(reads_per_minute, window, burst, sleep=sleep) if reads_per_minute else None,
+            "write": TokenBucket(writes_per_minute, window, burst, sleep=sleep) if writes_per_minute else None,
+        }
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.coalesce = coalesce
+        self.sleep = sleep
+
+        self.calls = {"read": 0, "write": 0}
+        self.retries = 0
+        self.coalesced_reads = 0
+        self.merged_appends = 0
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._flights = {}  # key -> _Flight of the read in progress
+        self._appends = []  # _Append requests waiting for the next batch
+        self._appending = False
+
+    # ----------- calls -----------
+    def call(self, kind, fn, *args, **kwargs):
+        """Run fn under the `kind` ("read" or "write") quota, retrying 429s with backoff.
+
+        Reads are also retried on 5xx; writes are not, since they may have been applied.
+        """
+        return self._attempts(kind, fn, args, kwargs, token_taken=False)
+
+    def _attempts(self, kind, fn, args, kwargs, token_taken):
+        bucket = self.buckets[kind]
+        for attempt in range(self.max_retries + 1):
+            if bucket is not None and not token_taken:
+                bucket.take()
+            token_taken = False
+            with self._lock:
+                self.calls[kind] += 1
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                code = status_code(e)
+                retryable = code == 429 or (kind == "read" and code is not None and code >= 500)
+                if not retryable or attempt == self.max_retries:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    raise
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                with self._lock:
+                    self.retries += 1
+                if bucket is not None and code == 429:
+                    # Everyone on this quota backs off, not just this caller
+                    bucket.pause(delay)
+                else:
+                    self.sleep(delay)
+
+    def read(self, key, fn, *args, **kwargs):
+        """call("read", fn, ...), joining a read of the same key that is already in flight."""
+        if not self.coalesce:
+            return self.call("read", fn, *args, **kwargs)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced_reads += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self.call("read", fn, *args, **kwargs)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    # ----------- spreadsheet-level helpers -----------
+    def worksheets(self):
+        return self.read(("worksheets",), self.spreadsheet.worksheets)
+
+    def values(self, ws):
+        """A worksheet's formatted values, header row first."""
+        return self.read(("values", ws.title), ws.get_all_values)
+
+    def header_rows(self, titles, fresh=False):
+        """{title: first row} for several worksheets, in one values_batch_get.
+
+        fresh: do not join a read already in flight, which may have started before a change.
+        """
+        titles = list(titles)
+        if not titles:
+            return {}
+        ranges = [f"{quote_title(t)}!1:1" for t in titles]
+        if fresh:
+            response = self.call("read", self.spreadsheet.values_batch_get, ranges)
+        else:
+            response = self.read(("headers", *titles), self.spreadsheet.values_batch_get, ranges)
+        return {t: (r.get("values") or [[]])[0] for t, r in zip(titles, response.get("valueRanges", []))}
+
+    def update_rows(self, updates):
+        """Write {title: rows starting at A1} for several worksheets, in one values_batch_update."""
+        if not updates:
+            return
+        self.call("write", self.spreadsheet.values_batch_update, {
+            "valueInputOption": "RAW",
+            "data": [{"range": f"{quote_title(t)}!A1", "values": rows} for t, rows in updates.items()],
+        })
+
+    def append(self, appends):
+        """Append rows of values (see cell_data) to worksheets, after each one's last row with data.
+
+        `appends` is a list of (worksheet, rows). They go out in one batch_update, together
+        with appends other threads queued while this one waited for a write token; the
+        caller returns once its own rows are stored.
+        """
+        request = _Append([(ws.id, values) for ws, values in appends if values])
+        if not request.targets:
+            return
+        if not self.coalesce:
+            self.call("write", self.spreadsheet.batch_update, append_body([request]))
+            return
+        with self._lock:
+            self._appends.append(request)
+            lead = not self._appending
+            self._appending = True
+        if not lead:
+            request.wake.wait()
+            if not request.lead:
+                if request.error is not None:
+                    raise request.error
+                return
+        self._send_appends()
+        if request.error is not None:
+            raise request.error
+
+    def _send_appends(self):
+        bucket = self.buckets["write"]
+        if bucket is not None:
+            bucket.take()  # appends queued meanwhile join this batch
+        with self._lock:
+            batch, self._appends = self._appends, []
+            self.merged_appends += len(batch) - 1
+        try:
+            self._attempts("write", self.spreadsheet.batch_update, (append_body(batch),), {},
+                           token_taken=bucket is not None)
+        except Exception as e:
+            for r in batch:
+                r.error = e
+        finally:
+            with self._lock:
+                successor = self._appends[0] if self._appends else None
+                if successor is not None:
+                    successor.lead = True
+                else:
+                    self._appending = False
+            for r in batch:
+                r.wake.set()
+            if successor is not None:
+                successor.wake.set()
+
+    def stats(self):
+        with self._lock:
+            waited = {k: round(b.waited, 3) for k, b in self.buckets.items() if b is not None}
+            return {**{f"{k}_calls": n for k, n in self.calls.items()}, "retries": self.retries,
+                    "coalesced_reads": self.coalesced_reads, "merged_appends": self.merged_appends,
+                    "seconds_waited": waited}
+
+
+def append_body(appends):
+    """batch_update body with an appendCells request per worksheet of every queued append."""
+    return {"requests": [append_request(sheet_id, values) for r in appends for sheet_id, values in r.targets]}
+
+
+def append_request(sheet_id, values):
+    """appendCells request adding rows of values after the last row with data."""
+    return {"appendCells": {
+        "sheetId": sheet_id,
+        "rows": [{"values": [cell_data(v) for v in row]} for row in values],
+        "fields": "userEnteredValue,userEnteredFormat.numberFormat",
+    }}
+
+
+def quote_title(title):
+    """A worksheet title as it appears in an A1 range."""
+    return "'" + title.replace("'", "''") + "'"
+
+
+_gateways = {}
+_gateways_lock = threading.Lock()
+
+
+def shared_gateway(spreadsheet, **options):
+    """The process's gateway for this spreadsheet (by id), created with `options` on first use."""
+    key = getattr(spreadsheet, "id", None) or id(spreadsheet)
+    with _gateways_lock:
+        gateway = _gateways.get(key)
+        if gateway is None:
+            gateway = _gateways[key] = SheetsGateway(spreadsheet, **options)
+        return gateway
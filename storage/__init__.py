@@ -0,0 +1,36 @@
+"""Storage backends shared by the tracker apps.
+
+Every backend implements StorageBackend: append, bulk_append, query by
+user/activity/time range, and snapshot. Pick one per deployment; the apps
+do not care which. SyncedBackend wraps a remote one with a local journal
+for offline use.
+
+Names are imported on first use, so `from storage import SyncedBackend`
+loads that backend's dependencies only (not pyarrow, say).
+"""
+import importlib
+
+_MODULES = {
+    "KEY_COLUMNS": "storage.base",
+    "StorageBackend": "storage.base",
+    "LocalFileBackend": "storage.local_backend",
+    "MemoryBackend": "storage.memory_backend",
+    "SheetsBackend": "storage.sheets_backend",
+    "SupabaseBackend": "storage.supabase_backend",
+    "SyncedBackend": "storage.synced_backend",
+    "SyncEngine": "storage.synced_backend",
+}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError(f"module 'storage' has no attribute {name!r}")
+    value = getattr(importlib.import_module(_MODULES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *__all__})
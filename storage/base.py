@@ -0,0 +1,263 @@
+"""The interface every tracker storage backend implements.
+
+A row is a dict with user_id, activity and timestamp plus the stat columns
+from the activity's form. Backends implement _write() and _read(); the
+public methods add the shared semantics on top: timestamps filled in,
+per-user write versions bumped, and query results normalized to the same
+shape whichever backend produced them.
+
+With a SharedCache (see shared_cache.py) set as shared_cache, snapshots are
+read through it and versions are the cache's, shared by every process.
+
+Every write also updates weekly team rollups (see rollups.py). Backends that
+can share them between processes implement _read_rollups()/_write_rollups();
+the rest keep them in memory only.
+"""
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from instrumentation import timed
+from rollups import RollupTable, rollup_delta
+
+KEY_COLUMNS = ["user_id", "activity", "timestamp"]
+
+
+def to_timestamp(value):
+    """Naive pandas Timestamp for a datetime or ISO string; tz-aware values are converted to UTC."""
+    ts = pd.Timestamp(value)
+    return ts.tz_convert(None) if ts.tz else ts
+
+
+def normalize_frame(df, activity=None, since=None, until=None, columns=None):
+    """Apply query semantics uniformly: key columns first, naive datetime timestamps,
+    [since, until) window, optional activity and column selection, no all-empty
+    stat columns, timestamp order."""
+    df = df.copy() if not df.empty else pd.DataFrame(columns=KEY_COLUMNS)
+    for col in KEY_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    ts = pd.to_datetime(df["timestamp"], utc=True, format="mixed")
+    df["timestamp"] = ts.dt.tz_localize(None)
+
+    mask = pd.Series(True, index=df.index)
+    if activity is not None:
+        mask &= df["activity"] == activity
+    if since is not None:
+        mask &= df["timestamp"] >= to_timestamp(since)
+    if until is not None:
+        mask &= df["timestamp"] < to_timestamp(until)
+    df = df[mask]
+
+    # Key columns first, then only the stat columns the returned rows actually fill in
+    stats = [c for c in (df.columns if columns is None else columns) if c in df.columns and c not in KEY_COLUMNS]
+    stats = [c for c in stats if df[c].notna().any()]
+    return df[[*KEY_COLUMNS, *stats]].sort_values("timestamp", kind="stable", ignore_index=True)
+
+
+class StorageBackend:
+    """Base class: append, bulk_append, query by user/activity/time range, snapshot."""
+
+    # Seconds before rollups are reloaded from storage (other processes write too); None: never
+    rollup_ttl = None
+    # False when the storage keeps the rollups up to date itself (e.g. a database trigger)
+    rollups_on_write = True
+    # Seconds to wait for another process building the persisted rollups from history
+    rollup_build_wait = 60
+
+    def __init__(self):
+        self._versions = {}
+        self.instance_id = uuid.uuid4().hex
+        self.shared_cache = None  # a SharedCache, for apps running as several processes
+        self._rollups = None
+        self._rollups_loaded_at = 0.0
+        self._rollups_lock = threading.Lock()
+
+    # ----------- writes -----------
+    def append(self, user_id, activity, row):
+        """Store one form row for a user. The timestamp defaults to now."""
+        row = {**row, "user_id": user_id, "activity": activity}
+        row.setdefault("timestamp", datetime.now())
+        self.bulk_append([row])
+
+    def bulk_append(self, rows):
+        """Store many complete rows (each carrying user_id, activity and timestamp) in as few calls as possible."""
+        rows = list(rows)
+        if not rows:
+            return
+        # Load (or build) the rollups before writing, so the new rows are not counted twice
+        table = self.rollups() if self.rollups_on_write else self._rollups
+        with timed(f"{type(self).__name__}.write"):
+            self._write(rows)
+        delta = rollup_delta(rows)
+        if self.rollups_on_write:
+            with timed(f"{type(self).__name__}.write_rollups"):
+                self._write_rollups(delta)
+        if table is not None:
+            table.add(delta)
+        for user_id in {r["user_id"] for r in rows}:
+            self.bump_version(user_id)
+
+    # ----------- reads -----------
+    def query(self, user_id, activity=None, since=None, until=None, columns=None):
+        """A user's rows as a DataFrame, optionally limited to one activity, a [since, until) window and some columns."""
+        with timed(f"{type(self).__name__}.read"):
+            df = self._read(user_id, activity=activity, since=since, until=until, columns=columns)
+        return normalize_frame(df, activity, since, until, columns)
+
+    def snapshot(self, user_id, since=None):
+        """Everything stored for the user (from `since` on), through the shared cache when there is one."""
+        if self.shared_cache is None:
+            return self.query(user_id, since=since)
+        # Filled from the source, not a read cache of this process: the entry is what every process will see
+        df = self.shared_cache.snapshot(user_id, lambda: self.changes_since(user_id))
+        return df.copy(deep=False) if since is None else normalize_frame(df, since=since)
+
+    def missing(self, rows, ordinals=None):
+        """The rows not stored yet, comparing keys with timestamps to the second (Sheets' precision).
+
+        Several rows can share a key (saves in the same second): the i-th of them is stored once
+        the backend holds more than i rows with the key. `ordinals` gives each row's i (a journal's
+        entry number); by default rows sharing a key are numbered in the order given.
+
+        Lets a writer that may have stored a batch before failing send it again without duplicates.
+        """
+        def key(activity, ts):
+            return activity, to_timestamp(ts).floor("s")
+
+        rows = list(rows)
+        if ordinals is None:
+            seen = Counter()
+            ordinals = []
+            for r in rows:
+                k = (r["user_id"], *key(r["activity"], r["timestamp"]))
+                ordinals.append(seen[k])
+                seen[k] += 1
+        missing = []
+        for user_id in dict.fromkeys(r["user_id"] for r in rows):
+            own = [(r, i) for r, i in zip(rows, ordinals) if r["user_id"] == user_id]
+            stamps = [to_timestamp(r["timestamp"]) for r, _ in own]
+            existing = self.query(user_id, since=min(stamps).floor("s"), until=max(stamps) + pd.Timedelta(seconds=1))
+            stored = Counter(key(a, t) for a, t in zip(existing["activity"], existing["timestamp"]))
+            missing += [r for r, i in own if i >= stored[key(r["activity"], r["timestamp"])]]
+        return missing
+
+    def changes_since(self, user_id, since=None):
+        """The user's rows from `since` on, as fresh as the backend can give them (for syncing).
+
+        Backends whose query() serves a long-lived cache override this to ask the source.
+        """
+        return self.query(user_id, since=since)
+
+    # ----------- team rollups -----------
+    def users(self):
+        """Every user with stored data."""
+        raise NotImplementedError
+
+    def rollups(self):
+        """The merged weekly rollups, loaded from storage on first use (and again after rollup_ttl)."""
+        with self._rollups_lock:
+            expired = self.rollup_ttl is not None and time.monotonic() - self._rollups_loaded_at > self.rollup_ttl
+            if self._rollups is None or expired:
+                with timed(f"{type(self).__name__}.read_rollups"):
+                    stored = self._read_rollups()
+                if stored is None:
+                    stored = self._build_rollups()
+                self._rollups = RollupTable(stored)
+                self._rollups_loaded_at = time.monotonic()
+            return self._rollups
+
+    def _build_rollups(self):
+        """Nothing persisted yet: build once from the full history and store it.
+
+        Only the process holding the build lock builds; two building at once would
+        each store the whole history. The others wait for its result.
+        """
+        deadline = time.monotonic() + self.rollup_build_wait
+        while True:
+            with self._rollup_build_lock() as owner:
+                if owner:
+                    # Someone may have finished a build between our read and taking the lock
+                    stored = self._read_rollups()
+                    if stored is None:
+                        stored = self._history_rollups()
+                        self._store_built_rollups(stored)
+                    return stored
+            time.sleep(0.5)
+            stored = self._read_rollups()
+            if stored is not None:
+                return stored
+            if time.monotonic() > deadline:
+                # Serve this process from memory; the builder still stores the shared copy
+                return self._history_rollups()
+
+    def _history_rollups(self):
+        return rollup_delta(pd.concat([self.snapshot(u) for u in self.users()] or [pd.DataFrame()], ignore_index=True))
+
+    def team_rollups(self, since=None, activity=None):
+        """Weekly rollups for every player in one read, optionally from `since` and for one activity."""
+        df = self.rollups().frame()
+        if activity is not None:
+            df = df[df["activity"] == activity]
+        if since is not None:
+            # Weeks are labelled by their Monday; keep the week `since` falls in
+            df = df[df["week"] > to_timestamp(since) - pd.Timedelta(days=7)]
+        return df
+
+    def rollup_version(self):
+        """Changes whenever team_rollups() may return something new; use it as a cache key."""
+        table = self.rollups()
+        return self.instance_id, self._rollups_loaded_at, table.version
+
+    # ----------- versions -----------
+    def version(self, user_id):
+        """Changes whenever the user's data changes (in any process, with a shared cache); use it as a cache key."""
+        if self.shared_cache is not None:
+            return self.shared_cache.version(user_id)
+        return self._versions.get(user_id, 0)
+
+    def cache_key(self, user_id):
+        """Key for caches shared across backends and sessions: this backend, this user, this version."""
+        # Versions from a shared cache mean the same in every process, and so do keys built on them
+        owner = self.shared_cache.namespace if self.shared_cache is not None else self.instance_id
+        return owner, user_id, self.version(user_id)
+
+    def bump_version(self, user_id):
+        """Mark the user's data changed (with a shared cache, for every process)."""
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        if self.shared_cache is not None:
+            # Only the token changes: the next reader fills the new version from the source, which
+            # then holds every write made before the token was set
+            self.shared_cache.invalidate(user_id)
+
+    # ----------- implemented by backends -----------
+    def _write(self, rows):
+        raise NotImplementedError
+
+    def _read(self, user_id, activity=None, since=None, until=None, columns=None):
+        """Return at least the matching rows; filters are re-applied by query(), so pushing them down is optional."""
+        raise NotImplementedError
+
+    def _read_rollups(self):
+        """Persisted rollups (any number of rows per key; they are merged), or None if there are none yet."""
+        return None
+
+    def _write_rollups(self, delta):
+        """Persist a rollup delta. Deltas are additive, so appending them to a log is enough."""
+
+    def _store_built_rollups(self, df):
+        """Persist rollups built from the full history, where none were stored.
+
+        Readers must see all of it or none of it (_read_rollups() returning None until then).
+        """
+        self._write_rollups(df)
+
+    @contextmanager
+    def _rollup_build_lock(self):
+        """Yield True to the one process allowed to build the rollups from history, False to the others."""
+        yield True
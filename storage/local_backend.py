@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from parquet_store import DEFAULT_ROOT, ParquetStore
+from rollups import ROLLUP_COLUMNS, combine
+from storage.base import StorageBackend, to_timestamp
+
+
+class LocalFileBackend(StorageBackend):
+    """Partitioned Parquet files on local disk, one directory per user and activity.
+
+    Team rollups are a log of delta part files under <root>/_rollups, merged on load.
+    A compacted part lists the parts it merged in its metadata; readers skip those
+    until they are deleted.
+    """
+
+    rollup_ttl = 30
+    # Merge the rollup log into one file once it has this many parts
+    ROLLUP_COMPACT_PARTS = 64
+    # A lock file older than this was left by a process that died holding it
+    LOCK_TIMEOUT = 300
+
+    def __init__(self, root=DEFAULT_ROOT):
+        super().__init__()
+        self.store = ParquetStore(root)
+        self.rollup_dir = os.path.join(root, "_rollups")
+
+    def users(self):
+        return self.store.players()
+
+    def _write(self, rows):
+        df = pd.DataFrame(rows)
+        for (user_id, activity), group in df.groupby(["user_id", "activity"], sort=False):
+            self.store.append(user_id, activity, group.drop(columns=["user_id", "activity"]).dropna(axis=1, how="all"))
+
+    def _read(self, user_id, activity=None, since=None, until=None, columns=None):
+        frames = []
+        for act in [activity] if activity else self.store.activities(user_id):
+            df = self.store.read(user_id, act, columns=columns,
+                                 since=since and to_timestamp(since), until=until and to_timestamp(until))
+            if not df.empty:
+                frames.append(df.assign(user_id=user_id, activity=act))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def _rollup_parts(self):
+        if not os.path.isdir(self.rollup_dir):
+            return []
+        return sorted(os.path.join(self.rollup_dir, f) for f in os.listdir(self.rollup_dir) if f.endswith(".parquet"))
+
+    def _read_rollups(self):
+        if not os.path.isdir(self.rollup_dir):
+            return None
+        df, parts = self._load_rollup_log()
+        if len(parts) >= self.ROLLUP_COMPACT_PARTS:
+            self._compact_rollups()
+        return df
+
+    def _load_rollup_log(self):
+        """(merged rollups, the parts they came from), leaving out parts a compacted part already holds."""
+        while True:
+            try:
+                tables = {p: pq.read_table(p) for p in self._rollup_parts()}
+                break
+            except FileNotFoundError:
+                continue  # another process compacted the log while we read it; list it again
+        merged = {name for t in tables.values() for name in json.loads((t.schema.metadata or {}).get(b"merged", b"[]"))}
+        live = [p for p in tables if os.path.basename(p) not in merged]
+        return combine(*[tables[p].to_pandas() for p in live]), list(tables)
+
+    @contextmanager
+    def _exclusive(self, path):
+        """Yield True to the one process that created the lock file at `path`, False to the others."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = None
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(path) < self.LOCK_TIMEOUT:
+                        break
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass  # released meanwhile: try again
+        if fd is None:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            os.close(fd)
+            os.remove(path)
+
+    def _compact_rollups(self):
+        # One process at a time, reading the log under the lock: the parts it deletes are the ones it merged
+        with self._exclusive(os.path.join(self.rollup_dir, ".compact.lock")) as owner:
+            if owner:
+                merged, parts = self._load_rollup_log()
+                self._write_part(merged, self.rollup_dir, f"part-{time.time_ns()}.parquet",
+                                 covers=[os.path.basename(p) for p in parts])
+                for p in parts:
+                    os.remove(p)
+
+    def _rollup_build_lock(self):
+        # Next to the log rather than in it: the log directory appears only once the build is stored
+        return self._exclusive(os.path.join(self.store.root, ".rollups-build.lock"))
+
+    def _store_built_rollups(self, df):
+        # Written aside and renamed into place, so readers never see a partial log
+        staging = f"{self.rollup_dir}.{time.time_ns()}.tmp"
+        os.makedirs(staging)
+        name = f"part-{time.time_ns()}.parquet"
+        self._write_part(df, staging, name)
+        try:
+            os.rename(staging, self.rollup_dir)
+        except OSError:
+            # A process that gave up waiting already started the log: add the build to it
+            os.replace(os.path.join(staging, name), os.path.join(self.rollup_dir, name))
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _write_rollups(self, delta):
+        os.makedirs(self.rollup_dir, exist_ok=True)
+        if delta.empty:
+            return
+        self._write_part(delta, self.rollup_dir, f"part-{time.time_ns()}.parquet")
+
+    @staticmethod
+    def _write_part(delta, directory, name, covers=()):
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        df = delta[ROLLUP_COLUMNS].astype({"entries": "int64", "total": "float64", "high": "float64", "low": "float64"})
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if covers:
+            table = table.replace_schema_metadata({**table.schema.metadata, b"merged": json.dumps(covers).encode()})
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, os.path.join(directory, name))
@@ -0,0 +1,118 @@
+import threading
+from numbers import Number
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+from storage.base import StorageBackend, normalize_frame
+
+
+class ColumnBuffer:
+    """One user's rows for one activity as columns: a NumPy array per column, grown by doubling.
+
+    Stats are float64 (NaN where a row has no value) unless a column ever gets a
+    non-numeric value, in which case it becomes an object column. frame() is a
+    zero-copy DataFrame over the filled part of the arrays, built once per change.
+    Appends only ever write past the rows a frame already covers, so frames
+    handed out stay valid.
+    """
+
+    def __init__(self, user_id, activity, capacity=64):
+        self.user_id = user_id
+        self.activity = activity
+        self.length = 0
+        self.capacity = capacity
+        self.columns = {"timestamp": np.empty(capacity, dtype="datetime64[ns]")}
+        self._frame = None
+
+    def __len__(self):
+        return self.length
+
+    def extend(self, rows):
+        end = self.length + len(rows)
+        if end > self.capacity:
+            self._grow(max(end, 2 * self.capacity))
+        for name in dict.fromkeys(k for row in rows for k in row if k not in ("user_id", "activity")):
+            values = [row.get(name) for row in rows]
+            column = self.columns.get(name)
+            if name == "timestamp":
+                # Same conversion as normalize_frame: tz-aware values to naive UTC
+                ts = pd.to_datetime(values, utc=True, format="mixed").tz_localize(None)
+                column[self.length:end] = ts.as_unit("ns").to_numpy()
+                continue
+            numeric = all(v is None or (isinstance(v, Number) and not isinstance(v, bool)) for v in values)
+            if column is None:
+                column = self.columns[name] = np.full(self.capacity, np.nan, dtype="float64" if numeric else object)
+            elif not numeric and column.dtype != object:
+                column = self.columns[name] = column.astype(object)
+            column[self.length:end] = [np.nan if v is None else v for v in values]
+        self.length = end
+        self._frame = None
+
+    def _grow(self, capacity):
+        for name, column in self.columns.items():
+            if column.dtype.kind in "fO":
+                grown = np.full(capacity, np.nan, dtype=column.dtype)
+            else:
+                grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.length] = column[:self.length]
+            self.columns[name] = grown
+        self.capacity = capacity
+
+    def frame(self):
+        if self._frame is None:
+            data = {name: column[:self.length] for name, column in self.columns.items()}
+            self._frame = pd.DataFrame(data, copy=False).assign(user_id=self.user_id, activity=self.activity)
+        return self._frame
+
+
+class MemoryBackend(StorageBackend):
+    """Rows kept in a ColumnBuffer per user and activity. Nothing survives the process (or session) that owns it.
+
+    Each user's normalized snapshot is built once per change and reused by every
+    query until the next write.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._buffers = {}  # user_id -> {activity: ColumnBuffer}
+        self._snapshots = {}  # user_id -> normalized DataFrame of everything
+        self._lock = threading.Lock()
+
+    def users(self):
+        with self._lock:
+            return list(self._buffers)
+
+    def _write(self, rows):
+        groups = {}
+        for row in rows:
+            groups.setdefault((row["user_id"], row["activity"]), []).append(row)
+        with self._lock:
+            for (user_id, activity), group in groups.items():
+                buffers = self._buffers.setdefault(user_id, {})
+                if activity not in buffers:
+                    buffers[activity] = ColumnBuffer(user_id, activity)
+                buffers[activity].extend(group)
+                self._snapshots.pop(user_id, None)
+
+    def query(self, user_id, activity=None, since=None, until=None, columns=None):
+        with timed("MemoryBackend.read"), self._lock:
+            snapshot = self._snapshots.get(user_id)
+            if snapshot is None and user_id in self._buffers:
+                snapshot = self._snapshots[user_id] = normalize_frame(self._frame(user_id))
+        if snapshot is None:
+            return normalize_frame(pd.DataFrame(), activity, since, until, columns)
+        if activity is None and since is None and until is None and columns is None:
+            # Shallow copy: a caller adding a column must not change the cached frame
+            return snapshot.copy(deep=False)
+        return normalize_frame(snapshot, activity, since, until, columns)
+
+    def _frame(self, user_id, activity=None):
+        buffers = self._buffers.get(user_id, {})
+        frames = [b.frame() for act, b in buffers.items() if activity in (None, act)]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def _read(self, user_id, activity=None, since=None, until=None, columns=None):
+        with self._lock:
+            return self._frame(user_id, activity)
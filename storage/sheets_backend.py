@@ -0,0 +1,334 @@
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import pandas as pd
+
+from rollups import ROLLUP_COLUMNS, combine, rollup_delta
+from sheets_gateway import append_request, shared_gateway
+from storage.base import StorageBackend
+
+# Sheet column names the PWA app has always used for the key columns
+SHEET_COLUMNS = {"activity": "Activity", "timestamp": "DateTime"}
+
+
+def sheet_value(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def parse_values(values):
+    """DataFrame from a worksheet's get_all_values() grid (header row first)."""
+    if not values or not values[0]:
+        return pd.DataFrame()
+    header = values[0]
+    df = pd.DataFrame([row + [""] * (len(header) - len(row)) for row in values[1:]], columns=header)
+    df = df.loc[:, [bool(c) for c in header]].replace("", None).dropna(how="all")
+    for col in df.columns:
+        if col not in SHEET_COLUMNS.values():
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+class SheetsBackend(StorageBackend):
+    """One worksheet per user in a Google spreadsheet.
+
+    A user's sheet is read with one call and kept for `ttl` seconds; this
+    backend's own writes are merged into that copy, so saving never forces a
+    re-read. A write reads every affected header in one call and appends only
+    the new rows, for all users at once. Headers only ever grow at the end, and
+    only under the HEADER_LOCK_SHEET worksheet, re-read there: two processes
+    adding columns at once cannot write over each other's.
+
+    Team rollups are appended as deltas to the ROLLUP_SHEET worksheet, in the same
+    request as the rows, and merged on load. Once the log grows well past its merged
+    form, one process at a time (holding the ROLLUP_LOCK_SHEET worksheet) replaces
+    the rows it read by that form, in one request that leaves later appends alone.
+
+    Every call goes through a SheetsGateway, by default the one shared by all
+    backends on this spreadsheet in the process: it keeps them under the API
+    quota, joins identical reads in flight and merges concurrent appends.
+    """
+
+    ROLLUP_SHEET = "_rollups"
+    # Exists while a process builds or compacts the rollup log; A1 holds when it was taken
+    ROLLUP_LOCK_SHEET = "_rollups_lock"
+    # The same, while a process adds columns to headers
+    HEADER_LOCK_SHEET = "_headers_lock"
+    # A lock older than this (seconds) was left by a process that died holding it
+    LOCK_TIMEOUT = 300
+
+    def __init__(self, spreadsheet, ttl=60, worksheet_rows=1000, worksheet_cols=30, gateway=None):
+        super().__init__()
+        self.spreadsheet = spreadsheet
+        self.gateway = gateway or shared_gateway(spreadsheet)
+        self.ttl = ttl
+        self.worksheet_rows = worksheet_rows
+        self.worksheet_cols = worksheet_cols
+        self._index = None  # worksheet title -> worksheet, from one metadata fetch
+        self._frames = {}  # user_id -> (loaded_at, DataFrame)
+        self._lock = threading.Lock()
+        self.rollup_ttl = ttl
+        self._headers_checked = set()
+
+    def users(self):
+        # Worksheets whose title starts with "_" hold backend metadata, not players
+        return [title for title in self.worksheet_index() if not title.startswith("_")]
+
+    def worksheet_index(self, refresh=False):
+        """Title -> worksheet for the whole spreadsheet: one metadata fetch, kept until a lookup misses."""
+        with self._lock:
+            index = self._index
+        if index is None or refresh:
+            index = {ws.title: ws for ws in self.gateway.worksheets()}
+            with self._lock:
+                self._index = index
+        return index
+
+    def find_worksheet(self, title):
+        """The worksheet with this title, or None. Re-fetches the index once in case another process added it."""
+        ws = self.worksheet_index().get(title)
+        return ws if ws is not None else self.worksheet_index(refresh=True).get(title)
+
+    def ensure_worksheets(self, titles, attempts=3):
+        """Worksheets for every title, creating all the missing ones in a single request."""
+        import gspread
+
+        titles = list(dict.fromkeys(titles))
+        index = self.worksheet_index()
+        for attempt in range(attempts):
+            missing = [t for t in titles if t not in index]
+            if not missing:
+                break
+            try:
+                if len(missing) == 1:
+                    ws = self.gateway.call(
+                        "write", self.spreadsheet.add_worksheet,
+                        title=missing[0], rows=self.worksheet_rows, cols=self.worksheet_cols,
+                    )
+                    with self._lock:
+                        index[ws.title] = ws
+                else:
+                    self.gateway.call("write", self.spreadsheet.batch_update, {"requests": [
+                        {"addSheet": {"properties": {
+                            "title": title,
+                            "gridProperties": {"rowCount": self.worksheet_rows, "columnCount": self.worksheet_cols},
+                        }}}
+                        for title in missing
+                    ]})
+                    index = self.worksheet_index(refresh=True)
+            except gspread.exceptions.APIError:
+                # Usually another session or process created one of them first, and a batch
+                # fails as a whole: look again and create whatever is still missing
+                index = self.worksheet_index(refresh=True)
+                if attempt == attempts - 1 and any(t not in index for t in titles):
+                    raise
+        return {t: index[t] for t in titles}
+
+    def worksheet(self, user_id):
+        return self.ensure_worksheets([user_id])[user_id]
+
+    def _write(self, rows):
+        df = pd.DataFrame(rows)
+        titles = df["user_id"].unique().tolist()
+        if self.rollups_on_write:
+            titles.append(self.ROLLUP_SHEET)
+        # New players' worksheets (and the rollup log) are created together, in one request
+        sheets = self.ensure_worksheets(titles)
+        rows_by_user = {
+            user_id: [{SHEET_COLUMNS.get(k, k): v for k, v in row.items()}
+                      for row in group.drop(columns="user_id").to_dict("records")]
+            for user_id, group in df.groupby("user_id", sort=False)
+        }
+        check_rollups = self.rollups_on_write and self.ROLLUP_SHEET not in self._headers_checked
+        # Read the headers fresh: another process may have added columns since our last read
+        headers = self.gateway.header_rows([*rows_by_user, *([self.ROLLUP_SHEET] if check_rollups else [])])
+
+        columns = {
+            user_id: list(dict.fromkeys([*SHEET_COLUMNS.values(), *(c for row in user_rows for c in row)]))
+            for user_id, user_rows in rows_by_user.items()
+        }
+        extending = [user_id for user_id, cols in columns.items() if any(c not in headers[user_id] for c in cols)]
+        updates = {}
+        if check_rollups and not headers[self.ROLLUP_SHEET]:
+            updates[self.ROLLUP_SHEET] = [ROLLUP_COLUMNS]
+        with self._sheet_lock(self.HEADER_LOCK_SHEET, wait=True) if extending else nullcontext():
+            if extending:
+                # Another process may have added columns since our read: add ours after theirs
+                headers.update(self.gateway.header_rows(extending, fresh=True))
+                for user_id in extending:
+                    extra = [c for c in columns[user_id] if c not in headers[user_id]]
+                    if extra:
+                        headers[user_id] = headers[user_id] + extra
+                        updates[user_id] = [headers[user_id]]
+            self.gateway.update_rows(updates)
+        if check_rollups:
+            self._headers_checked.add(self.ROLLUP_SHEET)
+
+        # Positions in a header stay valid once it is released: other processes only add to its end
+        appends = {
+            user_id: (headers[user_id], [[row.get(col) for col in headers[user_id]] for row in user_rows])
+            for user_id, user_rows in rows_by_user.items()
+        }
+
+        targets = [(sheets[user_id], values) for user_id, (_, values) in appends.items()]
+        if self.rollups_on_write:
+            # The rollup delta goes out in the same request as the rows (see _write_rollups)
+            targets.append((sheets[self.ROLLUP_SHEET], self._rollup_values(rollup_delta(rows))))
+        self.gateway.append(targets)
+
+        with self._lock:
+            for user_id, (header, values) in appends.items():
+                cached = self._frames.get(user_id)
+                if cached is not None:
+                    loaded_at, cached_df = cached
+                    new = parse_values([header, *[[str(sheet_value(v)) for v in row] for row in values]])
+                    self._frames[user_id] = (loaded_at, pd.concat([cached_df, new], ignore_index=True))
+
+    def changes_since(self, user_id, since=None):
+        # Re-read the sheet rather than serve the TTL copy: other devices append to it too. Nor is a read
+        # already in flight joined, since it may have started before their last append
+        ws = self.find_worksheet(user_id)
+        df = parse_values(self.gateway.call("read", ws.get_all_values)) if ws is not None else pd.DataFrame()
+        with self._lock:
+            self._frames[user_id] = (time.monotonic(), df)
+        return self.query(user_id, since=since)
+
+    def _read(self, user_id, activity=None, since=None, until=None, columns=None):
+        with self._lock:
+            cached = self._frames.get(user_id)
+        if cached is None or time.monotonic() - cached[0] > self.ttl:
+            # Reading a player who has no worksheet yet does not create one
+            ws = self.find_worksheet(user_id)
+            cached = (time.monotonic(), parse_values(self.gateway.values(ws)) if ws is not None else pd.DataFrame())
+            with self._lock:
+                self._frames[user_id] = cached
+        df = cached[1].rename(columns={v: k for k, v in SHEET_COLUMNS.items()})
+        return df.assign(user_id=user_id)
+
+    def _read_rollups(self):
+        ws = self.find_worksheet(self.ROLLUP_SHEET)
+        if ws is None:
+            return None
+        values = self.gateway.values(ws)
+        log = pd.DataFrame(values[1:], columns=values[0]) if values else pd.DataFrame(columns=ROLLUP_COLUMNS)
+        df = combine(log)
+        if len(log) > 2 * len(df) + 500:
+            self.compact_rollups()
+        return df
+
+    def compact_rollups(self):
+        """Replace the rollup log by its merged form. Returns False if another process holds the lock.
+
+        The rows read are deleted and their merged form appended in a single request, so deltas
+        other processes append meanwhile (after the rows read) are kept.
+        """
+        with self._sheet_lock(self.ROLLUP_LOCK_SHEET) as owner:
+            if not owner:
+                return False
+            ws = self.find_worksheet(self.ROLLUP_SHEET)
+            # Read under the lock (not a shared read that may predate it): these exact rows get replaced
+            values = self.gateway.call("read", ws.get_all_values)
+            if len(values) < 2:
+                return True
+            merged = combine(pd.DataFrame(values[1:], columns=values[0]))
+            self.gateway.call("write", self.spreadsheet.batch_update, {"requests": [
+                {"deleteDimension": {"range": {
+                    "sheetId": ws.id, "dimension": "ROWS", "startIndex": 1, "endIndex": len(values),
+                }}},
+                append_request(ws.id, self._rollup_values(merged)),
+            ]})
+            return True
+
+    def _rollup_build_lock(self):
+        return self._sheet_lock(self.ROLLUP_LOCK_SHEET)
+
+    def _store_built_rollups(self, df):
+        import gspread
+
+        # The log sheet is created with its header and rows in one request: readers see all or nothing
+        sheet_id = random.randrange(1, 2**31 - 1)
+        try:
+            self.gateway.call("write", self.spreadsheet.batch_update, {"requests": [
+                {"addSheet": {"properties": {
+                    "title": self.ROLLUP_SHEET, "sheetId": sheet_id,
+                    "gridProperties": {"rowCount": self.worksheet_rows, "columnCount": len(ROLLUP_COLUMNS)},
+                }}},
+                append_request(sheet_id, self._rollup_values(df, header=True)),
+            ]})
+        except gspread.exceptions.APIError:
+            # A process that gave up waiting already started the log: add the build to it
+            ws = self.ensure_worksheets([self.ROLLUP_SHEET])[self.ROLLUP_SHEET]
+            if not self.gateway.header_rows([ws.title])[ws.title]:
+                self.gateway.update_rows({ws.title: [ROLLUP_COLUMNS]})
+            self.gateway.append([(ws, self._rollup_values(df))])
+        self._headers_checked.add(self.ROLLUP_SHEET)
+        self.worksheet_index(refresh=True)
+
+    @contextmanager
+    def _sheet_lock(self, title, wait=False):
+        """Yield True to the one process that created the lock worksheet `title`, False to the others.
+
+        wait: keep trying until this process holds it (a lock left behind expires after LOCK_TIMEOUT).
+        """
+        sheet_id = self._take_sheet_lock(title)
+        deadline = time.monotonic() + self.LOCK_TIMEOUT
+        while sheet_id is None and wait:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"the {title} worksheet was not released")
+            time.sleep(0.5)
+            sheet_id = self._take_sheet_lock(title)
+        try:
+            yield sheet_id is not None
+        finally:
+            if sheet_id is not None:
+                self._delete_sheet(sheet_id)
+                with self._lock:
+                    if self._index is not None:
+                        self._index.pop(title, None)
+
+    def _take_sheet_lock(self, title):
+        import gspread
+
+        for _ in range(2):
+            sheet_id = random.randrange(1, 2**31 - 1)
+            try:
+                # Created already stamped with the time, so a holder that dies leaves a lock that expires
+                self.gateway.call("write", self.spreadsheet.batch_update, {"requests": [
+                    {"addSheet": {"properties": {
+                        "title": title, "sheetId": sheet_id,
+                        "gridProperties": {"rowCount": 1, "columnCount": 1},
+                    }}},
+                    append_request(sheet_id, [[datetime.now().isoformat()]]),
+                ]})
+                return sheet_id
+            except gspread.exceptions.APIError:
+                held = self.worksheet_index(refresh=True).get(title)
+                if held is None:
+                    continue  # released meanwhile
+                taken = self.gateway.call("read", held.get_all_values)
+                if taken and (datetime.now() - datetime.fromisoformat(taken[0][0])).total_seconds() < self.LOCK_TIMEOUT:
+                    return None
+                try:
+                    self._delete_sheet(held.id)
+                except gspread.exceptions.APIError:
+                    pass  # someone else broke it first
+        return None
+
+    def _delete_sheet(self, sheet_id):
+        self.gateway.call("write", self.spreadsheet.batch_update, {"requests": [{"deleteSheet": {"sheetId": sheet_id}}]})
+
+    def _write_rollups(self, delta):
+        # Already appended by _write, in the same request as the rows it was computed from
+        pass
+
+    @staticmethod
+    def _rollup_values(df, header=False):
+        df = df[ROLLUP_COLUMNS].assign(week=pd.to_datetime(df["week"]).dt.strftime("%Y-%m-%d"))
+        values = [[v.item() if hasattr(v, "item") else v for v in row] for row in df.itertuples(index=False)]
+        return [ROLLUP_COLUMNS, *values] if header else values
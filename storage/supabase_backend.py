@@ -0,0 +1,72 @@
+import pandas as pd
+
+from rollups import ROLLUP_COLUMNS, combine
+from storage.base import StorageBackend, normalize_frame, to_timestamp
+from supabase_query import ROW_ID, UserStatsCache, fetch_rows
+
+
+class SupabaseBackend(StorageBackend):
+    """The user_stats table. Writes are chunked bulk inserts; reads go through the incremental
+    per-user cache. The apps save through a SyncedBackend over it, whose journal keeps saves off
+    the network and whose pushes skip rows already stored, so a retried insert adds nothing twice.
+
+    Team rollups live in the rollups_table, kept up to date by the database trigger in
+    supabase/user_stats_weekly.sql; this backend only reads them.
+    """
+
+    # The Supabase app used to store Shooting Practice rows under a shorter name
+    ACTIVITY_ALIASES = {"Shooting Practice": "Shooting"}
+    rollup_ttl = 60
+    rollups_on_write = False
+
+    def __init__(self, client, table="user_stats", columns=None, chunk_size=500, rollups_table="user_stats_weekly"):
+        super().__init__()
+        self.client = client
+        self.table = table
+        self.rollups_table = rollups_table
+        self.chunk_size = chunk_size
+        self.cache = UserStatsCache(client, columns=columns, table=table)
+
+    def invalidate(self, user_id):
+        """Drop the cached copy after writes made outside this backend (e.g. a backup import)."""
+        self.cache.invalidate(user_id)
+        self.bump_version(user_id)
+
+    def _write(self, rows):
+        records = [self._to_record(r) for r in rows]
+        for start in range(0, len(records), self.chunk_size):
+            self.client.table(self.table).insert(records[start:start + self.chunk_size]).execute()
+
+    def _read(self, user_id, activity=None, since=None, until=None, columns=None):
+        since = since and to_timestamp(since).isoformat()
+        df = self.cache.get(user_id, self.version(user_id), since).drop(columns=ROW_ID, errors="ignore")
+        return self._unalias(df)
+
+    def changes_since(self, user_id, since=None):
+        # Straight from the table: the per-user cache only refetches after this process's own writes
+        since = since and to_timestamp(since).isoformat()
+        df = fetch_rows(self.client, user_id, self.cache.columns, since=since, table=self.table)
+        df = df.drop(columns=ROW_ID, errors="ignore")
+        return normalize_frame(self._unalias(df), since=since)
+
+    def _unalias(self, df):
+        aliases = {stored: name for name, stored in self.ACTIVITY_ALIASES.items()}
+        return df.assign(activity=df["activity"].replace(aliases)) if "activity" in df.columns else df
+
+    def _read_rollups(self):
+        pages, start = [], 0
+        while True:
+            res = (self.client.table(self.rollups_table).select(",".join(ROLLUP_COLUMNS))
+                   .order("user_id").order("activity").order("week").order("metric")
+                   .range(start, start + self.chunk_size - 1).execute())
+            pages.extend(res.data)
+            if len(res.data) < self.chunk_size:
+                break
+            start += self.chunk_size
+        return self._unalias(combine(pd.DataFrame(pages, columns=ROLLUP_COLUMNS)))
+
+    def _to_record(self, row):
+        record = dict(row)
+        record["activity"] = self.ACTIVITY_ALIASES.get(record["activity"], record["activity"])
+        record["timestamp"] = to_timestamp(record["timestamp"]).isoformat()
+        return record
@@ -0,0 +1,289 @@
+import atexit
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+import pandas as pd
+
+from instrumentation import timed
+from journal import DEFAULT_PATH, Journal, journal_key
+from storage.base import StorageBackend, normalize_frame
+
+
+class SyncEngine:
+    """Moves rows between a Journal and a remote StorageBackend on a background thread.
+
+    push() sends unsynced saves in batches. Pushing is idempotent: entries the remote
+    already has (say, from a push that stored the rows but died before marking them)
+    are skipped, the n-th entry of a key being there once the remote holds more than n
+    rows with it. pull() fetches each user's remote rows from their cursor on, minus
+    `pull_overlap` so rows another device synced late (with older timestamps) still
+    arrive, and merges them into the journal. request_pull() has a user pulled on the
+    background thread ahead of the next sync.
+    """
+
+    def __init__(self, journal, remote, batch_size=500, interval=5.0, pull_interval=60.0,
+                 pull_overlap=timedelta(days=7), on_change=None, column_order=None, on_push=None):
+        self.journal = journal
+        # The journal stores stats with sorted keys; pushed rows are put back in this order
+        # (e.g. form order), which is the order new columns get in a sheet's header
+        self.column_order = {c: i for i, c in enumerate(column_order or [])}
+        self._remote = None if callable(remote) else remote
+        self._remote_factory = remote if callable(remote) else None
+        self.batch_size = batch_size
+        self.interval = interval  # seconds between pushes (a save also triggers one)
+        self.pull_interval = pull_interval
+        self.pull_overlap = pull_overlap
+        self.on_change = on_change  # called with the user_ids whose journal rows changed on pull
+        self.on_push = on_push  # called with the rows just stored on the remote, before they are marked synced
+
+        self.last_sync = None
+        self.last_error = None
+        self.pushed_rows = 0
+        self.pulled_rows = 0
+
+        self._lock = threading.Lock()  # one sync at a time
+        self._connect_lock = threading.Lock()
+        self._requests_lock = threading.Lock()
+        self._pull_requests = set()
+        self._awaiting = set()
+        self._last_pull = 0.0
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._worker = threading.Thread(target=self._run, name="journal-sync", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def remote(self):
+        """The remote backend, connecting on first use when it was given as a factory."""
+        if self._remote_factory is not None:
+            with self._connect_lock:
+                if self._remote_factory is not None:
+                    self._remote = self._remote_factory()
+                    self._remote_factory = None
+        return self._remote
+
+    def online(self):
+        """True once connected to the remote, for as long as syncing with it succeeds."""
+        return self._remote_factory is None and self.last_error is None
+
+    def kick(self):
+        """Sync soon, without waiting for the next interval."""
+        self._wakeup.set()
+
+    def request_pull(self, user_id):
+        """Pull the user on the background thread soon; on_change reports the rows once they are in."""
+        with self._requests_lock:
+            self._pull_requests.add(user_id)
+            self._awaiting.add(user_id)
+        self.kick()
+
+    def awaiting_pull(self, user_id):
+        """True from request_pull() until that pull has succeeded."""
+        with self._requests_lock:
+            return user_id in self._awaiting
+
+    def sync_once(self, users=None, pull=True):
+        """Push everything pending, then (optionally) pull. Returns (pushed, pulled).
+
+        Raises if the remote is unreachable; nothing is lost, the next sync retries.
+        """
+        with self._lock:
+            with timed("sync.push"):
+                pushed = self._push()
+            pulled = 0
+            if pull:
+                with timed("sync.pull"):
+                    pulled = self._pull(self.journal.users() if users is None else users)
+                self._last_pull = time.monotonic()
+        self.last_sync = time.time()
+        self.last_error = None
+        return pushed, pulled
+
+    def pull(self, users):
+        with self._lock, timed("sync.pull"):
+            return self._pull(users)
+
+    def close(self):
+        self._stopped = True
+        self._wakeup.set()
+        self._worker.join(timeout=5)
+
+    # ----------- worker -----------
+    def _run(self):
+        while not self._stopped:
+            with self._requests_lock:
+                requested, self._pull_requests = self._pull_requests, set()
+            try:
+                if requested:
+                    self.pull(requested)
+                    with self._requests_lock:
+                        self._awaiting -= requested
+                    requested = set()
+                self.sync_once(pull=time.monotonic() - self._last_pull >= self.pull_interval)
+            except Exception as e:  # offline, quota, auth...: keep the journal and try again later
+                self.last_error = f"{type(e).__name__}: {e}"
+                with self._requests_lock:
+                    self._pull_requests |= requested
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def _push(self):
+        remote = self.remote()
+        pushed = 0
+        while True:
+            batch = self.journal.unsynced(self.batch_size)
+            if not batch:
+                return pushed
+            rows = [self._ordered(row) for _, _, row in batch]
+            new = remote.missing(rows, [n for _, n, _ in batch])
+            if new:
+                remote.bulk_append(new)
+                if hasattr(remote, "flush"):
+                    remote.flush()
+            if self.on_push:
+                self.on_push(rows)
+            self.journal.mark_synced([seq for seq, _, _ in batch])
+            pushed += len(new)
+            self.pushed_rows += len(new)
+
+    def _ordered(self, row):
+        last = len(self.column_order)
+        return dict(sorted(row.items(), key=lambda kv: self.column_order.get(kv[0], last)))
+
+    def _pull(self, users):
+        remote = self.remote()
+        changed, pulled = [], 0
+        for user_id in users:
+            cursor = self.journal.pull_cursor(user_id)
+            since = pd.Timestamp(cursor) - self.pull_overlap if cursor else None
+            df = remote.changes_since(user_id, since)
+            if df.empty:
+                continue
+            rows = [{k: v for k, v in r.items() if not (isinstance(v, float) and pd.isna(v))}
+                    for r in df.to_dict("records")]
+            count = self.journal.merge_remote(rows)
+            self.journal.set_pull_cursor(user_id, journal_key(df["timestamp"].max()))
+            if count:
+                changed.append(user_id)
+                pulled += count
+        self.pulled_rows += pulled
+        if changed and self.on_change:
+            self.on_change(changed)
+        return pulled
+
+
+class SyncedBackend(StorageBackend):
+    """Offline-first wrapper: reads and writes go to a local journal; a SyncEngine keeps it
+    in step with the remote backend in the background.
+
+    `remote` is a StorageBackend, or a zero-argument callable returning one, so the app
+    can start (and save) before the remote is reachable. Team rollups come from the remote.
+
+    With a shared cache, snapshot entries are filled from the remote, never from this
+    device's journal, and each push gives its users a new version: an entry holds every
+    save any replica had pushed before its version. This device's saves not pushed yet
+    are added on top of it; while the remote is unreachable the journal serves alone.
+    """
+
+    rollups_on_write = False
+
+    def __init__(self, remote, journal_path=DEFAULT_PATH, batch_size=500, interval=5.0, pull_interval=60.0,
+                 column_order=None):
+        super().__init__()
+        self.journal = Journal(journal_path)
+        self.sync = SyncEngine(self.journal, remote, batch_size, interval, pull_interval,
+                               on_change=self._on_pull, column_order=column_order, on_push=self._on_push)
+        self._first_pulls = set()
+
+    def pending(self):
+        """Saves not pushed to the remote yet."""
+        return self.journal.pending_count()
+
+    def awaiting_pull(self, user_id):
+        """True while this device's first pull of the user's history has not landed yet."""
+        return self.sync.awaiting_pull(user_id)
+
+    def invalidate(self, user_id):
+        """Re-pull a user's whole remote history, e.g. after a backup was imported straight into the remote."""
+        remote = self.sync.remote()
+        if hasattr(remote, "invalidate"):
+            remote.invalidate(user_id)
+        self.journal.reset_pull_cursor(user_id)
+        self.sync.pull([user_id])
+        self.bump_version(user_id)
+
+    def flush(self, timeout=None):
+        """Sync now. Returns False if the remote could not be reached."""
+        try:
+            self.sync.sync_once()
+        except Exception as e:
+            self.sync.last_error = f"{type(e).__name__}: {e}"
+            return False
+        return True
+
+    def snapshot(self, user_id, since=None):
+        if self.shared_cache is None or not self.sync.online():
+            return self.query(user_id, since=since)
+        self._first_pull(user_id)
+        # Pending saves first: one pushed meanwhile is then in the shared entry or still in this list
+        pending = self.journal.unsynced(None, user_id=user_id)
+        try:
+            shared = self.shared_cache.snapshot(user_id, lambda: self.sync.remote().changes_since(user_id))
+        except Exception as e:  # the remote went away since the last sync: the journal serves
+            self.sync.last_error = f"{type(e).__name__}: {e}"
+            return self.query(user_id, since=since)
+        pending = self._not_stored(pending, shared)
+        df = pd.concat([shared, pd.DataFrame(pending)], ignore_index=True) if pending else shared
+        return normalize_frame(df, since=since)
+
+    @staticmethod
+    def _not_stored(pending, stored):
+        """The rows of unsynced() entries that `stored` (a remote snapshot) does not hold yet.
+
+        The remote keeps the rows of a key in save order, so the journal's n-th entry of a key is
+        there once the remote has more than n rows with it.
+        """
+        counts = Counter(zip(stored["activity"], map(journal_key, stored["timestamp"])))
+        return [row for _, n, row in pending if n >= counts[row["activity"], journal_key(row["timestamp"])]]
+
+    # ----------- team rollups come from the shared remote -----------
+    def rollups(self):
+        return self.sync.remote().rollups()
+
+    def team_rollups(self, since=None, activity=None):
+        return self.sync.remote().team_rollups(since=since, activity=activity)
+
+    def rollup_version(self):
+        return self.sync.remote().rollup_version()
+
+    # ----------- journal -----------
+    def users(self):
+        return self.journal.users()
+
+    def _write(self, rows):
+        self.journal.append(rows)
+        self.sync.kick()
+
+    def _on_pull(self, user_ids):
+        for user_id in user_ids:
+            self.bump_version(user_id)
+
+    def _on_push(self, rows):
+        # The remote now holds these saves and shared entries filled before do not. Called while the
+        # rows are still pending here, so no snapshot of this device's misses them in between
+        if self.shared_cache is not None:
+            for user_id in dict.fromkeys(r["user_id"] for r in rows):
+                self.shared_cache.invalidate(user_id)
+
+    def _first_pull(self, user_id):
+        if user_id not in self._first_pulls and self.journal.pull_cursor(user_id) is None:
+            # First look at a user on this device: their history is fetched in the background (connecting
+            # to the remote first, if need be) and bumps their version when it lands; the journal serves now
+            self._first_pulls.add(user_id)
+            self.sync.request_pull(user_id)
+
+    def _read(self, user_id, activity=None, since=None, until=None, columns=None):
+        self._first_pull(user_id)
+        return self.journal.read(user_id, activity=activity, since=since, until=until)
@@ -0,0 +1,63 @@
+-- Weekly team rollups for the coach dashboard, maintained by the database on every insert.
+-- One row per player, activity, week (starting Monday) and stat column. Run once in the
+-- Supabase SQL editor; re-running it rebuilds the table from user_stats.
+
+create table if not exists user_stats_weekly (
+    user_id   text             not null,
+    activity  text             not null,
+    week      date             not null,
+    metric    text             not null,
+    entries   bigint           not null default 0,
+    total     double precision not null default 0,
+    high      double precision,
+    low       double precision,
+    primary key (user_id, activity, week, metric)
+);
+
+-- Every numeric column of the inserted rows except the keys becomes a metric
+-- (old stored percentages excepted: the app derives them from the counts).
+-- Statement-level, so a bulk insert of 500 rows is one upsert, not 500.
+create or replace function user_stats_weekly_apply() returns trigger
+language plpgsql as $$
+begin
+    insert into user_stats_weekly as w (user_id, activity, week, metric, entries, total, high, low)
+    select r.user_id, r.activity, date_trunc('week', r."timestamp")::date, kv.key,
+           count(*), sum(kv.value::text::double precision),
+           max(kv.value::text::double precision), min(kv.value::text::double precision)
+    from inserted r
+    cross join lateral jsonb_each(
+        to_jsonb(r) - 'id' - 'created_at' - 'user_id' - 'activity' - 'timestamp' - '3P %' - '2P %'
+    ) kv
+    where jsonb_typeof(kv.value) = 'number'
+    group by 1, 2, 3, 4
+    on conflict (user_id, activity, week, metric) do update set
+        entries = w.entries + excluded.entries,
+        total   = w.total + excluded.total,
+        high    = greatest(w.high, excluded.high),
+        low     = least(w.low, excluded.low);
+    return null;
+end;
+$$;
+
+drop trigger if exists user_stats_weekly_on_insert on user_stats;
+create trigger user_stats_weekly_on_insert
+    after insert on user_stats
+    referencing new table as inserted
+    for each statement execute function user_stats_weekly_apply();
+
+-- Backfill from the existing history
+truncate user_stats_weekly;
+insert into user_stats_weekly (user_id, activity, week, metric, entries, total, high, low)
+select r.user_id, r.activity, date_trunc('week', r."timestamp")::date, kv.key,
+       count(*), sum(kv.value::text::double precision),
+       max(kv.value::text::double precision), min(kv.value::text::double precision)
+from user_stats r
+cross join lateral jsonb_each(
+    to_jsonb(r) - 'id' - 'created_at' - 'user_id' - 'activity' - 'timestamp' - '3P %' - '2P %'
+) kv
+where jsonb_typeof(kv.value) = 'number'
+group by 1, 2, 3, 4;
+
+alter table user_stats_weekly enable row level security;
+drop policy if exists "user_stats_weekly readable" on user_stats_weekly;
+create policy "user_stats_weekly readable" on user_stats_weekly for select using (true);
@@ -0,0 +1,116 @@
+"""Bulk import of a user's backup workbook into Supabase.
+
+The workbook is normalized column-wise, rows the user already has are
+dropped by their (activity, timestamp) key, and the rest is inserted in
+chunks. Because already-imported rows are skipped, re-running an import
+that failed halfway simply picks up where it stopped.
+
+Keys are compared as SupabaseBackend stores and reads rows: activities under
+their stored names (ACTIVITY_ALIASES) and timestamps to the second, a key
+counting once per row. A backup the app exported, with de-aliased names and
+whole-second times, is then recognized as the rows it came from.
+"""
+import json
+from collections import Counter
+
+import pandas as pd
+
+from derived_metrics import DERIVED_METRICS
+from instrumentation import instrumented
+from storage.supabase_backend import SupabaseBackend
+from supabase_query import fetch_rows
+
+# Columns the database fills in itself; re-sending them would clash with existing rows
+SERVER_COLUMNS = ["id", "created_at"]
+# Undated rows are stamped this far past UNDATED_BASE, by their row in the file: the same file
+# gets the same keys on every import, so re-running it does not insert them again
+UNDATED_BASE = pd.Timestamp("2000-01-01")
+
+
+def normalize_timestamps(values):
+    """Parse a column of timestamps (naive or tz-aware) into ISO strings, UTC, microsecond precision."""
+    parsed = pd.to_datetime(pd.Series(values), errors="coerce", utc=True, format="mixed")
+    return parsed.dt.tz_localize(None).dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+def normalize_import(df, user_id):
+    """Clean a backup DataFrame for insertion: one user, stored activity names, parsed timestamps,
+    no server or derived columns."""
+    # Index = row position in the file, which undated rows' timestamps are derived from
+    df = df.reset_index(drop=True)
+    df.columns = [str(c).strip() for c in df.columns]
+    # Derived metrics are recomputed from the counts on read, never stored
+    df = df.drop(columns=[c for c in [*SERVER_COLUMNS, *DERIVED_METRICS] if c in df.columns])
+    df = df.dropna(how="all")
+    df["user_id"] = user_id
+    if "activity" in df.columns:
+        df["activity"] = stored_activities(df["activity"])
+
+    if "timestamp" not in df.columns:
+        df["timestamp"] = None
+    timestamps = normalize_timestamps(df["timestamp"].to_numpy())
+    missing = timestamps.isna().to_numpy()
+    if missing.any():
+        # Stable timestamps in file order: a re-import counts them as stored (keys compare to the second)
+        filler = UNDATED_BASE + pd.to_timedelta(df.index[missing], unit="us")
+        timestamps[missing] = filler.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    df["timestamp"] = timestamps.to_numpy()
+    return df.reset_index(drop=True)
+
+
+def stored_activities(values):
+    """Activity names as the user_stats table stores them (see SupabaseBackend.ACTIVITY_ALIASES)."""
+    return pd.Series(values).replace(SupabaseBackend.ACTIVITY_ALIASES)
+
+
+def import_keys(df):
+    """Vectorized (activity, timestamp to the second) key per row, from normalized ISO timestamps."""
+    activity = df["activity"].astype(str) if "activity" in df.columns else pd.Series("", index=df.index)
+    return activity + "|" + df["timestamp"].astype(str).str[:19]
+
+
+def fetch_existing_keys(client, user_id, table="user_stats"):
+    """How many rows the user already has per (activity, second) key, paged past the API row limit."""
+    # Keyset pages in (timestamp, activity) order: offset pages without an order can skip or repeat rows
+    existing = fetch_rows(client, user_id, columns=[], table=table)
+    if existing.empty:
+        return Counter()
+    # Rows stored under either name of an aliased activity are the same activity
+    existing["activity"] = stored_activities(existing["activity"]).to_numpy()
+    existing["timestamp"] = normalize_timestamps(existing["timestamp"].to_numpy()).to_numpy()
+    return Counter(import_keys(existing))
+
+
+def drop_existing(df, existing_keys):
+    """Drop rows already stored: the file's i-th row with a key is new once i rows with it are stored.
+
+    Rows sharing a key within the file are kept, like saves made in the same second.
+    """
+    keys = import_keys(df)
+    ordinal = keys.groupby(keys, sort=False).cumcount()
+    stored = keys.map(existing_keys).fillna(0)
+    return df[(ordinal >= stored).to_numpy()].reset_index(drop=True)
+
+
+def to_records(df):
+    """JSON-safe records (native Python types, NaN -> None) in a single vectorized pass."""
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+@instrumented("supabase.import")
+def import_backup(client, df_import, user_id, table="user_stats", chunk_size=500, progress=None):
+    """Normalize, dedupe and insert a backup. Returns (inserted, skipped).
+
+    progress, if given, is called as progress(rows_done, rows_total) after every chunk.
+    """
+    df = normalize_import(df_import, user_id)
+    new_rows = drop_existing(df, fetch_existing_keys(client, user_id, table))
+    skipped = len(df) - len(new_rows)
+
+    total = len(new_rows)
+    for start in range(0, total, chunk_size):
+        chunk = new_rows.iloc[start:start + chunk_size]
+        client.table(table).insert(to_records(chunk)).execute()
+        if progress:
+            progress(start + len(chunk), total)
+    return total, skipped
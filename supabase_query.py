@@ -0,0 +1,170 @@
+"""Paged, windowed reads of user_stats.
+
+fetch_rows() walks a user's rows in (timestamp, id) order with keyset
+pagination, selecting only the requested columns, so no single response
+hits the API row cap and no row is returned twice. The primary key breaks
+ties: several rows can share a timestamp (saves in the same second), and a
+page made only of them is followed by pages through that timestamp by id.
+UserStatsCache keeps a local copy per user and only asks the server for rows
+it has not seen: newer rows after a write, older rows when a wider time
+window is requested.
+"""
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from instrumentation import instrumented
+
+PAGE_SIZE = 1000
+KEY_COLUMNS = ["user_id", "activity", "timestamp"]
+# The table's primary key: fetched frames carry it for paging, backends drop it
+ROW_ID = "id"
+SEASON_START_MONTH = 9  # seasons run September to August
+
+TIME_WINDOWS = ["Last 30 days", "Last 90 days", "This season", "All time"]
+
+
+def window_start(window, now=None):
+    """ISO timestamp where a named window begins, or None for all time."""
+    now = now or datetime.now()
+    if window == "Last 30 days":
+        start = now - timedelta(days=30)
+    elif window == "Last 90 days":
+        start = now - timedelta(days=90)
+    elif window == "This season":
+        year = now.year if now.month >= SEASON_START_MONTH else now.year - 1
+        start = datetime(year, SEASON_START_MONTH, 1)
+    else:
+        return None
+    return start.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
+
+
+def select_clause(columns):
+    if columns is None:
+        return "*"
+    # Stat columns contain spaces and %, so quote every identifier
+    return ",".join(f'"{c}"' for c in dict.fromkeys([ROW_ID, *KEY_COLUMNS, *columns]))
+
+
+@instrumented("supabase.fetch_rows")
+def fetch_rows(client, user_id, columns=None, activity=None, since=None, until=None, after=None,
+               table="user_stats", page_size=PAGE_SIZE):
+    """Rows for one user in (timestamp, id) order, as a DataFrame with the id column.
+
+    since/until bound the timestamp (inclusive/exclusive). after is a cursor
+    from last_cursor(): only rows past it are returned.
+    """
+    pages = []
+    # How the next page starts after the cursor: "gte" re-reads its timestamp and drops the rows
+    # seen there; "tie" pages through that timestamp by id, when its rows alone filled a page;
+    # "gt" starts past it, once they are all read
+    step = "gte"
+    while True:
+        query = client.table(table).select(select_clause(columns)).eq("user_id", user_id)
+        if activity:
+            query = query.eq("activity", activity)
+        if until:
+            query = query.lt("timestamp", until)
+        if after is None:
+            if since:
+                query = query.gte("timestamp", since)
+        elif step == "tie":
+            query = query.eq("timestamp", after[0]).gt(ROW_ID, after[1])
+        else:
+            query = getattr(query, step)("timestamp", after[0])
+        res = query.order("timestamp").order(ROW_ID).limit(page_size).execute()
+        rows = res.data or []
+
+        page = pd.DataFrame(rows)
+        if step == "gte" and after and not page.empty:
+            ts, last_id = after
+            page = page[~((page["timestamp"] == ts) & (page[ROW_ID] <= last_id))]
+        if not page.empty:
+            pages.append(page)
+            after = last_cursor(page)
+        full = len(rows) == page_size
+        if step == "tie":
+            step = "tie" if full else "gt"
+        else:
+            # A full page of one timestamp: re-reading it would return the same page forever
+            step = "tie" if full and rows[0]["timestamp"] == rows[-1]["timestamp"] else "gte"
+        if not full and step != "gt":
+            break
+
+    if not pages:
+        return pd.DataFrame(columns=[ROW_ID, *KEY_COLUMNS] if columns is None else [ROW_ID, *KEY_COLUMNS, *columns])
+    return pd.concat(pages, ignore_index=True)
+
+
+def last_cursor(df):
+    """Keyset cursor for the newest row in df: (timestamp, largest id at that timestamp)."""
+    if df.empty:
+        return None
+    ts = df["timestamp"].max()
+    return ts, df.loc[df["timestamp"] == ts, ROW_ID].max()
+
+
+def concat_rows(*frames):
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=KEY_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+class UserStatsCache:
+    """Process-wide incremental copy of each user's rows."""
+
+    def __init__(self, client, columns=None, table="user_stats", max_users=200):
+        self.client = client
+        self.columns = columns
+        self.table = table
+        self.max_users = max_users
+        self._entries = {}  # user_id -> {"df", "since", "version"}
+        self._lock = threading.Lock()  # guards the two dicts, never held across a fetch
+        self._user_locks = {}  # user_id -> lock held while that user's rows are fetched
+
+    def _user_lock(self, user_id):
+        with self._lock:
+            # Kept after eviction: dropping a lock another thread is about to take would let two fetch at once
+            return self._user_locks.setdefault(user_id, threading.Lock())
+
+    def get(self, user_id, version=0, since=None):
+        """The user's rows from `since` on. Hits the server only for ranges not cached yet.
+
+        Fetches for one user run one at a time (the second reuses what the first fetched);
+        other users' lookups are not held up by them.
+        """
+        with self._user_lock(user_id):
+            with self._lock:
+                entry = self._entries.get(user_id)
+            if entry is None:
+                entry = {"df": self._fetch(user_id, since=since), "since": since, "version": version}
+            else:
+                if entry["since"] is not None and (since is None or since < entry["since"]):
+                    older = self._fetch(user_id, since=since, until=entry["since"])
+                    entry["df"] = concat_rows(older, entry["df"])
+                    entry["since"] = since
+                if entry["version"] != version:
+                    cursor = last_cursor(entry["df"])
+                    newer = self._fetch(user_id, after=cursor) if cursor else self._fetch(user_id, since=entry["since"])
+                    entry["df"] = concat_rows(entry["df"], newer)
+                    entry["version"] = version
+            with self._lock:
+                self._entries.pop(user_id, None)
+                self._entries[user_id] = entry  # re-insert as most recently used
+                while len(self._entries) > self.max_users:
+                    self._entries.pop(next(iter(self._entries)))
+            df, covered = entry["df"], entry["since"]
+        if since is not None and covered != since:
+            df = df[df["timestamp"] >= since]
+        return df
+
+    def invalidate(self, user_id):
+        """Forget a user's rows, e.g. after a backfill that may have added older timestamps."""
+        # After any fetch in progress, which would otherwise put the old rows back
+        with self._user_lock(user_id), self._lock:
+            self._entries.pop(user_id, None)
+
+    def _fetch(self, user_id, **kwargs):
+        return fetch_rows(self.client, user_id, columns=self.columns, table=self.table, **kwargs)
@@ -0,0 +1,74 @@
+import plotly.graph_objects as go
+import streamlit as st
+
+from derived_metrics import DERIVED_METRICS, LOWER_IS_BETTER
+from instrumentation import timed
+from rollups import leaderboard, team_summary, weekly_averages
+from supabase_query import TIME_WINDOWS, window_start
+from tracker_forms import ACTIVITIES, ACTIVITY_COLUMNS
+
+# -------------------------------
+# Team dashboard shared by every tracker app
+# -------------------------------
+# Reads only the backend's weekly rollups: one read for the whole team, and the
+# work per rerun depends on players x weeks, not on how much anyone has logged.
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_team_summary(cache_key, _rollups):
+    return team_summary(_rollups)
+
+
+def show_team_dashboard(backend):
+    st.subheader("👥 Team Dashboard")
+    col1, col2 = st.columns(2)
+    window = col1.selectbox("Time window", TIME_WINDOWS, index=2, key="team_window")
+    activity = col2.selectbox("Activity", ACTIVITIES, key="team_activity")
+
+    since = window_start(window)
+    try:
+        with timed("team.rollups"):
+            rollups = backend.team_rollups(since=since, activity=activity)
+    except Exception as e:
+        st.error(f"Team rollups are not available: {e}")
+        return
+    if rollups.empty:
+        st.info(f"No {activity} data for the team in this window yet.")
+        return
+    # since is a day boundary, so the key only changes daily or when the rollups do
+    summary = cached_team_summary((backend.rollup_version(), since, activity), rollups)
+    st.caption(f"{len(summary)} players")
+
+    # Leaderboard
+    # Form order first, then derived metrics, then anything else the players logged
+    order = [*ACTIVITY_COLUMNS[activity], *DERIVED_METRICS]
+    metrics = sorted(
+        (c for c in summary.columns if c not in ("Player", "Entries") and summary[c].notna().any()),
+        key=lambda c: order.index(c) if c in order else len(order)
+    )
+    col1, col2 = st.columns([3, 1])
+    metric = col1.selectbox("Leaderboard metric", metrics, key="team_metric")
+    stat = col2.radio("Rank by", ["Average", "Best"], horizontal=True, key="team_stat",
+                      disabled=metric in DERIVED_METRICS)
+    board = leaderboard(rollups, summary, metric, stat)
+    direction = "lower is better" if metric in LOWER_IS_BETTER else "higher is better"
+    st.write(f"### 🏆 {metric} ({stat.lower()}, {direction})")
+    st.dataframe(board, hide_index=True, width="stretch")
+
+    # Comparison
+    st.write("### 📊 Compare players")
+    players = st.multiselect("Players", board["Player"].tolist(), default=board["Player"].head(5).tolist(),
+                             key="team_players")
+    if not players:
+        return
+    compared = summary.loc[summary["Player"].isin(players), ["Player", "Entries", *metrics]]
+    st.dataframe(compared, hide_index=True, width="stretch")
+    if metric in DERIVED_METRICS:
+        return
+    weekly = weekly_averages(rollups, metric, players)
+    fig = go.Figure([
+        go.Scatter(x=weekly.index, y=weekly[player], name=player, mode="lines+markers")
+        for player in weekly.columns
+    ])
+    fig.update_layout(title=f"Weekly average {metric}", height=360, margin=dict(t=60, b=20))
+    st.plotly_chart(fig, width="stretch", key="team_weekly")
@@ -0,0 +1,64 @@
+"""Journal entries: numbering within a second, and the merge rule for pulled rows."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from journal import Journal
+
+USER = "player1"
+SECOND = datetime(2024, 9, 2, 18, 0, 5)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = Journal(str(tmp_path / "journal.db"))
+    yield journal
+    journal.close()
+
+
+def save(activity="Games", at=SECOND, **stats):
+    return {"user_id": USER, "activity": activity, "timestamp": at, **stats}
+
+
+def keys(journal):
+    return journal._execute("SELECT timestamp, n FROM entries ORDER BY timestamp, n")
+
+
+def test_saves_in_one_second_are_numbered_in_save_order(journal):
+    journal.append([save(Points=1), save(at=SECOND + timedelta(milliseconds=300), Points=2)])
+    journal.append([save(Points=3), save("Shooting Practice", Points=4)])
+    triples = journal.unsynced()
+    assert [(n, row["activity"], row["Points"]) for _, n, row in triples] == [
+        (0, "Games", 1), (1, "Games", 2), (2, "Games", 3), (0, "Shooting Practice", 4),
+    ]
+    assert [row["Points"] for _, _, row in journal.unsynced(2)] == [1, 2]
+
+
+def test_merge_adds_pulled_rows_as_synced(journal):
+    assert journal.merge_remote([save(Points=1), save(Points=2)]) == 2
+    assert journal.pending_count() == 0
+    assert journal.read(USER)["Points"].tolist() == [1, 2]
+    # The same rows pulled again (an overlapping pull) change nothing
+    assert journal.merge_remote([save(Points=1), save(Points=2)]) == 0
+
+
+def test_merge_updates_synced_entries_from_the_remote(journal):
+    journal.append([save(Points=1)])
+    journal.mark_synced([seq for seq, _, _ in journal.unsynced()])
+    # Edited on the remote since: the remote is the source of truth
+    assert journal.merge_remote([save(Points=5)]) == 1
+    assert journal.read(USER)["Points"].tolist() == [5]
+
+
+def test_merge_keeps_unsynced_saves(journal):
+    journal.append([save(Points=1)])
+    # Another device's save in the same second takes entry 0 on the remote; ours is still to be pushed
+    assert journal.merge_remote([save(Points=7)]) == 0
+    assert journal.read(USER)["Points"].tolist() == [1]
+    assert [row["Points"] for _, _, row in journal.unsynced()] == [1]
+
+
+def test_merge_numbers_rows_in_the_remotes_order(journal):
+    journal.merge_remote([save(Points=1), save(at=SECOND + timedelta(milliseconds=500), Points=2)])
+    assert keys(journal) == [("2024-09-02T18:00:05", 0), ("2024-09-02T18:00:05", 1)]
+    assert journal.read(USER)["Points"].tolist() == [1, 2]
@@ -0,0 +1,63 @@
+"""SharedCache on a SQLite file, shared with other processes."""
+import multiprocessing
+
+import pandas as pd
+import pytest
+
+from shared_cache import SharedCache, SQLiteCache
+
+USER = "player1"
+
+
+def invalidate(path, user_id):
+    SharedCache(SQLiteCache(path)).invalidate(user_id)
+
+
+def build_in_process(path, user_id, points):
+    SharedCache(SQLiteCache(path)).snapshot(user_id, lambda: pd.DataFrame({"Points": points}))
+
+
+def in_another_process(target, *args):
+    process = multiprocessing.get_context("spawn").Process(target=target, args=args)
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def test_an_entry_built_by_one_process_is_read_by_another(path):
+    in_another_process(build_in_process, path, USER, [1, 2])
+    cache = SharedCache(SQLiteCache(path))
+    df = cache.snapshot(USER, lambda: pytest.fail("built again"))
+    assert df["Points"].tolist() == [1, 2]
+    assert cache.counts["snapshot"]["hits"] == 1
+
+
+def test_invalidating_in_another_process_retires_entries_everywhere(path):
+    cache = SharedCache(SQLiteCache(path), version_ttl=0)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return pd.DataFrame({"Points": [len(builds)]})
+
+    assert cache.snapshot(USER, build)["Points"].tolist() == [1]
+    assert cache.snapshot(USER, build)["Points"].tolist() == [1]
+    in_another_process(invalidate, path, USER)
+    assert cache.snapshot(USER, build)["Points"].tolist() == [2]
+    assert len(builds) == 2
+
+
+def test_the_version_is_rechecked_once_version_ttl_has_passed(path):
+    cache = SharedCache(SQLiteCache(path), version_ttl=3600)
+    before = cache.version(USER)
+    in_another_process(invalidate, path, USER)
+    # Within version_ttl this process keeps the token it checked...
+    assert cache.version(USER) == before
+    cache.version_ttl = 0
+    # ...and picks up the other process's token after it
+    assert cache.version(USER) != before
@@ -0,0 +1,35 @@
+"""SheetsBackend writes from several processes, against the spreadsheet stand-in.
+
+Each backend gets its own SheetsGateway, as backends in two processes would.
+"""
+import pandas as pd
+
+from benchmarks.fakes import FakeSpreadsheet
+from sheets_gateway import SheetsGateway
+from storage import SheetsBackend
+
+USER = "player1"
+
+
+def process(fake):
+    backend = SheetsBackend(fake, gateway=SheetsGateway(fake, reads_per_minute=None, writes_per_minute=None))
+    backend.rollups_on_write = False
+    return backend
+
+
+def test_header_extensions_do_not_overwrite_each_other():
+    fake = FakeSpreadsheet()
+    a, b = process(fake), process(fake)
+    a.append(USER, "Games", {"Points": 10})
+    # B's header read predates A's write, as a cached or joined read can
+    header_rows = b.gateway.header_rows
+    b.gateway.header_rows = lambda titles, fresh=False: (
+        header_rows(titles, fresh) if fresh else {t: [] for t in titles}
+    )
+    b.append(USER, "Shooting Practice", {"3P Made": 4})
+
+    df = process(fake).query(USER).set_index("activity")
+    assert df.loc["Games", "Points"] == 10
+    assert pd.isna(df.loc["Games", "3P Made"])
+    assert df.loc["Shooting Practice", "3P Made"] == 4
+    assert SheetsBackend.HEADER_LOCK_SHEET not in [ws.title for ws in fake.worksheets()]
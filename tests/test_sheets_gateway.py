@@ -0,0 +1,131 @@
+"""SheetsGateway quota and coalescing, with a fake clock where time matters."""
+import threading
+import time
+
+import pytest
+
+from sheets_gateway import SheetsGateway, TokenBucket
+
+
+class Clock:
+    """monotonic() and sleep() for a TokenBucket: sleeping moves time on."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TooManyRequests(Exception):
+    code = 429
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def test_bucket_allows_a_burst_then_paces_callers(clock):
+    bucket = TokenBucket(60, window=60.0, burst=10, clock=clock, sleep=clock.sleep)
+    assert [bucket.take() for _ in range(10)] == [0.0] * 10
+    # Refilled at 50 a minute, leaving room for the burst within the 60
+    assert bucket.take() == pytest.approx(60 / 50)
+    assert bucket.take() == pytest.approx(60 / 50)
+    assert clock.now == pytest.approx(2 * 60 / 50)
+
+
+def test_bucket_never_exceeds_its_limit_in_a_window(clock):
+    bucket = TokenBucket(60, window=60.0, burst=10, clock=clock, sleep=clock.sleep)
+    calls = []
+    for _ in range(200):
+        bucket.take()
+        calls.append(clock.now)
+    assert all(sum(start <= t < start + 60 for t in calls) <= 60 for start in calls)
+
+
+def test_pause_holds_back_the_next_caller(clock):
+    bucket = TokenBucket(60, window=60.0, burst=10, clock=clock, sleep=clock.sleep)
+    bucket.pause(4.0)
+    assert bucket.take() == pytest.approx(4.0 + 60 / 50)
+
+
+def test_a_429_is_retried_after_backing_off(clock):
+    gateway = SheetsGateway(None, reads_per_minute=None, writes_per_minute=None, sleep=clock.sleep)
+    answers = iter([TooManyRequests(), TooManyRequests(), "rows"])
+
+    def read():
+        answer = next(answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    assert gateway.call("read", read) == "rows"
+    assert gateway.retries == 2
+    assert len(clock.slept) == 2
+
+
+def test_reads_of_one_key_share_a_flight():
+    gateway = SheetsGateway(None, reads_per_minute=None, writes_per_minute=None)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def read():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return ["row"]
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(gateway.read(("values", "p1"), read)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(gateway.read(("values", "p1"), read)))
+                 for _ in range(3)]
+    for t in followers:
+        t.start()
+    while gateway.coalesced_reads < 3:
+        time.sleep(0.01)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+    assert len(calls) == 1
+    assert results == [["row"]] * 4
+    # A read after the flight landed goes to the sheet again
+    gateway.read(("values", "p1"), read)
+    assert len(calls) == 2
+
+
+def test_a_failed_flight_fails_every_reader():
+    gateway = SheetsGateway(None, reads_per_minute=None, writes_per_minute=None, max_retries=0)
+    started, release = threading.Event(), threading.Event()
+
+    def read():
+        started.set()
+        release.wait(5)
+        raise ConnectionError("unreachable")
+
+    errors = []
+
+    def reader():
+        try:
+            gateway.read(("values", "p1"), read)
+        except ConnectionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader)]
+    threads[0].start()
+    started.wait(5)
+    threads.append(threading.Thread(target=reader))
+    threads[1].start()
+    while gateway.coalesced_reads < 1:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len(errors) == 2
@@ -0,0 +1,167 @@
+"""The StorageBackend contract, run against every backend.
+
+Sheets and Supabase run against the stand-ins in benchmarks/fakes.py, so
+the suite needs no network. SyncedBackend runs over a MemoryBackend, with
+its worker stopped: rows reach the remote when stored() flushes. A backend passes when it returns what the
+in-memory one would: same rows, same columns, same filters.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.bench_storage import synthetic_rows
+from benchmarks.fakes import FakeSpreadsheet, FakeSupabase
+from rollups import combine, rollup_delta
+from sheets_gateway import shared_gateway
+from storage import LocalFileBackend, MemoryBackend, SheetsBackend, StorageBackend, SupabaseBackend, SyncedBackend
+from storage.base import KEY_COLUMNS
+from tracker_forms import ACTIVITIES, STAT_COLUMNS
+
+START = datetime(2024, 9, 2, 18, 0)
+# Sanitized on disk by LocalFileBackend; every backend must still report them as given
+USERS = ["player1", "Jane O'Neil #3"]
+
+
+def memory(tmp_path):
+    return MemoryBackend()
+
+
+def local(tmp_path):
+    return LocalFileBackend(str(tmp_path / "parquet"))
+
+
+def sheets(tmp_path):
+    fake = FakeSpreadsheet()
+    # The fake has no quota, so neither does the gateway
+    shared_gateway(fake, reads_per_minute=None, writes_per_minute=None)
+    return SheetsBackend(fake, ttl=0)
+
+
+def supabase(tmp_path):
+    return SupabaseBackend(FakeSupabase(), columns=STAT_COLUMNS)
+
+
+def synced(tmp_path):
+    backend = SyncedBackend(MemoryBackend(), str(tmp_path / "journal.db"))
+    backend.sync.close()
+    return backend
+
+
+BACKENDS = [memory, local, sheets, supabase, synced]
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda make: make.__name__)
+def backend(request, tmp_path):
+    return request.param(tmp_path)
+
+
+@pytest.fixture
+def history():
+    rng = np.random.default_rng(0)
+    return [row for user in USERS for row in synthetic_rows(user, 60, START, rng)]
+
+
+def stored(backend, rows):
+    backend.bulk_append(rows)
+    if hasattr(backend, "flush"):
+        backend.flush()
+    return rows
+
+
+def expected(rows, user_id, activity=None, since=None, until=None):
+    df = pd.DataFrame([r for r in rows if r["user_id"] == user_id])
+    if activity is not None:
+        df = df[df["activity"] == activity]
+    if since is not None:
+        df = df[df["timestamp"] >= since]
+    if until is not None:
+        df = df[df["timestamp"] < until]
+    return df.sort_values("timestamp", kind="stable", ignore_index=True)
+
+
+def assert_same_rows(got, want):
+    assert len(got) == len(want)
+    assert list(got["timestamp"]) == list(want["timestamp"])
+    assert list(got["activity"]) == list(want["activity"])
+    for col in [c for c in STAT_COLUMNS if c in want.columns and want[c].notna().any()]:
+        assert got[col].astype(float).fillna(0).tolist() == want[col].astype(float).fillna(0).tolist(), col
+
+
+def test_snapshot_returns_every_row(backend, history):
+    stored(backend, history)
+    for user in USERS:
+        df = backend.snapshot(user)
+        assert list(df.columns[:3]) == KEY_COLUMNS
+        assert (df["user_id"] == user).all()
+        assert_same_rows(df, expected(history, user))
+
+
+@pytest.mark.parametrize("activity", ACTIVITIES)
+def test_query_by_activity(backend, history, activity):
+    stored(backend, history)
+    df = backend.query(USERS[0], activity=activity)
+    assert_same_rows(df, expected(history, USERS[0], activity=activity))
+    # Only the stat columns the returned rows fill in
+    assert all(df[c].notna().any() for c in df.columns)
+
+
+def test_query_window_is_half_open(backend, history):
+    stored(backend, history)
+    since, until = START + timedelta(days=3), START + timedelta(days=9)
+    df = backend.query(USERS[0], since=since, until=until)
+    assert_same_rows(df, expected(history, USERS[0], since=since, until=until))
+    assert df["timestamp"].min() == since
+    assert df["timestamp"].max() < until
+
+
+def test_query_columns(backend, history):
+    stored(backend, history)
+    df = backend.query(USERS[0], activity="Games", columns=["Points"])
+    assert list(df.columns) == [*KEY_COLUMNS, "Points"]
+
+
+def test_unknown_user_is_empty(backend, history):
+    stored(backend, history)
+    df = backend.query("nobody")
+    assert df.empty
+    assert list(df.columns) == KEY_COLUMNS
+
+
+def test_append_fills_timestamp_and_bumps_version(backend):
+    before = backend.version(USERS[0])
+    backend.append(USERS[0], "Games", {"Points": 12})
+    if hasattr(backend, "flush"):
+        backend.flush()
+    assert backend.version(USERS[0]) != before
+    df = backend.query(USERS[0])
+    assert df["Points"].tolist() == [12]
+    assert abs(df["timestamp"].iloc[0] - pd.Timestamp.now()) < pd.Timedelta(minutes=1)
+
+
+def test_missing_skips_stored_rows(backend, history):
+    stored(backend, history[:30])
+    assert backend.missing(history[:40]) == history[30:40]
+
+
+def test_users_are_reported_as_given(backend, history):
+    if type(backend).users is StorageBackend.users:
+        pytest.skip(f"{type(backend).__name__} does not list users")
+    stored(backend, history)
+    assert sorted(backend.users()) == sorted(USERS)
+
+
+def test_team_rollups_match_history(backend, history):
+    # A SyncedBackend's rollups are its remote's, kept up to date by its pushes
+    keeper = backend.sync.remote() if isinstance(backend, SyncedBackend) else backend
+    if not keeper.rollups_on_write:
+        pytest.skip(f"{type(backend).__name__} rollups are kept by the database")
+    stored(backend, history[:50])
+    # Built from history on first use, then kept up to date by writes
+    backend.rollups()
+    stored(backend, history[50:])
+    got = backend.team_rollups().sort_values(["user_id", "activity", "week", "metric"], ignore_index=True)
+    want = combine(rollup_delta(history)).sort_values(["user_id", "activity", "week", "metric"], ignore_index=True)
+    assert got["entries"].astype(int).tolist() == want["entries"].astype(int).tolist()
+    assert np.allclose(got["total"].astype(float), want["total"].astype(float))
@@ -0,0 +1,43 @@
+"""Backup import into user_stats, against the Supabase stand-in."""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from benchmarks.fakes import FakeSupabase
+from storage import SupabaseBackend
+from supabase_import import import_backup
+from tracker_forms import STAT_COLUMNS
+
+USER = "player1"
+START = datetime(2024, 9, 2, 18, 0, 5, 250000)
+
+
+def stored_rows(client):
+    return client.tables["user_stats"]
+
+
+def test_exported_backup_imports_as_already_present():
+    client = FakeSupabase()
+    backend = SupabaseBackend(client, columns=STAT_COLUMNS)
+    for i, activity in enumerate(["Shooting Practice", "Games", "Shooting Practice"]):
+        backend.append(USER, activity, {"Points": i, "timestamp": START + timedelta(minutes=i)})
+    # What the app exports: activity names as shown, timestamps at the journal's whole seconds
+    backup = backend.query(USER).assign(timestamp=lambda df: df["timestamp"].dt.floor("s"))
+    assert set(backup["activity"]) == {"Shooting Practice", "Games"}
+
+    assert import_backup(client, backup, USER) == (0, 3)
+    assert len(stored_rows(client)) == 3
+
+
+def test_same_second_rows_import_once():
+    client = FakeSupabase()
+    backup = pd.DataFrame({
+        "activity": ["Shooting Practice", "Shooting Practice", "Games"],
+        "timestamp": [START, START + timedelta(milliseconds=300), START],
+        "3P Made": [4, 6, None],
+        "Points": [None, None, 12],
+    })
+    assert import_backup(client, backup, USER) == (3, 0)
+    assert import_backup(client, backup, USER) == (0, 3)
+    rows = stored_rows(client)
+    assert sorted(r["activity"] for r in rows) == ["Games", "Shooting", "Shooting"]
@@ -0,0 +1,36 @@
+"""Keyset paging of user_stats, against the Supabase stand-in."""
+import pytest
+
+from benchmarks.fakes import FakeSupabase
+from supabase_query import UserStatsCache, fetch_rows
+
+USER = "player1"
+# Several saves in one second, across what will be page boundaries
+STAMPS = ["2024-09-02T18:00:05"] * 4 + ["2024-09-02T18:00:06", "2024-09-03T18:00:00"]
+
+
+@pytest.fixture
+def client():
+    client = FakeSupabase()
+    client.table("user_stats").insert([
+        {"user_id": USER, "activity": "Games" if i != 3 else "Shooting", "timestamp": ts, "Points": i}
+        for i, ts in enumerate(STAMPS)
+    ]).execute()
+    return client
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 4, 5, 1000])
+def test_every_row_once_whatever_the_page_size(client, page_size):
+    df = fetch_rows(client, USER, columns=["Points"], page_size=page_size)
+    assert sorted(df["Points"]) == list(range(len(STAMPS)))
+    # One request per page, plus at most one more per crowded second
+    assert client.round_trips <= 2 * (len(STAMPS) // page_size + 2)
+
+
+def test_cache_picks_up_a_row_in_the_cursors_second(client):
+    cache = UserStatsCache(client, columns=["Points"])
+    assert len(cache.get(USER, version=0)) == len(STAMPS)
+    client.table("user_stats").insert([
+        {"user_id": USER, "activity": "Games", "timestamp": STAMPS[-1], "Points": 99},
+    ]).execute()
+    assert sorted(cache.get(USER, version=1)["Points"]) == [*range(len(STAMPS)), 99]
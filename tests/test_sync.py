@@ -0,0 +1,114 @@
+"""Journal to remote and back, with the SyncEngine driven by hand.
+
+Each backend's worker thread is stopped as soon as it starts, so every push
+and pull below happens exactly when the test calls sync_once().
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.fakes import FakeSpreadsheet, FakeSupabase
+from shared_cache import SharedCache, SQLiteCache
+from sheets_gateway import shared_gateway
+from storage import MemoryBackend, SheetsBackend, SupabaseBackend, SyncedBackend
+from tracker_forms import STAT_COLUMNS
+
+USER = "player1"
+SECOND = datetime(2024, 9, 2, 18, 0, 5)
+
+
+def memory():
+    return MemoryBackend()
+
+
+def sheets():
+    fake = FakeSpreadsheet()
+    # The fake has no quota, so neither does the gateway
+    shared_gateway(fake, reads_per_minute=None, writes_per_minute=None)
+    return SheetsBackend(fake, ttl=60)
+
+
+def supabase():
+    return SupabaseBackend(FakeSupabase(), columns=STAT_COLUMNS)
+
+
+@pytest.fixture(params=[memory, sheets, supabase], ids=lambda make: make.__name__)
+def remote(request):
+    return request.param()
+
+
+def synced(remote, path):
+    backend = SyncedBackend(remote, str(path))
+    backend.sync.close()
+    return backend
+
+
+def points(backend):
+    return sorted(backend.query(USER)["Points"].astype(int))
+
+
+def test_same_second_saves_in_separate_pushes(remote, tmp_path):
+    device = synced(remote, tmp_path / "journal.db")
+    device.append(USER, "Games", {"Points": 1, "timestamp": SECOND})
+    assert device.sync.sync_once(pull=False) == (1, 0)
+    # Same key once floored to the second, pushed after the first is on the remote
+    device.append(USER, "Games", {"Points": 2, "timestamp": SECOND + timedelta(milliseconds=400)})
+    assert device.sync.sync_once(pull=False) == (1, 0)
+    assert points(remote) == [1, 2]
+    assert device.pending() == 0
+
+
+def test_pull_overlap_brings_rows_synced_late(remote, tmp_path):
+    a, b = synced(remote, tmp_path / "a.db"), synced(remote, tmp_path / "b.db")
+    a.append(USER, "Games", {"Points": 1, "timestamp": SECOND + timedelta(days=2)})
+    a.sync.sync_once()
+    assert b.sync.sync_once(users=[USER]) == (0, 1)
+    # Saved offline a day before what B has pulled, pushed only now
+    a.append(USER, "Games", {"Points": 2, "timestamp": SECOND + timedelta(days=1)})
+    a.sync.sync_once(pull=False)
+    # Pulled from the cursor less pull_overlap: the late row arrives, the row pulled before is not doubled
+    assert b.sync.sync_once(users=[USER]) == (0, 1)
+    assert points(b) == [1, 2]
+
+
+def test_push_after_a_lost_acknowledgement_sends_nothing_twice(remote, tmp_path, monkeypatch):
+    device = synced(remote, tmp_path / "journal.db")
+    device.append(USER, "Games", {"Points": 1, "timestamp": SECOND})
+    device.append(USER, "Games", {"Points": 2, "timestamp": SECOND})
+    mark_synced = device.journal.mark_synced
+
+    def dies(seqs):
+        raise ConnectionError("killed after the remote stored the rows")
+
+    monkeypatch.setattr(device.journal, "mark_synced", dies)
+    with pytest.raises(ConnectionError):
+        device.sync.sync_once(pull=False)
+    monkeypatch.setattr(device.journal, "mark_synced", mark_synced)
+    assert device.sync.sync_once(pull=False) == (0, 0)
+    assert points(remote) == [1, 2]
+    assert device.pending() == 0
+
+
+def test_shared_cache_entries_follow_pushes_from_other_replicas(tmp_path):
+    remote = MemoryBackend()
+    store = str(tmp_path / "cache.db")
+    replicas = []
+    for name in "ab":
+        replica = synced(remote, tmp_path / f"{name}.db")
+        # Each replica its own connection to the cache file, as in separate processes
+        replica.shared_cache = SharedCache(SQLiteCache(store), version_ttl=0)
+        replicas.append(replica)
+    a, b = replicas
+    a.append(USER, "Games", {"Points": 1, "timestamp": SECOND})
+    a.sync.sync_once(pull=False)
+    assert sorted(b.snapshot(USER)["Points"].astype(int)) == [1]
+    # A push invalidates the entry b filled: b's next snapshot holds a's new row
+    a.append(USER, "Games", {"Points": 2, "timestamp": SECOND + timedelta(minutes=1)})
+    a.sync.sync_once(pull=False)
+    assert sorted(b.snapshot(USER)["Points"].astype(int)) == [1, 2]
+    # b's own save shows before it is pushed, and once only after
+    b.append(USER, "Games", {"Points": 3, "timestamp": SECOND + timedelta(minutes=2)})
+    assert sorted(b.snapshot(USER)["Points"].astype(int)) == [1, 2, 3]
+    b.sync.sync_once(pull=False)
+    assert sorted(a.snapshot(USER)["Points"].astype(int)) == [1, 2, 3]
+    assert sorted(b.snapshot(USER)["Points"].astype(int)) == [1, 2, 3]
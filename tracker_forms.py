@@ -0,0 +1,171 @@
+import streamlit as st
+
+from instrumentation import carried_spans
+
+# -------------------------------
+# Activities shared by every tracker app
+# -------------------------------
+ACTIVITIES = ["Games", "Shooting Practice", "Conditioning", "Dribbling"]
+
+# Stat columns each activity's form writes, in form order. Percentages and ratios are
+# not stored; derived_metrics computes them from these counts when data is read.
+ACTIVITY_COLUMNS = {
+    "Games": ["Points", "Assists", "Turnovers", "Steals",
+              "3P Made", "3P Attempt", "2P Made", "2P Attempt"],
+    "Shooting Practice": ["21 Drill Time (s)", "10 Layups Time (s)", "Around Key", "3P in 4min",
+                          "3P Made", "3P Attempt", "2P Made", "2P Attempt"],
+    "Conditioning": ["17s Drill Time (s)", "1 Suicide Time (s)", "5 Suicides Time (s)", "Defensive Slides"],
+    "Dribbling": ["1-Ball Minutes", "2-Ball Minutes"],
+}
+
+STAT_COLUMNS = list(dict.fromkeys(c for cols in ACTIVITY_COLUMNS.values() for c in cols))
+
+
+# -------------------------------
+# Data Entry Forms
+# -------------------------------
+def games_form():
+    st.subheader("📊 Games Stats Entry")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        points = st.number_input("Points", min_value=0)
+        assists = st.number_input("Assists", min_value=0)
+    with col2:
+        turnovers = st.number_input("Turnovers", min_value=0)
+        steals = st.number_input("Steals", min_value=0)
+    with col3:
+        threes_made = st.number_input("3P Made", min_value=0)
+        threes_attempt = st.number_input("3P Attempt", min_value=0)
+    with col4:
+        twos_made = st.number_input("2P Made", min_value=0)
+        twos_attempt = st.number_input("2P Attempt", min_value=0)
+
+    if st.button("Save Game Stats"):
+        return {
+            "Points": points,
+            "Assists": assists,
+            "Turnovers": turnovers,
+            "Steals": steals,
+            "3P Made": threes_made,
+            "3P Attempt": threes_attempt,
+            "2P Made": twos_made,
+            "2P Attempt": twos_attempt
+        }
+
+
+def shooting_form():
+    st.subheader("🏀 Shooting Practice Entry")
+    col1, col2 = st.columns(2)
+    with col1:
+        s21_m = st.number_input("21-points drill - Minutes", min_value=0)
+        s21_s = st.number_input("21-points drill - Seconds", min_value=0)
+        layups_m = st.number_input("10 Layups - Minutes", min_value=0)
+        layups_s = st.number_input("10 Layups - Seconds", min_value=0)
+        around_key = st.number_input("Around the Key Shots in 4 mins", min_value=0)
+        threes_4min = st.number_input("3P in 4 mins", min_value=0)
+    with col2:
+        threes_made = st.number_input("3P Made", min_value=0)
+        threes_attempt = st.number_input("3P Attempt", min_value=0)
+        twos_made = st.number_input("2P Made", min_value=0)
+        twos_attempt = st.number_input("2P Attempt", min_value=0)
+
+    if st.button("Save Shooting Practice"):
+        return {
+            "21 Drill Time (s)": s21_m*60 + s21_s,
+            "10 Layups Time (s)": layups_m*60 + layups_s,
+            "Around Key": around_key,
+            "3P in 4min": threes_4min,
+            "3P Made": threes_made,
+            "3P Attempt": threes_attempt,
+            "2P Made": twos_made,
+            "2P Attempt": twos_attempt
+        }
+
+
+def conditioning_form():
+    st.subheader("💪 Conditioning Entry")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        drill17_m = st.number_input("17s Drill - Minutes", min_value=0)
+        drill17_s = st.number_input("17s Drill - Seconds", min_value=0)
+        suicide1_m = st.number_input("1 Suicide - Minutes", min_value=0)
+        suicide1_s = st.number_input("1 Suicide - Seconds", min_value=0)
+    with col2:
+        suicide5_m = st.number_input("5 Suicides - Minutes", min_value=0)
+        suicide5_s = st.number_input("5 Suicides - Seconds", min_value=0)
+    with col3:
+        slides = st.number_input("Defensive Slides in 30s", min_value=0)
+
+    if st.button("Save Conditioning"):
+        return {
+            "17s Drill Time (s)": drill17_m*60 + drill17_s,
+            "1 Suicide Time (s)": suicide1_m*60 + suicide1_s,
+            "5 Suicides Time (s)": suicide5_m*60 + suicide5_s,
+            "Defensive Slides": slides
+        }
+
+
+def dribbling_form():
+    st.subheader("🤾 Dribbling Entry")
+    col1, col2 = st.columns(2)
+    with col1:
+        one_ball = st.number_input("1-Ball Dribble Minutes", min_value=0)
+    with col2:
+        two_ball = st.number_input("2-Ball Dribble Minutes", min_value=0)
+
+    if st.button("Save Dribbling"):
+        return {
+            "1-Ball Minutes": one_ball,
+            "2-Ball Minutes": two_ball
+        }
+
+
+FORMS = {
+    "Games": games_form,
+    "Shooting Practice": shooting_form,
+    "Conditioning": conditioning_form,
+    "Dribbling": dribbling_form,
+}
+
+SAVED_MESSAGES = {
+    "Games": "✅ Game stats saved!",
+    "Shooting Practice": "✅ Shooting practice saved!",
+    "Conditioning": "✅ Conditioning data saved!",
+    "Dribbling": "✅ Dribbling saved!",
+}
+
+
+def entry_form(activity):
+    """Render the entry form for an activity. Returns the new row when its save button is clicked."""
+    return FORMS[activity]()
+
+
+@st.fragment
+def entry_section(activity, save):
+    """The entry form as a fragment: typing into it reruns only the form, not the charts below.
+
+    save(row) is called on submit, then the whole app reruns so the charts pick up the new row.
+    """
+    row = entry_form(activity)
+    if row is not None:
+        # Timed into the breakdown of the rerun that follows
+        with carried_spans("save"):
+            save(row)
+        st.session_state.saved_message = SAVED_MESSAGES[activity]
+        st.rerun()
+
+
+def show_saved_message():
+    message = st.session_state.pop("saved_message", None)
+    if message:
+        st.success(message)
+
+
+@st.fragment(run_every=1)
+def history_loading(backend, user_id):
+    """Shown while a device's first pull of the user's history runs in the background; reruns the
+    app once it is in."""
+    if backend.awaiting_pull(user_id):
+        st.caption("⏳ Fetching your history…")
+    else:
+        st.rerun()